@@ -1,8 +1,10 @@
 from fastapi import APIRouter
 import json
 import os
+import time
 from datetime import datetime, timedelta
-from app.core.database import get_db
+from app.core.database import get_db, violations_migrated, audit_partitions, LEGACY_PARTITION
+from app.core.metrics import AUDIT_STATS_SECONDS
 
 router = APIRouter()
 
@@ -11,13 +13,103 @@ router = APIRouter()
 
 from datetime import datetime, timedelta
 
+# Dashboard table size (User requested >10)
+RECENT_LIMIT = 100
+RISKY_FILES_LIMIT = 5
+
+def _add_violation(stats: dict, category: str, severity: str, count: int):
+    stats["violations"] += count
+    stats["categories"][category] = stats["categories"].get(category, 0) + count
+    stats["severities"][severity] = stats["severities"].get(severity, 0) + count
+
+def _recent_entry(ts: str, file_path: str, rule_id: str, category: str, severity: str, repo: str, commit_sha: str) -> dict:
+    return {
+        "time": ts.split("T")[0] + " " + ts.split("T")[1][:5],
+        "file": file_path,
+        "id": rule_id,
+        "cat": category,
+        "sev": severity,
+        "repo": repo,
+        "commit_sha": commit_sha
+    }
+
+def _normalized(conn, partition) -> bool:
+    # Only the legacy partition predates the violations table
+    return partition["name"] != LEGACY_PARTITION or violations_migrated(conn)
+
+def _newest_first(conn, since: str, limit: int, fetch) -> list:
+    """
+    Up to `limit` newest items over the partitions overlapping the window.
+    `fetch(partition, limit)` returns a partition's newest (timestamp, item) pairs;
+    partitions are visited newest first, and the walk stops once no older partition
+    can hold anything newer than the items already kept.
+    """
+    kept = []
+    for partition in audit_partitions(conn, since):
+        if len(kept) >= limit and partition["end_ts"] <= kept[-1][0]:
+            break
+        kept.extend(fetch(partition, limit))
+        # Stable, so rows keep their in-partition order on equal timestamps
+        kept.sort(key=lambda pair: pair[0] or "", reverse=True)
+        del kept[limit:]
+    return [item for _, item in kept]
+
+def _recent_from_violations(cursor, partition, since: str, limit: int) -> list:
+    """
+    Newest violations straight off the covering timestamp index.
+    """
+    cursor.execute(f'''
+        SELECT v.timestamp, f.file_path, r.rule_id, v.category, v.severity, a.repo, a.commit_sha
+        FROM {partition["violations_table"]} v
+        JOIN rule_dim r ON r.id = v.rule_key
+        JOIN file_dim f ON f.id = v.file_key
+        JOIN {partition["logs_table"]} a ON a.id = v.scan_id
+        {"WHERE v.timestamp >= ?" if since else ""}
+        ORDER BY v.timestamp DESC, v.scan_id DESC, v.id
+        LIMIT ?
+    ''', ([since] if since else []) + [limit])
+    return [(row[0], _recent_entry(*row)) for row in cursor.fetchall()]
+
+def _recent_from_json(cursor, partition, since: str, limit: int) -> list:
+    """
+    Pre-migration fallback: flattens violations_json blobs, newest scan first.
+    """
+    recent = []
+    cursor.execute(f'''
+        SELECT timestamp, violations_json, repo, commit_sha FROM {partition["logs_table"]}
+        WHERE {"timestamp >= ? AND" if since else ""} violations_count > 0
+        ORDER BY timestamp DESC
+    ''', [since] if since else [])
+    for row in cursor:
+        ts = row[0]
+        try:
+            violations = json.loads(row[1])
+        except json.JSONDecodeError:
+            continue
+
+        for v in violations:
+            # We flattened the list, so we might have duplicate timestamps for same scan.
+            recent.append((ts, _recent_entry(
+                ts, v.get("file_path", "unknown"), v.get("rule_id", "?"),
+                v.get("category", "UNKNOWN"), v.get("severity", "INFO"), row[2], row[3]
+            )))
+        if len(recent) >= limit:
+            break
+    return recent[:limit]
+
 @router.get("/stats")
 async def get_audit_stats(days: int = 30):
     """
     Returns statistics from the audit log for the dashboard.
     Args:
         days: Number of days to filter by (default 30). Use -1 for all time.
+
+    Totals come from the daily rollup tables (see app/core/database.py): whole days
+    are summed from rollups, and only the partial first day of the window is read
+    from raw rows, so counts are exact for any window. Raw rows are read from the
+    monthly partitions overlapping the window only.
     """
+    started = time.perf_counter()
     stats = {
         "categories": {"SECURITY": 0, "STYLE": 0, "COMPLIANCE": 0},
         "severities": {"BLOCKING": 0, "WARNING": 0, "INFO": 0},
@@ -29,77 +121,143 @@ async def get_audit_stats(days: int = 30):
 
     conn = get_db()
     cursor = conn.cursor()
+    # One read snapshot, so a partition archived meanwhile can't vanish mid-request
+    conn.execute("BEGIN")
 
     # Time Filter
-    date_filter = ""
-    params = []
+    since = None
+    rollup_filter = ""
+    rollup_params = []
+    partial_files = {}
     if days > 0:
         cutoff_date = (datetime.utcnow() - timedelta(days=days)).isoformat()
-        date_filter = "WHERE timestamp >= ?"
-        params.append(cutoff_date)
-
-    # 1. Count Scans
-    cursor.execute(f"SELECT COUNT(*) FROM audit_logs {date_filter}", params)
-    stats["scans"] = cursor.fetchone()[0]
-
-    # 2. Fetch Violations Data
-    # We fetch all matching rows and parse JSON in Python. 
-    # (SQLite JSON1 extension exists but this is safer for pure python env compatibility)
-    cursor.execute(f"SELECT timestamp, violations_json, repo, commit_sha FROM audit_logs {date_filter} ORDER BY timestamp DESC LIMIT 200", params)
-    rows = cursor.fetchall()
-    
-    for row in rows:
-        ts = row[0]
-        repo_val = row[2]
-        commit_val = row[3]
-        try:
-            violations = json.loads(row[1])
-            if not violations:
-                continue
-
-            for v in violations:
-                stats["violations"] += 1
-                
-                # Category Stats
-                cat = v.get("category", "UNKNOWN")
-                stats["categories"][cat] = stats["categories"].get(cat, 0) + 1
-                
-                # Severity Stats
-                sev = v.get("severity", "INFO")
-                stats["severities"][sev] = stats["severities"].get(sev, 0) + 1
-
-                # Risky Files
-                fpath = v.get("file_path", "unknown")
-                stats["riskyFiles"][fpath] = stats["riskyFiles"].get(fpath, 0) + 1
-
-                # Recent Table Entry (Only add if we have space in the "recent" list limit)
-                # We flattened the list, so we might have duplicate timestamps for same scan.
-                stats["recent"].append({
-                    "time": ts.split("T")[0] + " " + ts.split("T")[1][:5],
-                    "file": fpath,
-                    "id": v.get("rule_id", "?"),
-                    "cat": cat,
-                    "sev": sev,
-                    "repo": repo_val,
-                    "commit_sha": commit_val
-                })
+        cutoff_day = cutoff_date[:10]
+        next_day = (datetime.fromisoformat(cutoff_day) + timedelta(days=1)).isoformat()[:10]
+        since = cutoff_date
+        rollup_filter = "WHERE day > ?"
+        rollup_params.append(cutoff_day)
 
-        except json.JSONDecodeError:
-            pass
+        # 0. Partial first day: raw rows between the cutoff and midnight
+        for partition in audit_partitions(conn, cutoff_date, next_day):
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {partition['logs_table']} WHERE timestamp >= ? AND timestamp < ?",
+                (cutoff_date, next_day)
+            )
+            stats["scans"] += cursor.fetchone()[0]
+            # Until the online migration finishes, legacy rows only exist as violations_json
+            if _normalized(conn, partition):
+                cursor.execute(f'''
+                    SELECT v.category, v.severity, f.file_path, COUNT(*) FROM {partition["violations_table"]} v
+                    JOIN file_dim f ON f.id = v.file_key
+                    WHERE v.timestamp >= ? AND v.timestamp < ?
+                    GROUP BY v.category, v.severity, f.file_path
+                ''', (cutoff_date, next_day))
+                for category, severity, fpath, count in cursor.fetchall():
+                    _add_violation(stats, category, severity, count)
+                    partial_files[fpath] = partial_files.get(fpath, 0) + count
+            else:
+                cursor.execute(
+                    f"SELECT violations_json FROM {partition['logs_table']} WHERE timestamp >= ? AND timestamp < ? AND violations_count > 0",
+                    (cutoff_date, next_day)
+                )
+                for row in cursor.fetchall():
+                    try:
+                        violations = json.loads(row[0])
+                    except json.JSONDecodeError:
+                        continue
+                    for v in violations:
+                        _add_violation(stats, v.get("category", "UNKNOWN"), v.get("severity", "INFO"), 1)
+                        fpath = v.get("file_path", "unknown")
+                        partial_files[fpath] = partial_files.get(fpath, 0) + 1
+
+    # 1. Count Scans (whole days, from rollups)
+    cursor.execute(f"SELECT COALESCE(SUM(scans), 0) FROM audit_rollup_scans {rollup_filter}", rollup_params)
+    stats["scans"] += cursor.fetchone()[0]
+
+    # 2. Category / Severity Stats
+    cursor.execute(f'''
+        SELECT category, severity, SUM(count) FROM audit_rollup_violations {rollup_filter}
+        GROUP BY category, severity
+    ''', rollup_params)
+    for category, severity, count in cursor.fetchall():
+        _add_violation(stats, category, severity, count)
 
-    # 3. Fetch Overridden Commits (Persistence for Dashboard UI)
+    # 3. Risky Files: top N from rollups, widened so partial-day counts can't reorder the result
+    cursor.execute(f'''
+        SELECT file_path, SUM(count) AS total FROM audit_rollup_files {rollup_filter}
+        GROUP BY file_path ORDER BY total DESC LIMIT ?
+    ''', rollup_params + [RISKY_FILES_LIMIT + len(partial_files)])
+    risky = {row[0]: row[1] for row in cursor.fetchall()}
+    if partial_files:
+        placeholders = ",".join("?" * len(partial_files))
+        cursor.execute(f'''
+            SELECT file_path, SUM(count) FROM audit_rollup_files
+            {rollup_filter + " AND" if rollup_filter else "WHERE"} file_path IN ({placeholders})
+            GROUP BY file_path
+        ''', rollup_params + list(partial_files))
+        risky.update({row[0]: row[1] for row in cursor.fetchall()})
+        for fpath, count in partial_files.items():
+            risky[fpath] = risky.get(fpath, 0) + count
+    stats["riskyFiles"] = dict(sorted(risky.items(), key=lambda x: x[1], reverse=True)[:RISKY_FILES_LIMIT])
+
+    # 4. Recent Table Entries (newest first, stop as soon as the table is full)
+    def _recent(partition, limit):
+        if _normalized(conn, partition):
+            return _recent_from_violations(cursor, partition, since, limit)
+        return _recent_from_json(cursor, partition, since, limit)
+    stats["recent"] = _newest_first(conn, since, RECENT_LIMIT, _recent)
+
+    # 5. Fetch Overridden Commits (Persistence for Dashboard UI)
     cursor.execute("SELECT DISTINCT commit_sha FROM audit_overrides")
     overridden_shas = [r[0] for r in cursor.fetchall()]
     stats["overridden_shas"] = overridden_shas
 
     conn.close()
-
-    # Post-processing
-    stats["riskyFiles"] = dict(sorted(stats["riskyFiles"].items(), key=lambda x: x[1], reverse=True)[:5])
-    
-    # Return more history (User requested >10). 
-    # Can implementation pagination later, but 100 is safe for now.
-    limit = 100
-    stats["recent"] = stats["recent"][:limit] 
+    AUDIT_STATS_SECONDS.observe(time.perf_counter() - started)
 
     return stats
+
+@router.get("/violations")
+async def get_violations(rule_id: str = None, file_path: str = None, days: int = 30, limit: int = RECENT_LIMIT):
+    """
+    Lists individual violations, newest first, optionally filtered by rule and/or file.
+    Served from the normalized violations tables (rule/file + time indexes) of the
+    partitions overlapping the window.
+    """
+    conn = get_db()
+    cursor = conn.cursor()
+    conn.execute("BEGIN")
+
+    clauses = []
+    params = []
+    since = None
+    if rule_id:
+        clauses.append("v.rule_key = (SELECT id FROM rule_dim WHERE rule_id = ?)")
+        params.append(rule_id)
+    if file_path:
+        clauses.append("v.file_key = (SELECT id FROM file_dim WHERE file_path = ?)")
+        params.append(file_path)
+    if days > 0:
+        since = (datetime.utcnow() - timedelta(days=days)).isoformat()
+        clauses.append("v.timestamp >= ?")
+        params.append(since)
+
+    def _fetch(partition, limit):
+        cursor.execute(f'''
+            SELECT v.timestamp, a.repo, a.commit_sha, a.pr_number, r.rule_id, f.file_path,
+                   v.line_number, v.category, v.severity, v.message
+            FROM {partition["violations_table"]} v
+            JOIN rule_dim r ON r.id = v.rule_key
+            JOIN file_dim f ON f.id = v.file_key
+            JOIN {partition["logs_table"]} a ON a.id = v.scan_id
+            {"WHERE " + " AND ".join(clauses) if clauses else ""}
+            ORDER BY v.timestamp DESC, v.id
+            LIMIT ?
+        ''', params + [limit])
+        return [(row["timestamp"], dict(row)) for row in cursor.fetchall()]
+
+    violations = _newest_first(conn, since, max(1, min(limit, 1000)), _fetch)
+    migrated = violations_migrated(conn)
+    conn.close()
+
+    return {"violations": violations, "complete": migrated}
@@ -1,7 +1,9 @@
-from fastapi import APIRouter, HTTPException
-from app.models.scan import ScanRequest, ScanResponse
-from app.engine.hybrid_analyzer import analyzer
-from app.core.audit import audit_logger
+import json
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import StreamingResponse
+from app.models.scan import ScanRequest, ScanResponse, ScanJobRequest, ScanJobStatus
+from app.engine.scan_pipeline import run_scan, stream_scan
+from app.engine.scan_jobs import scan_jobs
 
 router = APIRouter()
 
@@ -12,24 +14,45 @@ def read_root():
 @router.post("/scan", response_model=ScanResponse)
 async def scan_code(request: ScanRequest):
     try:
-        from app.core.database import is_commit_overridden
-        
-        response = await analyzer.analyze(request)
-        
-        # Check for Admin Override (Persistence)
-        # Extract repo/sha directly from request model (no metadata dict)
-        repo = request.repo_full_name
-        sha = request.commit_sha
-        
-        if is_commit_overridden(repo, sha):
-            import logging
-            logging.getLogger("app.api.routes").info(f"🔒 Override detected for {repo}@{sha}. Forcing Success.")
-            response.succeeded = True
-            response.violations = [] # Clear violations so it doesn't block
-            
-        audit_logger.log_scan(request, response)
-        return response
+        return await run_scan(request)
     except Exception as e:
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
+
+@router.post("/scan/stream")
+async def scan_code_stream(request: ScanRequest, http_request: Request):
+    """
+    Streaming variant of `/scan`: one frame per completed file, then a summary frame
+    (see `stream_scan`). Newline-delimited JSON by default, Server-Sent Events when the
+    client sends `Accept: text/event-stream`.
+    """
+    sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def _body():
+        async for frame in stream_scan(request):
+            data = json.dumps(frame)
+            yield f"event: {frame['type']}\ndata: {data}\n\n" if sse else data + "\n"
+
+    return StreamingResponse(
+        _body(),
+        media_type="text/event-stream" if sse else "application/x-ndjson",
+        # Keep reverse proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.post("/scan/jobs", response_model=ScanJobStatus, status_code=202)
+async def submit_scan_job(request: ScanJobRequest):
+    """
+    Queues a scan and returns its job id immediately. Poll `GET /scan/jobs/{id}`
+    or pass `callback_url` (one of SCAN_JOB_CALLBACK_URLS, else 422) to be notified
+    with a signed POST when it finishes.
+    """
+    return await scan_jobs.submit(request)
+
+@router.get("/scan/jobs/{job_id}", response_model=ScanJobStatus)
+async def get_scan_job(job_id: str):
+    status = await scan_jobs.get(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return status
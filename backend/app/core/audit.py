@@ -1,15 +1,19 @@
-from app.core.database import log_audit_event
+from app.core.audit_writer import audit_writer
 from app.models.scan import ScanRequest, ScanResponse
 
 class AuditLogger:
-    def log_scan(self, request: ScanRequest, response: ScanResponse):
+    async def log_scan(self, request: ScanRequest, response: ScanResponse, coalesced: str = None):
         # Prepare details
         details = {
             "succeeded": response.succeeded,
             "violations": [v.dict() for v in response.violations]
         }
+        if coalesced:
+            # Served by an identical scan ("in_flight" or "recent"), no analysis of its own
+            details["coalesced"] = coalesced
         
-        log_audit_event(
+        # Queued for the background writer; the response no longer waits on disk I/O
+        await audit_writer.submit(
             event_type="SCAN_COMPLETED",
             repo=request.repo_full_name,
             pr_number=request.pr_number,
@@ -18,4 +22,14 @@ class AuditLogger:
             details=details
         )
 
+    async def log_superseded(self, request: ScanRequest, newer_sha: str):
+        await audit_writer.submit(
+            event_type="SCAN_SUPERSEDED",
+            repo=request.repo_full_name,
+            pr_number=request.pr_number,
+            commit_sha=request.commit_sha,
+            status="SUPERSEDED",
+            details={"superseded_by": newer_sha}
+        )
+
 audit_logger = AuditLogger()
@@ -0,0 +1,313 @@
+import os
+import gzip
+import time
+import shutil
+import sqlite3
+import asyncio
+import logging
+from datetime import datetime
+from typing import Optional
+from app.core.config import settings
+from app.core.database import DB_FILE, get_db, violations_migrated, LEGACY_PARTITION
+from app.core.metrics import AUDIT_MAINTENANCE_SECONDS, AUDIT_PARTITIONS
+
+logger = logging.getLogger(__name__)
+
+# A process archiving a partition holds it this long (an expired lease means it died)
+_ARCHIVE_LEASE_SECONDS = 3600
+# Pages freed per incremental_vacuum step, with a pause in between so writers get the lock
+_VACUUM_STEP_PAGES = 2000
+# Page sample size per index for ANALYZE (PRAGMA analysis_limit)
+_ANALYSIS_LIMIT = 1000
+
+
+def months_ago(now: datetime, months: int) -> str:
+    """
+    First day of the month `months` before now's, as an ISO timestamp.
+    """
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1).isoformat()
+
+
+class AuditMaintenance:
+    """
+    Keeps audit.db bounded now that audit rows are partitioned by month
+    (see app/core/database.py):
+
+    - Partitions that ended more than AUDIT_RETENTION_MONTHS ago are archived: copied
+      into a standalone SQLite file (rule ids and file paths resolved, so it reads on
+      its own), gzipped into AUDIT_ARCHIVE_DIR and dropped from audit.db. Archives
+      older than AUDIT_ARCHIVE_RETENTION_MONTHS are deleted. Dashboard totals keep
+      counting them through the daily rollups.
+    - ANALYZE (sampled) then runs, and pages freed by dropped partitions are returned
+      in short incremental_vacuum steps. The loop never runs a full VACUUM: new files
+      are created with auto_vacuum=INCREMENTAL and older ones are converted once at
+      startup (enable_incremental_vacuum), before any writer is running.
+    - A WAL checkpoint (TRUNCATE) every AUDIT_CHECKPOINT_INTERVAL_SECONDS keeps the
+      -wal file from growing behind long readers.
+
+    Both backend processes run this loop. The periodic pass is claimed through
+    schema_meta and each partition through a lease in audit_partitions, so every
+    step happens once.
+    """
+
+    def __init__(self, retention_months: int, archive_dir: str, archive_retention_months: int,
+                 interval_hours: float, checkpoint_interval: float):
+        self.retention_months = retention_months
+        self.archive_dir = os.path.join(os.path.dirname(DB_FILE), archive_dir)
+        self.archive_retention_months = archive_retention_months
+        self.interval_seconds = interval_hours * 3600
+        self.checkpoint_interval = checkpoint_interval
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._task = asyncio.create_task(self._run())
+        AUDIT_PARTITIONS.set_function(self.live_partitions)
+        logger.info(f"🗄️ Audit maintenance started (retention {self.retention_months or 'unlimited'} month(s))")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.checkpoint)
+                if await asyncio.to_thread(self._claim_pass):
+                    await asyncio.to_thread(self.run_pass)
+            except Exception as e:
+                logger.error(f"Audit maintenance failed: {e}")
+            await asyncio.sleep(self.checkpoint_interval)
+
+    @staticmethod
+    def enable_incremental_vacuum() -> bool:
+        """
+        One-time switch of an audit.db created before auto_vacuum=INCREMENTAL. The
+        setting only applies through a full VACUUM, which rebuilds the file under the
+        write lock, so main.py runs this at startup before the writers and workers.
+        True if this call converted the file.
+        """
+        conn = get_db()
+        try:
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return False
+            started = time.monotonic()
+            conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            conn.execute("VACUUM")
+            logger.info(f"🧹 Audit DB converted to auto_vacuum=INCREMENTAL in {time.monotonic() - started:.1f}s")
+            return True
+        except sqlite3.OperationalError as e:
+            # Usually the other backend process converting (or writing) at the same time
+            logger.warning(f"⚠️ Audit DB auto_vacuum conversion skipped, retried at next startup: {e}")
+            return False
+        finally:
+            conn.close()
+
+    @staticmethod
+    def live_partitions() -> int:
+        conn = get_db()
+        count = conn.execute("SELECT COUNT(*) FROM audit_partitions WHERE status != 'archived'").fetchone()[0]
+        conn.close()
+        return count
+
+    def _claim_pass(self) -> bool:
+        """
+        True if this process should run the periodic pass now (at most one per
+        AUDIT_MAINTENANCE_INTERVAL_HOURS across processes).
+        """
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute("SELECT value FROM schema_meta WHERE key = 'audit_maintenance_at'").fetchone()
+            if row is not None and now - float(row[0]) < self.interval_seconds:
+                conn.rollback()
+                return False
+            conn.execute("INSERT OR REPLACE INTO schema_meta (key, value) VALUES ('audit_maintenance_at', ?)", (str(now),))
+            conn.commit()
+            return True
+        finally:
+            conn.close()
+
+    def run_pass(self):
+        """
+        Archival, archive retention, ANALYZE and incremental vacuum, in that order.
+        """
+        now = datetime.utcnow()
+        if self.retention_months > 0:
+            with AUDIT_MAINTENANCE_SECONDS.labels("archive").time():
+                for name in self._expired(months_ago(now, self.retention_months)):
+                    self.archive_partition(name)
+        if self.archive_retention_months > 0:
+            self.delete_archives(months_ago(now, self.archive_retention_months))
+        with AUDIT_MAINTENANCE_SECONDS.labels("analyze").time():
+            self.analyze()
+        with AUDIT_MAINTENANCE_SECONDS.labels("vacuum").time():
+            self.vacuum()
+
+    @staticmethod
+    def _expired(cutoff: str) -> list:
+        conn = get_db()
+        try:
+            rows = conn.execute(
+                "SELECT name FROM audit_partitions WHERE status != 'archived' AND end_ts <= ? ORDER BY end_ts",
+                (cutoff,)
+            ).fetchall()
+            names = [row[0] for row in rows]
+            # Legacy rows still being copied into the violations table stay until that is done
+            if LEGACY_PARTITION in names and not violations_migrated(conn):
+                names.remove(LEGACY_PARTITION)
+            return names
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _claim_partition(name: str) -> Optional[tuple]:
+        now = time.time()
+        conn = get_db()
+        try:
+            cursor = conn.execute('''
+                UPDATE audit_partitions SET status = 'archiving', lease_until = ?
+                WHERE name = ? AND (status = 'active' OR (status = 'archiving' AND lease_until < ?))
+            ''', (now + _ARCHIVE_LEASE_SECONDS, name, now))
+            conn.commit()
+            if cursor.rowcount != 1:
+                return None
+            row = conn.execute("SELECT logs_table, violations_table FROM audit_partitions WHERE name = ?", (name,)).fetchone()
+            return row[0], row[1]
+        finally:
+            conn.close()
+
+    def archive_partition(self, name: str) -> Optional[str]:
+        """
+        Exports one partition to AUDIT_ARCHIVE_DIR/audit_<name>_<time>.db.gz, then drops
+        its tables. The tables are dropped only once the archive is fully written, so a
+        crash at any point leaves the data in audit.db (and the lease retries it later).
+        """
+        tables = self._claim_partition(name)
+        if tables is None:
+            return None
+        logs_table, violations_table = tables
+        os.makedirs(self.archive_dir, exist_ok=True)
+        stamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+        path = os.path.join(self.archive_dir, f"audit_{name}_{stamp}.db.gz")
+        export = path[:-len(".gz")] + ".tmp"
+
+        conn = get_db()
+        try:
+            if os.path.exists(export):
+                os.remove(export)
+            conn.execute("ATTACH DATABASE ? AS archive", (export,))
+            conn.execute(f"CREATE TABLE archive.audit_logs AS SELECT * FROM main.{logs_table}")
+            conn.execute(f'''
+                CREATE TABLE archive.violations AS
+                SELECT v.id, v.scan_id, v.timestamp, r.rule_id, f.file_path, v.category, v.severity,
+                       v.line_number, v.message, v.suggestion
+                FROM main.{violations_table} v
+                JOIN rule_dim r ON r.id = v.rule_key
+                JOIN file_dim f ON f.id = v.file_key
+            ''')
+            conn.commit()
+            conn.execute("DETACH DATABASE archive")
+            scans = conn.execute(f"SELECT COUNT(*) FROM {logs_table}").fetchone()[0]
+
+            with open(export, "rb") as src, gzip.open(path + ".tmp", "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            with open(path + ".tmp", "rb") as written:
+                os.fsync(written.fileno())
+            os.replace(path + ".tmp", path)
+            os.remove(export)
+
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(f"DROP TABLE IF EXISTS {violations_table}")
+            conn.execute(f"DROP TABLE IF EXISTS {logs_table}")
+            conn.execute('''
+                UPDATE audit_partitions SET status = 'archived', lease_until = NULL, archive_path = ?, archived_at = ?
+                WHERE name = ?
+            ''', (path, datetime.utcnow().isoformat(), name))
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            for leftover in (export, path + ".tmp"):
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            logger.error(f"Archiving audit partition {name} failed (will retry): {e}")
+            return None
+        finally:
+            conn.close()
+        logger.info(f"🗄️ Archived audit partition {name} ({scans} scans) to {path}")
+        return path
+
+    @staticmethod
+    def delete_archives(cutoff: str) -> int:
+        conn = get_db()
+        try:
+            rows = conn.execute(
+                "SELECT name, archive_path FROM audit_partitions WHERE status = 'archived' AND end_ts <= ?", (cutoff,)
+            ).fetchall()
+            for name, archive_path in rows:
+                if archive_path and os.path.exists(archive_path):
+                    os.remove(archive_path)
+                conn.execute("DELETE FROM audit_partitions WHERE name = ? AND status = 'archived'", (name,))
+                conn.commit()
+                logger.info(f"🗑️ Deleted expired audit archive {archive_path}")
+            return len(rows)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def analyze():
+        conn = get_db()
+        try:
+            conn.execute(f"PRAGMA analysis_limit={_ANALYSIS_LIMIT}")
+            conn.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+
+    @staticmethod
+    def vacuum():
+        conn = get_db()
+        try:
+            free_pages = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if not free_pages:
+                return
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+                # Not converted yet (see enable_incremental_vacuum); free pages are reused by new rows
+                return
+            while free_pages:
+                conn.execute(f"PRAGMA incremental_vacuum({_VACUUM_STEP_PAGES})").fetchall()
+                conn.commit()
+                remaining = conn.execute("PRAGMA freelist_count").fetchone()[0]
+                if remaining >= free_pages:
+                    break
+                free_pages = remaining
+                time.sleep(0.05)
+        finally:
+            conn.close()
+
+    @staticmethod
+    def checkpoint():
+        with AUDIT_MAINTENANCE_SECONDS.labels("checkpoint").time():
+            conn = get_db()
+            try:
+                conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+            finally:
+                conn.close()
+
+
+audit_maintenance = AuditMaintenance(
+    retention_months=settings.AUDIT_RETENTION_MONTHS,
+    archive_dir=settings.AUDIT_ARCHIVE_DIR,
+    archive_retention_months=settings.AUDIT_ARCHIVE_RETENTION_MONTHS,
+    interval_hours=settings.AUDIT_MAINTENANCE_INTERVAL_HOURS,
+    checkpoint_interval=settings.AUDIT_CHECKPOINT_INTERVAL_SECONDS,
+)
@@ -0,0 +1,160 @@
+import asyncio
+import logging
+import sqlite3
+from datetime import datetime
+from app.core.config import settings
+from app.core.database import get_db, insert_audit_events, log_audit_event
+from app.core.metrics import AUDIT_WRITE_SECONDS, AUDIT_QUEUE_DEPTH, AUDIT_EVENTS_DROPPED
+
+# Backoff between retries of a failed batch: doubles from the base, capped
+_RETRY_BASE_SECONDS = 0.2
+_RETRY_MAX_SECONDS = 5.0
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+    """
+    Moves audit inserts off the request path.
+
+    Handlers enqueue events on a bounded asyncio queue; a single background task
+    drains it and group-commits each batch in one transaction on a long-lived WAL
+    connection (in a worker thread, so the event loop never waits on fsync). When the
+    queue is full, `submit` waits for room - backpressure instead of unbounded memory.
+
+    A batch that fails with OperationalError (lock contention with the other process,
+    a transient I/O error) is kept and retried with backoff; the queue keeps filling
+    meanwhile, so producers slow down rather than lose events. Only after
+    `write_retries` attempts, or on a non-transient error, is the batch dropped and
+    counted in guardrails_audit_events_dropped.
+    """
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float, busy_timeout_ms: int, write_retries: int):
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.busy_timeout_ms = busy_timeout_ms
+        self.write_retries = write_retries
+        self._queue: asyncio.Queue = None
+        self._task: asyncio.Task = None
+        self._conn = None
+        self.written = 0
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        self._conn = get_db()
+        self._conn.execute("PRAGMA journal_mode=WAL;")
+        # WAL + NORMAL only fsyncs at checkpoints; a crash loses at most the last batch
+        self._conn.execute("PRAGMA synchronous=NORMAL;")
+        # Wait out the other process's write transactions instead of failing fast
+        self._conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms};")
+        self._task = asyncio.create_task(self._run())
+        AUDIT_QUEUE_DEPTH.set_function(lambda: self._queue.qsize() if self._queue is not None else 0)
+        logger.info("📝 Audit writer started")
+
+    async def submit(self, event_type: str, repo: str, commit_sha: str, pr_number: int = None, status: str = "INFO", details: dict = None):
+        """
+        Queues one audit event. Falls back to a direct (threaded) insert when the
+        writer is not running, e.g. in scripts or before startup.
+        """
+        if not self.running:
+            await asyncio.to_thread(log_audit_event, event_type, repo, commit_sha, pr_number, status, details)
+            return
+        # Timestamp at submit time so queueing delay does not skew the audit trail
+        event = (event_type, repo, commit_sha, pr_number, status, details, datetime.utcnow().isoformat())
+        await self._queue.put(event)
+
+    async def _run(self):
+        while True:
+            event = await self._queue.get()
+            if event is None:
+                self._queue.task_done()
+                return
+            batch = [event]
+            # Group commit: take everything already queued, then linger briefly for stragglers
+            deadline = asyncio.get_running_loop().time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    if self._queue.empty():
+                        timeout = deadline - asyncio.get_running_loop().time()
+                        if timeout <= 0:
+                            break
+                        nxt = await asyncio.wait_for(self._queue.get(), timeout)
+                    else:
+                        nxt = self._queue.get_nowait()
+                except asyncio.TimeoutError:
+                    break
+                if nxt is None:
+                    # Shutdown sentinel: write what we have, then stop
+                    await self._write(batch)
+                    for _ in range(len(batch) + 1):
+                        self._queue.task_done()
+                    return
+                batch.append(nxt)
+
+            await self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    async def _write(self, batch: list):
+        attempt = 0
+        while True:
+            try:
+                await asyncio.to_thread(self._write_batch, batch)
+                self.written += len(batch)
+                return
+            except sqlite3.OperationalError as e:
+                attempt += 1
+                if attempt > self.write_retries:
+                    self._drop(batch, "retries_exhausted", e)
+                    return
+                delay = min(_RETRY_BASE_SECONDS * 2 ** (attempt - 1), _RETRY_MAX_SECONDS)
+                logger.warning(f"⚠️ Audit batch of {len(batch)} events failed ({e}), retry {attempt}/{self.write_retries} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+            except Exception as e:
+                # Not transient (bad row, schema mismatch): retrying would fail the same way
+                self._drop(batch, "error", e)
+                return
+
+    @staticmethod
+    def _drop(batch: list, reason: str, error: Exception):
+        AUDIT_EVENTS_DROPPED.labels(reason).inc(len(batch))
+        logger.error(f"❌ Audit writer dropped {len(batch)} events ({reason}): {error}")
+
+    def _write_batch(self, batch: list):
+        # JSON serialization and rollup aggregation happen here, in the worker thread
+        try:
+            with AUDIT_WRITE_SECONDS.labels("batch").time():
+                insert_audit_events(self._conn, batch)
+                self._conn.commit()
+        except sqlite3.Error:
+            self._conn.rollback()
+            raise
+
+    async def stop(self):
+        """
+        Flushes everything queued so far and closes the connection.
+        """
+        if not self.running:
+            return
+        await self._queue.put(None)
+        await self._task
+        self._task = None
+        self._conn.close()
+        self._conn = None
+        logger.info(f"📝 Audit writer stopped ({self.written} events written)")
+
+
+audit_writer = AuditWriter(
+    max_queue=settings.AUDIT_QUEUE_SIZE,
+    batch_size=settings.AUDIT_BATCH_SIZE,
+    flush_interval=settings.AUDIT_FLUSH_INTERVAL_SECONDS,
+    busy_timeout_ms=settings.AUDIT_BUSY_TIMEOUT_MS,
+    write_retries=settings.AUDIT_WRITE_RETRIES,
+)
@@ -0,0 +1,228 @@
+import os
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# Cache databases live next to audit.db (see app/core/database.py)
+CACHE_DIR = os.getcwd()
+
+# How many writes between eviction sweeps of the on-disk tier
+_PRUNE_EVERY = 200
+
+
+class TieredCache:
+    """
+    Two-tier string cache: a bounded in-process LRU in front of a SQLite table.
+
+    Both tiers honour the same TTL. The disk tier is capped at `max_entries` rows,
+    evicting least-recently-used rows in periodic sweeps so writes stay O(1).
+
+    The event loop never waits on SQLite: `get` reads the disk tier in a worker
+    thread, and `set` plus the last_access touches of disk hits are buffered in
+    memory and written behind in one transaction by a background flush (inline when
+    there is no running loop, e.g. in scripts).
+    """
+
+    def __init__(self, name: str, db_file: str, memory_entries: int, max_entries: int, ttl_seconds: int):
+        self.name = name
+        self.db_file = db_file
+        self.memory_entries = memory_entries
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        # _lock guards the in-memory state and is never held across disk I/O;
+        # _disk_lock serializes use of the connection
+        self._lock = threading.Lock()
+        self._disk_lock = threading.Lock()
+        # Write-behind buffers: key -> (value, created_at) and key -> last_access
+        self._pending: Dict[str, tuple] = {}
+        self._touched: Dict[str, float] = {}
+        self._flushing = False
+        self._flush_task = None
+        self._writes = 0
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+        self.disk_hits = 0
+
+        self._conn = None
+        try:
+            self._conn = sqlite3.connect(db_file, check_same_thread=False)
+            self._conn.execute("PRAGMA journal_mode=WAL;")
+            self._conn.execute("PRAGMA synchronous=NORMAL;")
+            self._conn.execute('''
+                CREATE TABLE IF NOT EXISTS cache_entries (
+                    key TEXT PRIMARY KEY,
+                    value TEXT,
+                    created_at REAL,
+                    last_access REAL
+                )
+            ''')
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_entries_last_access ON cache_entries(last_access)")
+            self._conn.commit()
+        except sqlite3.Error as e:
+            # Degrade to memory-only rather than failing scans
+            logger.warning(f"⚠️ {name} cache: disk tier unavailable ({e}), using memory only")
+            self._conn = None
+
+    def _expired(self, created_at: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created_at > self.ttl_seconds
+
+    def _remember(self, key: str, value: str, created_at: float):
+        self._memory[key] = (value, created_at)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key) or self._pending.get(key)
+            if entry is not None:
+                if not self._expired(entry[1], now):
+                    if key in self._memory:
+                        self._memory.move_to_end(key)
+                    self.hits += 1
+                    self.memory_hits += 1
+                    return entry[0]
+                self._memory.pop(key, None)
+            if self._conn is None:
+                self.misses += 1
+                return None
+
+        row = await asyncio.to_thread(self._read, key)
+        with self._lock:
+            if row is not None and not self._expired(row[1], now):
+                self._remember(key, row[0], row[1])
+                self._touched[key] = now
+                self.hits += 1
+                self.disk_hits += 1
+                flush = self._claim_flush()
+            else:
+                self.misses += 1
+                return None
+        if flush:
+            self._start_flush()
+        return row[0]
+
+    def _read(self, key: str) -> Optional[tuple]:
+        with self._disk_lock:
+            try:
+                return self._conn.execute(
+                    "SELECT value, created_at FROM cache_entries WHERE key = ?", (key,)
+                ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"⚠️ {self.name} cache read failed: {e}")
+                return None
+
+    def set(self, key: str, value: str):
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            if self._conn is None:
+                return
+            self._pending[key] = (value, now)
+            self._touched.pop(key, None)
+            flush = self._claim_flush()
+        if flush:
+            self._start_flush()
+
+    def _claim_flush(self) -> bool:
+        # Caller holds _lock. At most one flush runs; it drains whatever arrives meanwhile.
+        if self._flushing:
+            return False
+        self._flushing = True
+        return True
+
+    def _start_flush(self):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self._flush()
+            return
+        self._flush_task = loop.create_task(asyncio.to_thread(self._flush))
+
+    def _flush(self):
+        """
+        Writes the buffered entries and touches, one transaction per round, until
+        the buffers stay empty.
+        """
+        while True:
+            with self._lock:
+                writes, touches = self._pending, self._touched
+                self._pending, self._touched = {}, {}
+                if not writes and not touches:
+                    self._flushing = False
+                    return
+            with self._disk_lock:
+                try:
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO cache_entries (key, value, created_at, last_access) VALUES (?, ?, ?, ?)",
+                        [(key, value, created_at, created_at) for key, (value, created_at) in writes.items()]
+                    )
+                    self._conn.executemany(
+                        "UPDATE cache_entries SET last_access = ? WHERE key = ?",
+                        [(last_access, key) for key, last_access in touches.items()]
+                    )
+                    before, self._writes = self._writes, self._writes + len(writes)
+                    if before // _PRUNE_EVERY != self._writes // _PRUNE_EVERY:
+                        self._prune(time.time())
+                    self._conn.commit()
+                except Exception as e:
+                    # A cache: losing a round of writes only costs future misses
+                    self._conn.rollback()
+                    logger.warning(f"⚠️ {self.name} cache write failed: {e}")
+
+    def _prune(self, now: float):
+        """
+        Drops expired rows, then the least recently used rows above max_entries.
+        """
+        if self.ttl_seconds > 0:
+            self._conn.execute("DELETE FROM cache_entries WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute('''
+            DELETE FROM cache_entries WHERE key IN (
+                SELECT key FROM cache_entries ORDER BY last_access DESC LIMIT -1 OFFSET ?
+            )
+        ''', (self.max_entries,))
+
+    def purge(self) -> int:
+        """
+        Empties both tiers. Returns the number of entries removed from disk.
+        """
+        with self._lock:
+            self._memory.clear()
+            self._pending.clear()
+            self._touched.clear()
+            if self._conn is None:
+                return 0
+        with self._disk_lock:
+            removed = self._conn.execute("DELETE FROM cache_entries").rowcount
+            self._conn.commit()
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        disk_entries = 0
+        if self._conn is not None:
+            with self._disk_lock:
+                try:
+                    disk_entries = self._conn.execute("SELECT COUNT(*) FROM cache_entries").fetchone()[0]
+                except sqlite3.Error:
+                    pass
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "disk_entries": disk_entries,
+            }
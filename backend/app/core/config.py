@@ -6,7 +6,100 @@ class Settings(BaseSettings):
     API_V1_STR: str = "/api/v1"
     GEMINI_API_KEY: str = ""
     OPENAI_API_KEY: str = ""
-    LLM_PROVIDER: str = "gemini" # Options: "gemini", "openai"
+    LLM_PROVIDER: str = "gemini" # Options: "gemini", "openai", "stub"
+    # OpenAI-compatible endpoint, e.g. a proxy or scripts/fake_openai_server.py (empty = api.openai.com)
+    OPENAI_BASE_URL: str = ""
+    # LLM_PROVIDER=stub: simulated provider for load tests (lognormal latency around the median)
+    STUB_LLM_LATENCY_MS: float = 800.0
+    STUB_LLM_LATENCY_SIGMA: float = 0.5
+    STUB_LLM_MS_PER_1K_TOKENS: float = 0.0
+    STUB_LLM_RATE_LIMIT_RATE: float = 0.0
+    STUB_LLM_FINDINGS_PER_FILE: int = 1
+    # Max distinct .ai-guardrails.yaml overrides kept resolved + compiled in memory
+    RULE_CACHE_SIZE: int = 64
+    # Guarded regex execution: reject exponential-backtracking patterns at load time,
+    # match longer lines in bounded windows, and cap each rule's match time per file
+    RULE_REJECT_BACKTRACKING: bool = True
+    RULE_MAX_LINE_LENGTH: int = 4096
+    RULE_TIME_BUDGET_MS: int = 250
+    # Package -> license database for manifest scanning (.json or .db/.sqlite; empty = rules/license_db.json)
+    LICENSE_DB_PATH: str = ""
+    # Content-addressed per-file scan result cache (memory LRU + scan_cache.db)
+    SCAN_CACHE_ENABLED: bool = True
+    SCAN_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    SCAN_CACHE_MEMORY_ENTRIES: int = 1024
+    SCAN_CACHE_MAX_ENTRIES: int = 50000
+    # Raw LLM response cache keyed by provider/model/prompt hash (memory LRU + llm_cache.db)
+    LLM_CACHE_ENABLED: bool = True
+    LLM_CACHE_TTL_SECONDS: int = 24 * 3600
+    LLM_CACHE_MEMORY_ENTRIES: int = 256
+    LLM_CACHE_MAX_ENTRIES: int = 20000
+    # Per-provider LLM rate limiting (0 disables a budget). Defaults fit the Gemini free tier.
+    LLM_REQUESTS_PER_MINUTE: int = 15
+    LLM_TOKENS_PER_MINUTE: int = 250000
+    LLM_MAX_CONCURRENCY: int = 4
+    # Pack small files into one LLM prompt (0 budget disables batching)
+    LLM_BATCH_TOKEN_BUDGET: int = 6000
+    LLM_BATCH_FILE_TOKEN_LIMIT: int = 1500
+    LLM_BATCH_MAX_FILES: int = 8
+    # Files above this many tokens are reviewed as overlapping syntax-aware chunks (0 disables)
+    LLM_CHUNK_TOKEN_LIMIT: int = 6000
+    LLM_CHUNK_OVERLAP_LINES: int = 20
+    # When a patch is available, the LLM sees only the changed hunks (+ context lines), their
+    # enclosing definitions (whole if at most LLM_DIFF_MAX_DEF_LINES) and the imports
+    LLM_DIFF_PROMPTS: bool = True
+    LLM_DIFF_CONTEXT_LINES: int = 3
+    LLM_DIFF_MAX_DEF_LINES: int = 80
+    # Background audit writer: bounded queue, group commits of up to AUDIT_BATCH_SIZE events
+    AUDIT_QUEUE_SIZE: int = 10000
+    AUDIT_BATCH_SIZE: int = 200
+    AUDIT_FLUSH_INTERVAL_SECONDS: float = 0.05
+    # A batch hitting "database is locked" (busy past AUDIT_BUSY_TIMEOUT_MS) is retried with
+    # backoff up to AUDIT_WRITE_RETRIES times - the queue fills meanwhile - and only then dropped
+    AUDIT_BUSY_TIMEOUT_MS: int = 10000
+    AUDIT_WRITE_RETRIES: int = 5
+    # Audit rows are partitioned by month. Partitions older than AUDIT_RETENTION_MONTHS are
+    # archived to gzipped SQLite files in AUDIT_ARCHIVE_DIR, and archives are deleted after
+    # AUDIT_ARCHIVE_RETENTION_MONTHS (0 keeps either forever). Retention is off by default so an
+    # upgrade never moves existing audit history out of audit.db; set e.g. 12 to enable it. Archival, ANALYZE and incremental
+    # vacuum run every AUDIT_MAINTENANCE_INTERVAL_HOURS, WAL checkpoints every AUDIT_CHECKPOINT_INTERVAL_SECONDS
+    AUDIT_RETENTION_MONTHS: int = 0
+    AUDIT_ARCHIVE_DIR: str = "audit_archive"
+    AUDIT_ARCHIVE_RETENTION_MONTHS: int = 0
+    AUDIT_MAINTENANCE_INTERVAL_HOURS: float = 24.0
+    AUDIT_CHECKPOINT_INTERVAL_SECONDS: float = 300.0
+    # Static/license scans of files at least this large run in a process pool (0 workers = one per core)
+    SCAN_PROCESS_POOL_ENABLED: bool = True
+    SCAN_PROCESS_WORKERS: int = 0
+    SCAN_PROCESS_THRESHOLD_BYTES: int = 256 * 1024
+    # Identical concurrent scans (repo, sha, files, config) share one analysis; results are
+    # memoized this long for late duplicates (0 = coalesce in-flight scans only)
+    SCAN_COALESCE_TTL_SECONDS: float = 30.0
+    SCAN_COALESCE_MAX_ENTRIES: int = 256
+    # Cancel a PR's in-flight scan when a newer head sha of the same PR starts scanning
+    SCAN_SUPERSEDE_ENABLED: bool = True
+    SCAN_SUPERSEDE_POLL_SECONDS: float = 1.0
+    # Async scan jobs (POST /scan/jobs): workers per process, polling and crash recovery
+    SCAN_JOB_WORKERS: int = 2
+    SCAN_JOB_POLL_INTERVAL_SECONDS: float = 1.0
+    SCAN_JOB_LEASE_SECONDS: int = 300
+    SCAN_JOB_MAX_ATTEMPTS: int = 3
+    SCAN_JOB_RETENTION_HOURS: int = 72
+    # Job callbacks only go to these URLs (comma-separated), through the outbox below and
+    # signed with CALLBACK_SECRET (HMAC-SHA256 in X-Guardrails-Signature), like all outbox
+    # events; the GitHub App needs the same secret
+    SCAN_JOB_CALLBACK_URLS: str = "http://127.0.0.1:3000/api/scan-callback"
+    CALLBACK_SECRET: str = ""
+    # Outbox delivery of override / commit-status events to the GitHub App
+    OUTBOX_ENDPOINT: str = "http://127.0.0.1:3000/api/events"
+    OUTBOX_BATCH_SIZE: int = 20
+    OUTBOX_POLL_INTERVAL_SECONDS: float = 2.0
+    OUTBOX_TIMEOUT_SECONDS: float = 10.0
+    OUTBOX_LEASE_SECONDS: int = 60
+    OUTBOX_MAX_ATTEMPTS: int = 12
+    OUTBOX_BACKOFF_BASE_SECONDS: float = 2.0
+    OUTBOX_BACKOFF_MAX_SECONDS: float = 600.0
+    OUTBOX_RETENTION_HOURS: int = 72
     # Add other config as needed
     
     class Config:
@@ -1,10 +1,35 @@
 import sqlite3
 import json
 import os
-from datetime import datetime
+import time
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from app.core.metrics import AUDIT_WRITE_SECONDS
+
+logger = logging.getLogger(__name__)
 
 DB_FILE = os.path.join(os.getcwd(), "audit.db")
 
+# Audit rows copied per transaction by the online violations migration
+MIGRATION_CHUNK_SIZE = 500
+
+# Per-process memo of interned dimension keys (rule_dim / file_dim)
+_DIM_CACHE_SIZE = 50000
+_dim_cache = {"rule_dim": {}, "file_dim": {}}
+_violations_migrated = False
+
+# Audit partitions whose tables this process has already ensured
+LEGACY_PARTITION = "legacy"
+_known_partitions = set()
+
+def _clear_dim_cache():
+    for cache in _dim_cache.values():
+        cache.clear()
+    # Same for partitions created in a transaction that may have been rolled back
+    _known_partitions.clear()
+
 def get_db():
     conn = sqlite3.connect(DB_FILE, check_same_thread=False)
     conn.row_factory = sqlite3.Row
@@ -12,23 +37,30 @@ def get_db():
 
 def init_db():
     conn = get_db()
+    # Only takes effect before the first table exists (new files); older files are
+    # converted once at startup, see AuditMaintenance.enable_incremental_vacuum
+    conn.execute("PRAGMA auto_vacuum=INCREMENTAL;")
     # Enable Write-Ahead Logging (WAL) for better concurrency with multiple workers/processes
     conn.execute("PRAGMA journal_mode=WAL;")
     cursor = conn.cursor()
     
-    # Audit Logs Table
+    # Audit Logs Table: the pre-partitioning (legacy) partition, see _create_partition_tables
+    _create_partition_tables(cursor, "audit_logs", "violations")
+
+    # Catalog of audit partitions. Events are written to one audit_logs_YYYYMM /
+    # violations_YYYYMM pair per month; readers fan out over the partitions whose
+    # [start_ts, end_ts) range overlaps their window (see audit_partitions).
     cursor.execute('''
-        CREATE TABLE IF NOT EXISTS audit_logs (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            timestamp TEXT,
-            event_type TEXT,
-            repo TEXT,
-            pr_number INTEGER,
-            commit_sha TEXT,
-            status TEXT,
-            violations_count INTEGER,
-            violations_json TEXT,  -- Storing structured data as JSON for flexibility
-            metadata_json TEXT
+        CREATE TABLE IF NOT EXISTS audit_partitions (
+            name TEXT PRIMARY KEY,  -- YYYYMM, or 'legacy' for audit_logs / violations
+            logs_table TEXT NOT NULL,
+            violations_table TEXT NOT NULL,
+            start_ts TEXT NOT NULL,  -- Inclusive
+            end_ts TEXT NOT NULL,  -- Exclusive
+            status TEXT NOT NULL,  -- active, archiving, archived
+            lease_until REAL,  -- Unix time; held by the process archiving the partition
+            archive_path TEXT,
+            archived_at TEXT
         )
     ''')
 
@@ -44,55 +76,551 @@ def init_db():
         )
     ''')
 
+    # Daily rollups maintained at insert time (see update_rollups), so /audit/stats
+    # sums a few rows per day instead of re-parsing every violations_json blob.
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_rollup_scans (
+            day TEXT,
+            repo TEXT,
+            scans INTEGER NOT NULL DEFAULT 0,
+            violations INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, repo)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_rollup_violations (
+            day TEXT,
+            repo TEXT,
+            category TEXT,
+            severity TEXT,
+            rule_id TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, repo, category, severity, rule_id)
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS audit_rollup_files (
+            day TEXT,
+            repo TEXT,
+            file_path TEXT,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, repo, file_path)
+        )
+    ''')
+
+    # Small key/value table for one-off migrations
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        )
+    ''')
+
+    # Rule ids and file paths of normalized violations, interned (shared by all partitions)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS rule_dim (
+            id INTEGER PRIMARY KEY,
+            rule_id TEXT NOT NULL UNIQUE
+        )
+    ''')
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS file_dim (
+            id INTEGER PRIMARY KEY,
+            file_path TEXT NOT NULL UNIQUE
+        )
+    ''')
+    # Override checks run on every scan; this makes them a single index probe
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_audit_overrides_repo_sha ON audit_overrides(repo, commit_sha)")
+
+    # Persistent queue behind the async scan-job API (app/engine/scan_jobs.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_jobs (
+            id TEXT PRIMARY KEY,
+            status TEXT NOT NULL,  -- queued, running, completed, failed
+            repo TEXT,
+            commit_sha TEXT,
+            pr_number INTEGER,
+            request_json TEXT NOT NULL,
+            callback_url TEXT,
+            files_total INTEGER NOT NULL DEFAULT 0,
+            files_done INTEGER NOT NULL DEFAULT 0,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            lease_until REAL,  -- Unix time; an expired lease means the worker died
+            lease_token TEXT,  -- New on every claim; only its holder may update the job
+            result_json TEXT,
+            error TEXT,
+            created_at TEXT,
+            started_at TEXT,
+            finished_at TEXT
+        )
+    ''')
+    if "lease_token" not in [row[1] for row in conn.execute("PRAGMA table_info(scan_jobs)")]:
+        cursor.execute("ALTER TABLE scan_jobs ADD COLUMN lease_token TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_scan_jobs_status ON scan_jobs(status, created_at)")
+
+    # Transactional outbox for events to the GitHub App (app/core/outbox.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS outbox_events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            idempotency_key TEXT NOT NULL UNIQUE,
+            event_type TEXT NOT NULL,  -- override, commit_status
+            payload_json TEXT NOT NULL,
+            status TEXT NOT NULL,  -- pending, sending, delivered, failed
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,  -- Unix time
+            lease_until REAL,
+            last_error TEXT,
+            created_at TEXT,
+            delivered_at TEXT,
+            endpoint TEXT  -- NULL: batched to OUTBOX_ENDPOINT; else POSTed alone (scan-job callbacks)
+        )
+    ''')
+    if "endpoint" not in [row[1] for row in conn.execute("PRAGMA table_info(outbox_events)")]:
+        cursor.execute("ALTER TABLE outbox_events ADD COLUMN endpoint TEXT")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_outbox_events_status ON outbox_events(status, next_attempt_at)")
+
+    # Latest head sha being scanned per pull request, shared by both backend processes
+    # so a newer push can supersede a scan running in the other one (app/engine/scan_registry.py)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_heads (
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            commit_sha TEXT NOT NULL,
+            seq INTEGER NOT NULL DEFAULT 0,  -- scan_shas.seq of commit_sha; only ever increases
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (repo, pr_number)
+        )
+    ''')
+    if "seq" not in [row[1] for row in conn.execute("PRAGMA table_info(scan_heads)")]:
+        cursor.execute("ALTER TABLE scan_heads ADD COLUMN seq INTEGER NOT NULL DEFAULT 0")
+    # Order in which each PR's shas were first seen: webhook redeliveries of an older sha
+    # keep their original place, so they never count as the newest head
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS scan_shas (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            repo TEXT NOT NULL,
+            pr_number INTEGER NOT NULL,
+            commit_sha TEXT NOT NULL,
+            seen_at REAL NOT NULL,
+            UNIQUE (repo, pr_number, commit_sha)
+        )
+    ''')
+
+    _backfill_rollups(conn)
+    _start_violations_migration(conn)
+    _register_legacy_partition(conn)
+
     conn.commit()
     conn.close()
 
-# Initialize on import (safe for this scale)
-init_db()
+def _create_partition_tables(cursor, logs_table: str, violations_table: str):
+    """
+    One audit partition: the scan rows and, keyed to them, their normalized
+    violations (one row per finding, rule ids and file paths interned so
+    filter-by-rule/file queries hit small integer indexes).
+    """
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {logs_table} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            timestamp TEXT,
+            event_type TEXT,
+            repo TEXT,
+            pr_number INTEGER,
+            commit_sha TEXT,
+            status TEXT,
+            violations_count INTEGER,
+            violations_json TEXT,  -- Storing structured data as JSON for flexibility
+            metadata_json TEXT
+        )
+    ''')
+    cursor.execute(f'''
+        CREATE TABLE IF NOT EXISTS {violations_table} (
+            id INTEGER PRIMARY KEY,
+            scan_id INTEGER NOT NULL REFERENCES {logs_table}(id) ON DELETE CASCADE,
+            timestamp TEXT NOT NULL,  -- Copied from the scan row so time filters need no join
+            rule_key INTEGER NOT NULL REFERENCES rule_dim(id),
+            file_key INTEGER NOT NULL REFERENCES file_dim(id),
+            category TEXT,
+            severity TEXT,
+            line_number INTEGER,
+            message TEXT,
+            suggestion TEXT
+        )
+    ''')
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{logs_table}_timestamp ON {logs_table}(timestamp)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{logs_table}_repo_sha ON {logs_table}(repo, commit_sha)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{violations_table}_scan ON {violations_table}(scan_id)")
+    # Covering for the dashboard's "recent" table and time-window aggregates
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{violations_table}_time ON {violations_table}(timestamp, scan_id, rule_key, file_key, category, severity)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{violations_table}_rule_time ON {violations_table}(rule_key, timestamp)")
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS idx_{violations_table}_file_time ON {violations_table}(file_key, timestamp)")
 
-def log_audit_event(event_type: str, repo: str, commit_sha: str, pr_number: int = None, status: str = "INFO", details: dict = None):
+def partition_name(timestamp: str) -> str:
+    """
+    Monthly partition of an ISO timestamp: '2026-10-17T...' -> '202610'.
     """
-    Helper to log any event to the DB.
+    return timestamp[:4] + timestamp[5:7]
+
+def partition_tables(name: str) -> tuple:
+    if name == LEGACY_PARTITION:
+        return "audit_logs", "violations"
+    return f"audit_logs_{name}", f"violations_{name}"
+
+def partition_bounds(name: str) -> tuple:
+    """
+    [start, end) of a monthly partition as ISO timestamps.
+    """
+    year, month = int(name[:4]), int(name[4:])
+    start = datetime(year, month, 1)
+    end = datetime(year + month // 12, month % 12 + 1, 1)
+    return start.isoformat(), end.isoformat()
+
+def _register_legacy_partition(conn):
+    """
+    Catalogs the pre-partitioning audit_logs / violations tables as the 'legacy'
+    partition, spanning the rows they hold (refreshed on every start until archived).
+    """
+    first, last = conn.execute("SELECT MIN(timestamp), MAX(timestamp) FROM audit_logs").fetchone()
+    if first is None:
+        return
+    try:
+        end = (datetime.fromisoformat(last) + timedelta(microseconds=1)).isoformat()
+    except ValueError:
+        end = last
+    conn.execute('''
+        INSERT INTO audit_partitions (name, logs_table, violations_table, start_ts, end_ts, status)
+        VALUES (?, 'audit_logs', 'violations', ?, ?, 'active')
+        ON CONFLICT(name) DO UPDATE SET start_ts = excluded.start_ts, end_ts = excluded.end_ts
+        WHERE status = 'active'
+    ''', (LEGACY_PARTITION, first, end))
+
+def _ensure_partition(conn, name: str) -> tuple:
+    """
+    Creates the tables of a monthly partition on first write (inside the caller's
+    transaction) and returns (logs_table, violations_table).
+    """
+    tables = partition_tables(name)
+    if name not in _known_partitions:
+        _create_partition_tables(conn, *tables)
+        start, end = partition_bounds(name)
+        # A late write into an already archived month starts a fresh live partition
+        conn.execute('''
+            INSERT INTO audit_partitions (name, logs_table, violations_table, start_ts, end_ts, status)
+            VALUES (?, ?, ?, ?, ?, 'active')
+            ON CONFLICT(name) DO UPDATE SET status = 'active', lease_until = NULL WHERE status = 'archived'
+        ''', (name,) + tables + (start, end))
+        _known_partitions.add(name)
+    return tables
+
+def audit_partitions(conn, since: str = None, until: str = None) -> list:
+    """
+    Live partitions overlapping [since, until) (None = unbounded), newest first,
+    as rows of (name, logs_table, violations_table, start_ts, end_ts).
+    """
+    clauses = ["status IN ('active', 'archiving')"]
+    params = []
+    if since:
+        clauses.append("end_ts > ?")
+        params.append(since)
+    if until:
+        clauses.append("start_ts < ?")
+        params.append(until)
+    return conn.execute(f'''
+        SELECT name, logs_table, violations_table, start_ts, end_ts FROM audit_partitions
+        WHERE {" AND ".join(clauses)}
+        ORDER BY end_ts DESC
+    ''', params).fetchall()
+
+def _backfill_rollups(conn):
+    """
+    One-time rollup build for audit rows written before rollups existed.
+    """
+    done = conn.execute("SELECT value FROM schema_meta WHERE key = 'rollups_backfilled'").fetchone()
+    if done:
+        return
+    # BEGIN IMMEDIATE so two starting workers don't both backfill
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    if conn.execute("SELECT value FROM schema_meta WHERE key = 'rollups_backfilled'").fetchone():
+        conn.commit()
+        return
+    for table in ("audit_rollup_scans", "audit_rollup_violations", "audit_rollup_files"):
+        conn.execute(f"DELETE FROM {table}")
+    batch = []
+    for row in conn.execute("SELECT timestamp, repo, violations_json FROM audit_logs"):
+        try:
+            violations = json.loads(row[2] or "[]")
+        except json.JSONDecodeError:
+            violations = []
+        batch.append((row[0], row[1], violations))
+        if len(batch) >= 1000:
+            update_rollups(conn, batch)
+            batch = []
+    update_rollups(conn, batch)
+    conn.execute("INSERT OR REPLACE INTO schema_meta (key, value) VALUES ('rollups_backfilled', ?)", (datetime.utcnow().isoformat(),))
+    conn.commit()
+
+def _start_violations_migration(conn):
+    """
+    Records which audit rows predate the violations table. Rows up to that id are
+    copied over by `migrate_violations` in the background; newer rows are written
+    normalized by `insert_audit_events` from the start.
+    """
+    if conn.execute("SELECT 1 FROM schema_meta WHERE key = 'violations_migration_target'").fetchone():
+        return
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    if not conn.execute("SELECT 1 FROM schema_meta WHERE key = 'violations_migration_target'").fetchone():
+        target = conn.execute("SELECT COALESCE(MAX(id), 0) FROM audit_logs").fetchone()[0]
+        conn.executemany("INSERT OR REPLACE INTO schema_meta (key, value) VALUES (?, ?)", [
+            ("violations_migration_target", str(target)),
+            ("violations_migrated_upto", "0"),
+        ])
+    conn.commit()
+
+def _migration_progress(conn) -> tuple:
+    rows = dict(conn.execute(
+        "SELECT key, value FROM schema_meta WHERE key IN ('violations_migration_target', 'violations_migrated_upto')"
+    ).fetchall())
+    return int(rows.get("violations_migrated_upto", 0)), int(rows.get("violations_migration_target", 0))
+
+def violations_migrated(conn) -> bool:
+    """
+    True once every audit row is represented in the violations table.
+    """
+    global _violations_migrated
+    if not _violations_migrated:
+        upto, target = _migration_progress(conn)
+        _violations_migrated = upto >= target
+    return _violations_migrated
+
+def migrate_violations_chunk(conn, chunk_size: int = MIGRATION_CHUNK_SIZE) -> bool:
+    """
+    Copies the next chunk of legacy violations_json rows into the violations table
+    in one short transaction. Returns True when the migration is complete.
+    """
+    conn.commit()
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        upto, target = _migration_progress(conn)
+        if upto >= target:
+            conn.commit()
+            return True
+        rows = conn.execute(
+            "SELECT id, timestamp, violations_json FROM audit_logs WHERE id > ? AND id <= ? ORDER BY id LIMIT ?",
+            (upto, target, chunk_size)
+        ).fetchall()
+        last_id = rows[-1][0] if rows else target
+        # Idempotent per chunk, even if an earlier attempt died half-way
+        conn.execute("DELETE FROM violations WHERE scan_id > ? AND scan_id <= ?", (upto, last_id))
+        violation_rows = []
+        for scan_id, timestamp, violations_json in rows:
+            try:
+                violations = json.loads(violations_json or "[]")
+            except json.JSONDecodeError:
+                violations = []
+            violation_rows.extend(_violation_rows(conn, scan_id, timestamp or "", violations))
+        conn.executemany(_INSERT_VIOLATIONS_SQL.format(table="violations"), violation_rows)
+        conn.execute("UPDATE schema_meta SET value = ? WHERE key = 'violations_migrated_upto'", (str(last_id),))
+        conn.commit()
+        return last_id >= target
+    except Exception:
+        conn.rollback()
+        _clear_dim_cache()
+        raise
+
+def migrate_violations(chunk_size: int = MIGRATION_CHUNK_SIZE, pause: float = 0.01):
+    """
+    Online migration of legacy rows: small chunks, each its own transaction, with a
+    short pause between them so request-path writers are never blocked for long.
     """
     conn = get_db()
-    cursor = conn.cursor()
-    
-    violations_json = "[]"
-    metadata_json = "{}"
-    
+    try:
+        upto, target = _migration_progress(conn)
+        if upto < target:
+            logger.info(f"Migrating violations for audit rows {upto + 1}..{target}")
+        while not migrate_violations_chunk(conn, chunk_size):
+            time.sleep(pause)
+        violations_migrated(conn)
+    except Exception as e:
+        logger.error(f"Violations migration stopped (will resume on next start): {e}")
+    finally:
+        conn.close()
+
+def start_violations_migration():
+    """
+    Runs `migrate_violations` on a daemon thread (no-op once complete).
+    """
+    conn = get_db()
+    done = violations_migrated(conn)
+    conn.close()
+    if not done:
+        threading.Thread(target=migrate_violations, name="violations-migration", daemon=True).start()
+
+def build_audit_row(event_type: str, repo: str, commit_sha: str, pr_number: int = None, status: str = "INFO", details: dict = None, timestamp: str = None) -> tuple:
+    """
+    Serializes one event into an `audit_logs` row (in column order, without id).
+    """
+    violations = []
+    metadata = {}
+
     if details:
-        if "violations" in details:
-            violations_json = json.dumps(details.pop("violations"))
-        metadata_json = json.dumps(details)
+        metadata = dict(details)
+        violations = metadata.pop("violations", None) or []
 
-    cursor.execute('''
-        INSERT INTO audit_logs (timestamp, event_type, repo, pr_number, commit_sha, status, violations_count, violations_json, metadata_json)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        datetime.utcnow().isoformat(),
+    return (
+        timestamp or datetime.utcnow().isoformat(),
         event_type,
         repo,
         pr_number,
         commit_sha,
         status,
-        len(json.loads(violations_json)),
-        violations_json,
-        metadata_json
-    ))
-    
-    conn.commit()
-    conn.close()
+        len(violations),  # Counted directly, no JSON round-trip
+        json.dumps(violations),
+        json.dumps(metadata)
+    )
 
-def is_commit_overridden(repo: str, commit_sha: str) -> bool:
+def update_rollups(conn, entries: list):
     """
-    Checks if a specific commit has been manually overridden by an admin.
+    Adds (timestamp, repo, violations) entries to the daily rollup tables.
+    The caller owns the transaction, so rollups commit atomically with the rows.
     """
-    if not repo or not commit_sha:
-        return False
-        
-    conn = get_db()
-    cursor = conn.cursor()
-    cursor.execute('SELECT 1 FROM audit_overrides WHERE repo = ? AND commit_sha = ? LIMIT 1', (repo, commit_sha))
-    result = cursor.fetchone()
-    conn.close()
-    return result is not None
+    scans = Counter()
+    scan_violations = Counter()
+    by_rule = Counter()
+    by_file = Counter()
+    for timestamp, repo, violations in entries:
+        day = (timestamp or "")[:10]
+        repo = repo or ""
+        scans[(day, repo)] += 1
+        scan_violations[(day, repo)] += len(violations)
+        for v in violations:
+            by_rule[(day, repo, v.get("category", "UNKNOWN"), v.get("severity", "INFO"), v.get("rule_id", "?"))] += 1
+            by_file[(day, repo, v.get("file_path", "unknown"))] += 1
+
+    conn.executemany('''
+        INSERT INTO audit_rollup_scans (day, repo, scans, violations) VALUES (?, ?, ?, ?)
+        ON CONFLICT(day, repo) DO UPDATE SET scans = scans + excluded.scans, violations = violations + excluded.violations
+    ''', [(day, repo, n, scan_violations[(day, repo)]) for (day, repo), n in scans.items()])
+    conn.executemany('''
+        INSERT INTO audit_rollup_violations (day, repo, category, severity, rule_id, count) VALUES (?, ?, ?, ?, ?, ?)
+        ON CONFLICT(day, repo, category, severity, rule_id) DO UPDATE SET count = count + excluded.count
+    ''', [key + (n,) for key, n in by_rule.items()])
+    conn.executemany('''
+        INSERT INTO audit_rollup_files (day, repo, file_path, count) VALUES (?, ?, ?, ?)
+        ON CONFLICT(day, repo, file_path) DO UPDATE SET count = count + excluded.count
+    ''', [key + (n,) for key, n in by_file.items()])
+
+def _intern(conn, table: str, column: str, value: str) -> int:
+    """
+    Returns the dimension key for a rule id / file path, inserting it on first use.
+    """
+    cache = _dim_cache[table]
+    key = cache.get(value)
+    if key is None:
+        conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+        key = conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+        if len(cache) >= _DIM_CACHE_SIZE:
+            cache.clear()
+        cache[value] = key
+    return key
+
+def _violation_rows(conn, scan_id: int, timestamp: str, violations: list) -> list:
+    return [
+        (
+            scan_id,
+            timestamp,
+            _intern(conn, "rule_dim", "rule_id", str(v.get("rule_id", "?"))),
+            _intern(conn, "file_dim", "file_path", str(v.get("file_path", "unknown"))),
+            v.get("category", "UNKNOWN"),
+            v.get("severity", "INFO"),
+            v.get("line_number"),
+            v.get("message"),
+            v.get("suggestion"),
+        )
+        for v in violations
+    ]
+
+_INSERT_VIOLATIONS_SQL = '''
+    INSERT INTO {table} (scan_id, timestamp, rule_key, file_key, category, severity, line_number, message, suggestion)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+def _insert_scan_row(conn, name: str, row: tuple) -> sqlite3.Cursor:
+    logs_table, _ = _ensure_partition(conn, name)
+    # One execute per row (same transaction) to learn the scan id for the FK
+    return conn.execute(f'''
+        INSERT INTO {logs_table} (timestamp, event_type, repo, pr_number, commit_sha, status, violations_count, violations_json, metadata_json)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', row)
+
+def insert_audit_events(conn, events: list):
+    """
+    Inserts (event_type, repo, commit_sha, pr_number, status, details, timestamp)
+    events into the partition of their month, with their normalized violations and
+    the rollups. The caller owns the transaction (commit).
+    """
+    rollup_entries = []
+    violation_rows = {}
+    try:
+        for event_type, repo, commit_sha, pr_number, status, details, timestamp in events:
+            row = build_audit_row(event_type, repo, commit_sha, pr_number, status, details, timestamp)
+            name = partition_name(row[0])
+            violations = (details or {}).get("violations") or []
+            try:
+                cursor = _insert_scan_row(conn, name, row)
+            except sqlite3.OperationalError as e:
+                # Memoized partition archived since (possibly by the other process): recreate it
+                if "no such table" not in str(e):
+                    raise
+                _known_partitions.discard(name)
+                cursor = _insert_scan_row(conn, name, row)
+            violations_table = partition_tables(name)[1]
+            violation_rows.setdefault(violations_table, []).extend(
+                _violation_rows(conn, cursor.lastrowid, row[0], violations)
+            )
+            rollup_entries.append((row[0], repo, violations))
+
+        for violations_table, rows in violation_rows.items():
+            conn.executemany(_INSERT_VIOLATIONS_SQL.format(table=violations_table), rows)
+        update_rollups(conn, rollup_entries)
+    except Exception:
+        # A rollback would orphan freshly interned keys still held in the cache
+        _clear_dim_cache()
+        raise
+
+def log_audit_event(event_type: str, repo: str, commit_sha: str, pr_number: int = None, status: str = "INFO", details: dict = None):
+    """
+    Helper to log any event to the DB (synchronously, on its own connection).
+    Request handlers should prefer `audit_writer.submit` (app/core/audit_writer.py).
+    """
+    with AUDIT_WRITE_SECONDS.labels("direct").time():
+        conn = get_db()
+        insert_audit_events(conn, [(event_type, repo, commit_sha, pr_number, status, details, None)])
+        conn.commit()
+        conn.close()
+
+def overrides_version(conn) -> int:
+    """
+    Change counter of audit_overrides, bumped by every `record_override`.
+    """
+    row = conn.execute("SELECT value FROM schema_meta WHERE key = 'overrides_version'").fetchone()
+    return int(row[0]) if row else 0
+
+def record_override(conn, repo: str, commit_sha: str, admin_user: str, reason: str) -> tuple:
+    """
+    Stores an admin override and bumps the override change counter. The caller owns
+    the transaction (BEGIN IMMEDIATE ... commit). Returns (override id, new counter value).
+    """
+    cursor = conn.execute('''
+        INSERT INTO audit_overrides (timestamp, repo, commit_sha, admin_user, reason)
+        VALUES (?, ?, ?, ?, ?)
+    ''', (datetime.utcnow().isoformat(), repo, commit_sha, admin_user, reason))
+    conn.execute('''
+        INSERT INTO schema_meta (key, value) VALUES ('overrides_version', '1')
+        ON CONFLICT(key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+    ''')
+    return cursor.lastrowid, overrides_version(conn)
+
+# Initialize on import (safe for this scale)
+init_db()
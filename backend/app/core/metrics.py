@@ -0,0 +1,297 @@
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds: sub-millisecond regex scans up to multi-minute LLM retries
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class _Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._children: Dict[Tuple[str, ...], object] = {}
+
+    def labels(self, *values: str):
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def _default(self):
+        # Unlabelled metrics act as their own single child
+        return self.labels()
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for key, child in sorted(self._children.items()):
+            lines.extend(child.render(self.name, self.labelnames, key))
+        return lines
+
+
+class _CounterChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def render(self, name, labelnames, key) -> List[str]:
+        return [f"{name}_total{_format_labels(labelnames, key)} {_format_value(self._value)}"]
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+
+class _GaugeChild:
+    def __init__(self):
+        self._value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.inc(-amount)
+
+    def set(self, value: float):
+        self._value = float(value)
+
+    @contextmanager
+    def track_inprogress(self):
+        self.inc()
+        try:
+            yield
+        finally:
+            self.dec()
+
+    def render(self, name, labelnames, key) -> List[str]:
+        return [f"{name}{_format_labels(labelnames, key)} {_format_value(self._value)}"]
+
+
+class Gauge(_Metric):
+    """
+    A value that goes up and down. Either updated in place (inc/dec/set), or, for
+    state that already lives elsewhere (queue sizes), read at scrape time via
+    `set_function`.
+    """
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Callable[[], float] = None
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set_function(self, fn: Callable[[], float]):
+        self._function = fn
+
+    def inc(self, amount: float = 1.0):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._default().dec(amount)
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def track_inprogress(self):
+        return self._default().track_inprogress()
+
+    def render(self) -> List[str]:
+        if self._function is not None:
+            try:
+                self.set(self._function())
+            except Exception:
+                # A failing probe (e.g. DB locked) must not break the whole scrape
+                pass
+        return super().render()
+
+
+class _HistogramChild:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self._buckets = buckets
+        self._counts = [0] * (len(buckets) + 1)
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        i = bisect_left(self._buckets, value)
+        with self._lock:
+            self._counts[i] += 1
+            self._sum += value
+
+    @contextmanager
+    def time(self):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started)
+
+    def render(self, name, labelnames, key) -> List[str]:
+        with self._lock:
+            counts, total = list(self._counts), self._sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self._buckets + (float("inf"),), counts):
+            cumulative += count
+            le = f'le="{_format_value(bound)}"'
+            lines.append(f"{name}_bucket{_format_labels(labelnames, key, le)} {cumulative}")
+        lines.append(f"{name}_sum{_format_labels(labelnames, key)} {_format_value(total)}")
+        lines.append(f"{name}_count{_format_labels(labelnames, key)} {cumulative}")
+        return lines
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+
+class MetricsRegistry:
+    """
+    Process-local metrics rendered in the Prometheus text exposition format
+    (version 0.0.4), without depending on prometheus_client.
+
+    Every uvicorn process (8000 and 8081) keeps its own registry, so scrape each
+    port as a separate target. Observations are a bisect plus a short lock, cheap
+    enough for per-file and per-call hot paths, including worker threads.
+    """
+
+    CONTENT_TYPE = "text/plain; version=0.0.4"
+
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        if not metric.labelnames:
+            # Unlabelled series are exported (as 0) from the first scrape on
+            metric.labels()
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+# --- Scan hot path ---
+STATIC_SCAN_SECONDS = metrics.histogram(
+    "guardrails_static_scan_seconds", "Regex rule scan time per file (including process pool round-trip).")
+LICENSE_SCAN_SECONDS = metrics.histogram(
+    "guardrails_license_scan_seconds", "License scan time per manifest file.")
+FILE_ANALYSIS_SECONDS = metrics.histogram(
+    "guardrails_file_analysis_seconds", "Static and license phase per file, cache lookups included.", ("cached",))
+SCANS_IN_FLIGHT = metrics.gauge(
+    "guardrails_scans_in_flight", "Scans currently being analyzed in this process.")
+SCANS_SUPERSEDED = metrics.counter(
+    "guardrails_scans_superseded", "PR scans cancelled because a newer head sha arrived.")
+SCANS_COALESCED = metrics.counter(
+    "guardrails_scans_coalesced", "Duplicate scans served by an in-flight or just-completed identical scan.", ("source",))
+
+# --- LLM ---
+LLM_REQUEST_SECONDS = metrics.histogram(
+    "guardrails_llm_request_seconds", "Provider round-trip latency per attempt.", ("provider", "outcome"))
+LLM_RETRIES = metrics.histogram(
+    "guardrails_llm_retries", "Tenacity retries per LLM completion.", ("provider",),
+    buckets=(0, 1, 2, 3, 4, 5))
+LLM_RATE_LIMITED = metrics.counter(
+    "guardrails_llm_rate_limited", "Provider 429 responses.", ("provider",))
+LLM_QUEUE_WAIT_SECONDS = metrics.histogram(
+    "guardrails_llm_queue_wait_seconds", "Wait for a concurrency slot and RPM/TPM budget.", ("provider",))
+LLM_WAITING = metrics.gauge(
+    "guardrails_llm_waiting", "Calls queued on the provider rate limiter.", ("provider",))
+LLM_PROMPT_TOKENS = metrics.counter(
+    "guardrails_llm_prompt_tokens_estimated", "Estimated code tokens per file: whole file vs. what was sent.", ("scope",))
+
+# --- Audit ---
+AUDIT_WRITE_SECONDS = metrics.histogram(
+    "guardrails_audit_write_seconds", "Audit DB insert + commit latency.", ("mode",))
+AUDIT_STATS_SECONDS = metrics.histogram(
+    "guardrails_audit_stats_seconds", "Query time of /api/v1/audit/stats.")
+AUDIT_QUEUE_DEPTH = metrics.gauge(
+    "guardrails_audit_queue_depth", "Audit events waiting for the background writer.")
+AUDIT_EVENTS_DROPPED = metrics.counter(
+    "guardrails_audit_events_dropped", "Audit events the background writer gave up on.", ("reason",))
+AUDIT_PARTITIONS = metrics.gauge(
+    "guardrails_audit_partitions", "Monthly audit partitions live in audit.db (shared by all processes).")
+AUDIT_MAINTENANCE_SECONDS = metrics.histogram(
+    "guardrails_audit_maintenance_seconds", "Audit DB archival, ANALYZE, VACUUM and WAL checkpoint time.", ("task",),
+    buckets=(0.01, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0))
+OUTBOX_PENDING = metrics.gauge(
+    "guardrails_outbox_pending", "Outbox events not yet delivered to the GitHub App (shared by all processes).")
+OUTBOX_FAILED = metrics.gauge(
+    "guardrails_outbox_failed", "Outbox events parked as failed after OUTBOX_MAX_ATTEMPTS or a permanent rejection.")
+OUTBOX_DELIVERIES = metrics.counter(
+    "guardrails_outbox_deliveries", "Outbox delivery outcomes per event.", ("outcome",))
+SCAN_JOB_QUEUE_DEPTH = metrics.gauge(
+    "guardrails_scan_job_queue_depth", "Scan jobs queued in audit.db (shared by all processes).")
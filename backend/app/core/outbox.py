@@ -0,0 +1,328 @@
+import json
+import time
+import uuid
+import random
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+from app.core.config import settings
+from app.core.database import get_db
+from app.core.metrics import OUTBOX_PENDING, OUTBOX_FAILED, OUTBOX_DELIVERIES
+from app.core.signing import SIGNATURE_HEADER, sign_payload
+
+logger = logging.getLogger(__name__)
+
+# Event types understood by the GitHub App's /api/events route
+EVENT_OVERRIDE = "override"            # {repo_full_name, commit_sha, reason}
+EVENT_COMMIT_STATUS = "commit_status"  # {repo_full_name, commit_sha, state, description, target_url?}
+# Finished scan job (ScanJobStatus), POSTed on its own to the job's callback_url
+EVENT_SCAN_JOB = "scan_job"
+
+EVENT_ID_HEADER = "X-Guardrails-Event-Id"
+
+
+class OutboxStore:
+    """
+    The `outbox_events` table in audit.db: events for the GitHub App (Node bridge)
+    written in the same transaction as the change they announce, so nothing is lost
+    if the app is down or this process dies before delivery.
+
+    Dispatchers in both backend processes drain it: a batch is claimed under
+    BEGIN IMMEDIATE with a lease (an expired lease makes it claimable again), and
+    failed deliveries are rescheduled with exponential backoff until
+    OUTBOX_MAX_ATTEMPTS, after which the event is parked as `failed`.
+    """
+
+    def __init__(self, batch_size: int, lease_seconds: int, max_attempts: int,
+                 backoff_base: float, backoff_max: float, retention_hours: int):
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.retention_hours = retention_hours
+
+    @staticmethod
+    def enqueue(conn, event_type: str, payload: dict, idempotency_key: str = None, endpoint: str = None) -> str:
+        """
+        Adds an event inside the caller's transaction (the caller commits). The key is
+        sent with every delivery attempt so the receiver can drop duplicates;
+        re-enqueueing the same key is a no-op. Events with an `endpoint` are POSTed
+        there on their own (body = payload) instead of batched to OUTBOX_ENDPOINT.
+        """
+        key = idempotency_key or uuid.uuid4().hex
+        conn.execute('''
+            INSERT OR IGNORE INTO outbox_events (idempotency_key, event_type, payload_json, status, next_attempt_at, created_at, endpoint)
+            VALUES (?, ?, ?, 'pending', ?, ?, ?)
+        ''', (key, event_type, json.dumps(payload), time.time(), datetime.utcnow().isoformat(), endpoint))
+        return key
+
+    def claim(self) -> List[dict]:
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            rows = conn.execute('''
+                SELECT id, idempotency_key, event_type, payload_json, attempts, endpoint FROM outbox_events
+                WHERE (status = 'pending' AND next_attempt_at <= ?) OR (status = 'sending' AND lease_until < ?)
+                ORDER BY id LIMIT ?
+            ''', (now, now, self.batch_size)).fetchall()
+            conn.executemany(
+                "UPDATE outbox_events SET status = 'sending', lease_until = ? WHERE id = ?",
+                [(now + self.lease_seconds, row["id"]) for row in rows]
+            )
+            conn.commit()
+            return [dict(row) for row in rows]
+        finally:
+            conn.close()
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(self.backoff_max, self.backoff_base * (2 ** max(0, attempts - 1)))
+        # Jitter so both processes' retries don't hit the app in lockstep
+        return delay * random.uniform(0.8, 1.2)
+
+    def complete(self, delivered: List[int], retry: Dict[int, str], rejected: Dict[int, str], attempts: Dict[int, int]):
+        """
+        Records one delivery round in a single transaction: delivered ids, ids to
+        retry later (with their error) and ids the receiver rejected for good.
+        """
+        now = time.time()
+        finished = datetime.utcnow().isoformat()
+        updates = []
+        for event_id, error in retry.items():
+            tries = attempts[event_id] + 1
+            if tries >= self.max_attempts:
+                rejected[event_id] = f"Gave up after {tries} attempt(s): {error}"
+                continue
+            updates.append((tries, now + self._backoff(tries), error, event_id))
+
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany('''
+                UPDATE outbox_events SET status = 'delivered', attempts = attempts + 1, lease_until = NULL, delivered_at = ?, last_error = NULL
+                WHERE id = ?
+            ''', [(finished, event_id) for event_id in delivered])
+            conn.executemany('''
+                UPDATE outbox_events SET status = 'pending', attempts = ?, next_attempt_at = ?, lease_until = NULL, last_error = ?
+                WHERE id = ?
+            ''', updates)
+            conn.executemany('''
+                UPDATE outbox_events SET status = 'failed', attempts = attempts + 1, lease_until = NULL, last_error = ?
+                WHERE id = ?
+            ''', [(error, event_id) for event_id, error in rejected.items()])
+            conn.commit()
+        finally:
+            conn.close()
+        for event_id, error in rejected.items():
+            logger.error(f"❌ Outbox event {event_id} failed permanently: {error}")
+
+    def failed_count(self) -> int:
+        conn = get_db()
+        count = conn.execute("SELECT COUNT(*) FROM outbox_events WHERE status = 'failed'").fetchone()[0]
+        conn.close()
+        return count
+
+    def failed_events(self, limit: int = 50) -> List[dict]:
+        """
+        Most recent events parked as `failed`, for the admin endpoint.
+        """
+        conn = get_db()
+        rows = conn.execute('''
+            SELECT idempotency_key, event_type, payload_json, attempts, last_error, created_at FROM outbox_events
+            WHERE status = 'failed' ORDER BY id DESC LIMIT ?
+        ''', (limit,)).fetchall()
+        conn.close()
+        events = []
+        for row in rows:
+            event = dict(row)
+            event["payload"] = json.loads(event.pop("payload_json"))
+            events.append(event)
+        return events
+
+    def pending_count(self) -> int:
+        conn = get_db()
+        count = conn.execute("SELECT COUNT(*) FROM outbox_events WHERE status IN ('pending', 'sending')").fetchone()[0]
+        conn.close()
+        return count
+
+    def purge_delivered(self) -> int:
+        cutoff = (datetime.utcnow() - timedelta(hours=self.retention_hours)).isoformat()
+        conn = get_db()
+        cursor = conn.execute("DELETE FROM outbox_events WHERE status = 'delivered' AND delivered_at < ?", (cutoff,))
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+
+class OutboxDispatcher:
+    """
+    Background task delivering outbox events to the GitHub App in batches
+    (POST OUTBOX_ENDPOINT, {"events": [{"id", "type", "payload"}]}). The app answers
+    per event: {"results": {id: {"ok": bool, "retry": bool, "error": str}}}; events
+    missing from the answer, and whole batches hitting a network error or 5xx,
+    are retried. Events with their own endpoint (scan-job callbacks) are POSTed
+    one by one: 2xx delivers, other 4xx rejects, anything else is retried.
+
+    Every body is signed with CALLBACK_SECRET (see app/core/signing.py); the app
+    rejects unsigned requests, so without a secret the dispatcher does not start and
+    events stay queued until one is configured. Polls every
+    OUTBOX_POLL_INTERVAL_SECONDS and is woken right away by `notify()` after a
+    local enqueue.
+    """
+
+    def __init__(self, store: OutboxStore, endpoint: str, poll_interval: float, timeout: float):
+        self.store = store
+        self.endpoint = endpoint
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._client = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def start(self):
+        if self.running:
+            return
+        try:
+            import httpx
+        except ImportError:
+            logger.warning("⚠️  HTTPX not found. Outbox events will stay queued.")
+            return
+        OUTBOX_PENDING.set_function(self.store.pending_count)
+        OUTBOX_FAILED.set_function(self.store.failed_count)
+        if not settings.CALLBACK_SECRET:
+            logger.error("❌ CALLBACK_SECRET not set: outbox dispatcher disabled. Admin overrides and scan callbacks "
+                         "stay queued until the same secret is configured for the backend and the GitHub App.")
+            return
+        self._client = httpx.AsyncClient(timeout=self.timeout)
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self.store.purge_delivered)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"📮 Outbox dispatcher started ({self.endpoint})")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    def notify(self):
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    async def _run(self):
+        while True:
+            try:
+                batch = await asyncio.to_thread(self.store.claim)
+            except Exception as e:
+                logger.error(f"Outbox claim failed: {e}")
+                batch = []
+            if not batch:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+                continue
+            await self._deliver(batch)
+
+    async def _deliver(self, batch: List[dict]):
+        attempts = {row["id"]: row["attempts"] for row in batch}
+        delivered: List[int] = []
+        retry: Dict[int, str] = {}
+        rejected: Dict[int, str] = {}
+        posts = [self._post_callback(row) for row in batch if row["endpoint"]]
+        batched = [row for row in batch if not row["endpoint"]]
+        if batched:
+            posts.append(self._post_events(batched))
+        for outcome in await asyncio.gather(*posts):
+            for event_id, (result, error) in outcome.items():
+                if result == "delivered":
+                    delivered.append(event_id)
+                elif result == "retry":
+                    retry[event_id] = error
+                else:
+                    rejected[event_id] = error
+
+        OUTBOX_DELIVERIES.labels("delivered").inc(len(delivered))
+        OUTBOX_DELIVERIES.labels("retry").inc(len(retry))
+        OUTBOX_DELIVERIES.labels("rejected").inc(len(rejected))
+        try:
+            await asyncio.to_thread(self.store.complete, delivered, retry, rejected, attempts)
+        except Exception as e:
+            # Leases expire, so the batch is simply claimed again later
+            logger.error(f"Outbox bookkeeping failed for {len(batch)} event(s): {e}")
+
+    async def _post_events(self, rows: List[dict]) -> Dict[int, tuple]:
+        body = json.dumps({"events": [
+            {"id": row["idempotency_key"], "type": row["event_type"], "payload": json.loads(row["payload_json"])}
+            for row in rows
+        ]}).encode("utf-8")
+        try:
+            resp = await self._client.post(self.endpoint, content=body, headers=self._headers(body))
+            if resp.status_code in (401, 403):
+                logger.error("❌ GitHub App rejected the outbox signature: CALLBACK_SECRET differs between backend and app")
+            if resp.status_code != 200:
+                raise RuntimeError(f"HTTP {resp.status_code}: {resp.text[:200]}")
+            results = resp.json().get("results", {})
+        except Exception as e:
+            logger.warning(f"⚠️ Outbox delivery of {len(rows)} event(s) failed: {e}")
+            return {row["id"]: ("retry", str(e)) for row in rows}
+
+        outcome = {}
+        for row in rows:
+            result = results.get(row["idempotency_key"])
+            if result is None:
+                outcome[row["id"]] = ("retry", "No result returned for event")
+            elif result.get("ok"):
+                outcome[row["id"]] = ("delivered", None)
+            elif result.get("retry", True):
+                outcome[row["id"]] = ("retry", str(result.get("error", "unknown error")))
+            else:
+                outcome[row["id"]] = ("rejected", str(result.get("error", "rejected")))
+        return outcome
+
+    async def _post_callback(self, row: dict) -> Dict[int, tuple]:
+        body = row["payload_json"].encode("utf-8")
+        headers = self._headers(body)
+        headers[EVENT_ID_HEADER] = row["idempotency_key"]
+        try:
+            resp = await self._client.post(row["endpoint"], content=body, headers=headers)
+        except Exception as e:
+            logger.warning(f"⚠️ Outbox callback {row['idempotency_key']} failed: {e}")
+            return {row["id"]: ("retry", str(e))}
+        if resp.status_code < 300:
+            return {row["id"]: ("delivered", None)}
+        error = f"HTTP {resp.status_code}: {resp.text[:200]}"
+        if resp.status_code < 500 and resp.status_code not in (408, 429):
+            return {row["id"]: ("rejected", error)}
+        logger.warning(f"⚠️ Outbox callback {row['idempotency_key']} got {error}")
+        return {row["id"]: ("retry", error)}
+
+    @staticmethod
+    def _headers(body: bytes) -> dict:
+        return {"Content-Type": "application/json", SIGNATURE_HEADER: sign_payload(body)}
+
+
+outbox_store = OutboxStore(
+    batch_size=settings.OUTBOX_BATCH_SIZE,
+    lease_seconds=settings.OUTBOX_LEASE_SECONDS,
+    max_attempts=settings.OUTBOX_MAX_ATTEMPTS,
+    backoff_base=settings.OUTBOX_BACKOFF_BASE_SECONDS,
+    backoff_max=settings.OUTBOX_BACKOFF_MAX_SECONDS,
+    retention_hours=settings.OUTBOX_RETENTION_HOURS,
+)
+outbox_dispatcher = OutboxDispatcher(
+    store=outbox_store,
+    endpoint=settings.OUTBOX_ENDPOINT,
+    poll_interval=settings.OUTBOX_POLL_INTERVAL_SECONDS,
+    timeout=settings.OUTBOX_TIMEOUT_SECONDS,
+)
@@ -0,0 +1,75 @@
+import logging
+import threading
+from typing import Optional, Set, Tuple
+from app.core.database import get_db, overrides_version
+
+logger = logging.getLogger(__name__)
+
+
+class OverrideIndex:
+    """
+    In-memory set of admin-overridden (repo, commit_sha) pairs, so scans can check
+    for an override before any analysis starts.
+
+    Loaded at startup and updated synchronously by `POST /api/v1/override` in this
+    process. Other backend processes (8000/8081 share audit.db) write overrides too:
+    every write bumps `overrides_version` in schema_meta in the same transaction, and
+    each lookup compares it with the version this index was loaded at - a primary
+    key read on a connection kept open for the purpose. A mismatch reloads the table.
+    """
+
+    def __init__(self):
+        self._commits: Set[Tuple[str, str]] = set()
+        self._version: Optional[int] = None
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        if self._conn is None:
+            self._conn = get_db()
+        return self._conn
+
+    def load(self):
+        """
+        (Re)reads every override, together with the version they correspond to.
+        """
+        with self._lock:
+            conn = self._connection()
+            # One read transaction, so the rows and the version are from the same snapshot
+            conn.execute("BEGIN")
+            try:
+                version = overrides_version(conn)
+                commits = {(row[0], row[1]) for row in conn.execute("SELECT repo, commit_sha FROM audit_overrides")}
+            finally:
+                conn.rollback()
+            self._commits, self._version = commits, version
+        logger.info(f"🔒 Override index loaded: {len(commits)} overridden commit(s), version {version}")
+
+    def is_overridden(self, repo: str, commit_sha: str) -> bool:
+        if not repo or not commit_sha:
+            return False
+        with self._lock:
+            current = overrides_version(self._connection())
+        if current != self._version:
+            self.load()
+        return (repo, commit_sha) in self._commits
+
+    def add(self, repo: str, commit_sha: str, version: int):
+        """
+        Records an override this process just committed as `version`. If another
+        process wrote one in between, the versions don't line up and the next
+        lookup reloads instead.
+        """
+        with self._lock:
+            self._commits.add((repo, commit_sha))
+            if self._version is not None and version == self._version + 1:
+                self._version = version
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+override_index = OverrideIndex()
@@ -0,0 +1,145 @@
+import time
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict
+from app.core.config import settings
+from app.core.metrics import LLM_QUEUE_WAIT_SECONDS, LLM_WAITING, LLM_RATE_LIMITED
+
+logger = logging.getLogger(__name__)
+
+# Adaptive (AIMD) tuning: halve the rate on a 429, win it back slowly on success
+_BACKOFF_FACTOR = 0.5
+_RECOVERY_STEP = 0.05
+_MIN_RATE_FACTOR = 0.05
+
+
+class TokenBucketRateLimiter:
+    """
+    Rate limiter for one LLM provider.
+
+    Enforces a requests-per-minute and a tokens-per-minute budget (two token buckets
+    that refill continuously) plus a ceiling on concurrent in-flight calls. When the
+    provider answers 429 the effective rate is cut multiplicatively, then recovered
+    additively on each success, so we converge on what the key actually allows.
+    """
+
+    def __init__(self, name: str, requests_per_minute: int, tokens_per_minute: int, max_concurrency: int):
+        self.name = name
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_factor = 1.0
+
+        # Buckets start full so the first burst of a quiet period goes out immediately
+        self._request_tokens = float(requests_per_minute)
+        self._llm_tokens = float(tokens_per_minute)
+        self._last_refill = time.monotonic()
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        # Serializes bucket accounting so waiters are served in arrival order
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute > 0:
+            rate = self.requests_per_minute * self.rate_factor / 60.0
+            self._request_tokens = min(float(self.requests_per_minute), self._request_tokens + elapsed * rate)
+        if self.tokens_per_minute > 0:
+            rate = self.tokens_per_minute * self.rate_factor / 60.0
+            self._llm_tokens = min(float(self.tokens_per_minute), self._llm_tokens + elapsed * rate)
+
+    def _wait_time(self, tokens: int) -> float:
+        """
+        Seconds until both buckets can cover the request (0 if they already can).
+        """
+        wait = 0.0
+        if self.requests_per_minute > 0 and self._request_tokens < 1:
+            rate = self.requests_per_minute * self.rate_factor / 60.0
+            wait = max(wait, (1 - self._request_tokens) / rate)
+        if self.tokens_per_minute > 0 and self._llm_tokens < tokens:
+            rate = self.tokens_per_minute * self.rate_factor / 60.0
+            wait = max(wait, (tokens - self._llm_tokens) / rate)
+        return wait
+
+    async def _take(self, tokens: int):
+        # A single prompt larger than the whole minute budget would otherwise wait forever
+        if self.tokens_per_minute > 0:
+            tokens = min(tokens, self.tokens_per_minute)
+        async with self._lock:
+            while True:
+                self._refill()
+                wait = self._wait_time(tokens)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+            if self.requests_per_minute > 0:
+                self._request_tokens -= 1
+            if self.tokens_per_minute > 0:
+                self._llm_tokens -= tokens
+
+    @asynccontextmanager
+    async def acquire(self, tokens: int = 0):
+        """
+        Holds one concurrency slot for the duration of the call, after paying for
+        one request and `tokens` estimated LLM tokens.
+        """
+        waiting = LLM_WAITING.labels(self.name)
+        waiting.inc()
+        started = time.perf_counter()
+        try:
+            await self._semaphore.acquire()
+            try:
+                await self._take(tokens)
+            except BaseException:
+                self._semaphore.release()
+                raise
+        finally:
+            waiting.dec()
+        LLM_QUEUE_WAIT_SECONDS.labels(self.name).observe(time.perf_counter() - started)
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+    def record_rate_limited(self):
+        LLM_RATE_LIMITED.labels(self.name).inc()
+        self.rate_factor = max(_MIN_RATE_FACTOR, self.rate_factor * _BACKOFF_FACTOR)
+        # Drain the request bucket so queued calls pause instead of hammering the provider
+        self._request_tokens = min(self._request_tokens, 0.0)
+        logger.warning(f"⚠️ {self.name} rate limited (429). Reducing rate to {self.rate_factor:.0%} of budget.")
+
+    def record_success(self):
+        if self.rate_factor < 1.0:
+            self.rate_factor = min(1.0, self.rate_factor + _RECOVERY_STEP)
+
+
+def is_rate_limit_error(error: Exception) -> bool:
+    """
+    Best-effort detection of a provider 429 across the OpenAI and google-genai SDKs.
+    """
+    for attr in ("status_code", "code", "status"):
+        if getattr(error, attr, None) in (429, "429", "RESOURCE_EXHAUSTED"):
+            return True
+    text = str(error)
+    return "429" in text or "RESOURCE_EXHAUSTED" in text or "rate limit" in text.lower()
+
+
+_limiters: Dict[str, TokenBucketRateLimiter] = {}
+
+
+def get_rate_limiter(provider: str) -> TokenBucketRateLimiter:
+    """
+    Returns the process-wide limiter for a provider, creating it from Settings.
+    """
+    limiter = _limiters.get(provider)
+    if limiter is None:
+        limiter = TokenBucketRateLimiter(
+            name=provider,
+            requests_per_minute=settings.LLM_REQUESTS_PER_MINUTE,
+            tokens_per_minute=settings.LLM_TOKENS_PER_MINUTE,
+            max_concurrency=settings.LLM_MAX_CONCURRENCY,
+        )
+        _limiters[provider] = limiter
+    return limiter
@@ -1,58 +1,190 @@
 import yaml
 import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
 from typing import List, Dict, Any
+from app.core.config import settings
+from app.core.rule_matcher import RuleMatcher, has_catastrophic_backtracking
+
+logger = logging.getLogger(__name__)
+
+REQUIRED_RULE_KEYS = ("id", "pattern", "message", "severity", "category")
+
+# Lines of unchanged code scanned around each changed hunk in `scan_mode: diff`
+DEFAULT_DIFF_CONTEXT = 3
+
+
+class ResolvedRuleSet:
+    """
+    Everything derived from one `.ai-guardrails.yaml` override: the effective rules,
+    their compiled matcher and the enforcement mode. Immutable once built, so a single
+    instance is shared by every file of every request that carries the same override.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], enforcement_mode: str = "blocking", config: Dict[str, Any] = None):
+        self.rules = rules
+        self.enforcement_mode = enforcement_mode
+        self.config = config or {}
+        self.matcher = RuleMatcher(rules)
+
+        # `scan_mode: diff` limits static analysis to the lines touched by each file's patch
+        self.scan_mode = "full"
+        self.diff_context = DEFAULT_DIFF_CONTEXT
+        try:
+            self.scan_mode = str(self.config.get("scan_mode", "full")).lower()
+            self.diff_context = max(0, int(self.config.get("diff_context", DEFAULT_DIFF_CONTEXT)))
+        except (TypeError, ValueError) as e:
+            logger.error(f"Invalid scan_mode/diff_context in override config: {e}")
+
+        # Content-based, so equivalent overrides (or a touched-but-unchanged pack) share it
+        payload = json.dumps({
+            "rules": rules,
+            "enforcement_mode": enforcement_mode,
+            "scan_mode": self.scan_mode,
+            "diff_context": self.diff_context,
+        }, sort_keys=True, default=str)
+        self.fingerprint = hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
 
 class RuleEngine:
     def __init__(self, rules_path: str = None):
         self.rules = []
+        # Resolve relative to this file: backend/app/core/rule_engine.py -> backend/rules/
+        base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        self.rules_dir = os.path.join(base_dir, "rules")
         if rules_path is None:
-             # Resolve relative to this file: backend/app/core/rule_engine.py -> backend/rules/default_rules.yaml
-             base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-             rules_path = os.path.join(base_dir, "rules", "default_rules.yaml")
-        
+             rules_path = os.path.join(self.rules_dir, "default_rules.yaml")
+        self.rules_path = rules_path
+        self._rules_mtime = None
+
+        # Bounded LRU of fingerprint -> ResolvedRuleSet
+        self._cache: "OrderedDict[str, ResolvedRuleSet]" = OrderedDict()
+        self._cache_size = settings.RULE_CACHE_SIZE
+        self._lock = threading.Lock()
+
         self._load_rules(rules_path)
 
     def _load_rules(self, path: str):
         if not os.path.exists(path):
-             import logging
-             logging.getLogger(__name__).warning(f"Warning: Rules file not found at {path}")
+             logger.warning(f"Warning: Rules file not found at {path}")
              return
 
+        self._rules_mtime = os.stat(path).st_mtime_ns
         with open(path, 'r') as f:
             data = yaml.safe_load(f)
-            self.rules = data.get("rules", [])
+            self.rules = self._validate_rules(data.get("rules", []), path)
+
+    @staticmethod
+    def _validate_rules(rules: List[Dict[str, Any]], source: str) -> List[Dict[str, Any]]:
+        """
+        Drops rules that would otherwise fail or hang at scan time (missing keys,
+        bad regex, exponential backtracking).
+        """
+        valid = []
+        for rule in rules or []:
+            if not isinstance(rule, dict) or any(k not in rule for k in REQUIRED_RULE_KEYS):
+                logger.error(f"Skipping malformed rule in {source}: {rule}")
+                continue
+            try:
+                re.compile(rule["pattern"])
+            except (re.error, TypeError) as e:
+                logger.error(f"Skipping rule {rule['id']} in {source}: invalid pattern ({e})")
+                continue
+            if settings.RULE_REJECT_BACKTRACKING and has_catastrophic_backtracking(rule["pattern"]):
+                logger.error(f"Skipping rule {rule['id']} in {source}: pattern is prone to catastrophic backtracking")
+                continue
+            valid.append(rule)
+        return valid
+
+    def _pack_mtimes(self) -> str:
+        """
+        Cheap change marker for the rules directory: one stat per pack file.
+        """
+        try:
+            entries = sorted(
+                (e.name, e.stat().st_mtime_ns) for e in os.scandir(self.rules_dir) if e.name.endswith("_rules.yaml")
+            )
+        except OSError:
+            entries = []
+        return ";".join(f"{name}:{mtime}" for name, mtime in entries)
+
+    def _cache_key(self, override_config: str) -> str:
+        digest = hashlib.sha256()
+        digest.update((override_config or "").encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(self._pack_mtimes().encode("utf-8"))
+        return digest.hexdigest()
+
+    def resolve(self, override_config: str = None) -> ResolvedRuleSet:
+        """
+        Returns the (cached) resolved rule set for an override config.
+        """
+        key = self._cache_key(override_config)
+        with self._lock:
+            resolved = self._cache.get(key)
+            if resolved is not None:
+                self._cache.move_to_end(key)
+                return resolved
+
+        resolved = self._build(override_config)
+
+        with self._lock:
+            self._cache[key] = resolved
+            self._cache.move_to_end(key)
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return resolved
+
+    def _build(self, override_config: str = None) -> ResolvedRuleSet:
+        # Pick up edits to the default pack (the cache key already changed with its mtime)
+        if os.path.exists(self.rules_path) and os.stat(self.rules_path).st_mtime_ns != self._rules_mtime:
+            self._load_rules(self.rules_path)
 
-    def get_rules(self, override_config: str = None) -> List[Dict[str, Any]]:
         current_rules = self.rules
-        
+
         if override_config:
             try:
                 data = yaml.safe_load(override_config)
-                
+            except Exception as e:
+                logger.error(f"Error parsing override config: {e}")
+                return ResolvedRuleSet(self.rules)
+
+            enforcement_mode = "blocking"
+            try:
+                enforcement_mode = data.get("enforcement_mode", "blocking").lower()
+            except Exception:
+                pass
+
+            try:
                 # 1. Check for Rule Pack Selection
                 rule_pack = data.get("rule_pack", "default")
                 if rule_pack != "default":
-                    base_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-                    pack_path = os.path.join(base_dir, "rules", f"{rule_pack}_rules.yaml")
-                    
+                    pack_path = os.path.join(self.rules_dir, f"{rule_pack}_rules.yaml")
+
                     if os.path.exists(pack_path):
                         with open(pack_path, 'r') as f:
                             pack_data = yaml.safe_load(f)
                             # Append pack rules to default rules
-                            current_rules = self.rules + pack_data.get("rules", [])
-                
+                            current_rules = self.rules + self._validate_rules(pack_data.get("rules", []), pack_path)
+
                 # 2. Check for Custom Rules Override
                 if "rules" in data:
-                    return data["rules"] # If specific rules provided, use ONLY those (or should we merge? Design choice: Override)
-                
-                return current_rules
+                    # If specific rules provided, use ONLY those (or should we merge? Design choice: Override)
+                    current_rules = self._validate_rules(data["rules"], ".ai-guardrails.yaml")
+
+                return ResolvedRuleSet(current_rules, enforcement_mode, data)
 
             except Exception as e:
-                import logging
-                logging.getLogger(__name__).error(f"Error parsing override config: {e}")
-                return self.rules
-                
-        return current_rules
-        return self.rules
+                logger.error(f"Error parsing override config: {e}")
+                return ResolvedRuleSet(self.rules, enforcement_mode)
+
+        return ResolvedRuleSet(current_rules)
+
+    def get_rules(self, override_config: str = None) -> List[Dict[str, Any]]:
+        return self.resolve(override_config).rules
 
 rule_engine = RuleEngine()
@@ -0,0 +1,566 @@
+import re
+import time
+import threading
+from bisect import bisect_left
+from typing import List, Dict, Any, Optional, Set, Tuple
+from app.models.scan import Violation
+from app.core.config import settings
+
+try:
+    from re import _parser as _sre_parse  # Python 3.11+
+except ImportError:  # pragma: no cover
+    import sre_parse as _sre_parse
+
+# Leading global inline flags, e.g. "(?i)" in "(?i)eval\s*\(".
+# Python 3.11+ rejects global flags anywhere but the start of an expression,
+# so they must be rewritten as scoped groups before patterns are OR-ed together.
+_GLOBAL_FLAGS_RE = re.compile(r"^\(\?([aiLmsux]+)\)")
+# Backreferences are numbered/named relative to the whole expression and would
+# point at the wrong group once combined.
+_BACKREF_RE = re.compile(r"\\[1-9]|\(\?P=")
+# Buffer-absolute anchors and lookbehinds see neighbouring lines when searched over
+# the whole buffer, so such rules cannot be prefiltered and are checked on every line.
+_LINE_ONLY_RE = re.compile(r"\\A|\\Z|\(\?<[=!]")
+
+# Literals shorter than this match too many lines to be worth prefiltering on
+MIN_LITERAL_LENGTH = 3
+
+_MAXREPEAT = _sre_parse.MAXREPEAT
+_REPEATS = (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT)
+# Opcodes that always consume a character
+_CONSUMING = (_sre_parse.LITERAL, _sre_parse.NOT_LITERAL, _sre_parse.IN, _sre_parse.ANY)
+
+# Character sets for the ambiguity check are compared over Latin-1 plus _OTHER,
+# which stands in for every character beyond it
+_OTHER = 256
+_ALPHABET = frozenset(range(_OTHER + 1))
+_CATEGORIES = {
+    getattr(_sre_parse, f"CATEGORY_{name}"): frozenset(
+        [c for c in range(_OTHER) if re.match(escape, chr(c))] + [_OTHER]
+    )
+    for name, escape in (("DIGIT", r"\d"), ("NOT_DIGIT", r"\D"), ("SPACE", r"\s"), ("NOT_SPACE", r"\S"),
+                         ("WORD", r"\w"), ("NOT_WORD", r"\W"))
+}
+# Alternations that expand to more shapes than this are not checked for ambiguity
+_MAX_EXPANSION = 64
+
+# (hits, timeouts, seconds per rule, searches per rule); hits/timeouts are (rule index, line)
+ScanOutcome = Tuple[List[Tuple[int, int]], List[Tuple[int, int]], List[float], List[int]]
+
+
+def _scoped(pattern: str) -> str:
+    """
+    Rewrites a single rule pattern so it can be embedded in a larger alternation.
+    """
+    m = _GLOBAL_FLAGS_RE.match(pattern)
+    if m:
+        # Scoped groups only accept i/m/s/x; a/L/u are implied for str patterns anyway
+        flags = "".join(f for f in m.group(1) if f in "imsx")
+        body = pattern[m.end():]
+        return f"(?{flags}:{body})" if flags else f"(?:{body})"
+    return f"(?:{pattern})"
+
+
+def _better(a: Optional[Set[str]], b: Optional[Set[str]]) -> Optional[Set[str]]:
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return a if min(map(len, a)) >= min(map(len, b)) else b
+
+
+def _required_literals(parsed) -> Optional[Set[str]]:
+    """
+    Returns a set of lowercase ASCII literals such that every match of the parsed
+    (sub)pattern contains at least one of them, or None if no such set is known.
+    """
+    best = None
+    run = []
+
+    def flush():
+        nonlocal best
+        if run:
+            best = _better(best, {"".join(run).lower()})
+            run.clear()
+
+    for op, av in parsed:
+        if op is _sre_parse.LITERAL and av < 128:
+            run.append(chr(av))
+            continue
+        flush()
+        candidate = None
+        if op is _sre_parse.SUBPATTERN:
+            candidate = _required_literals(av[-1])
+        elif op is _sre_parse.BRANCH:
+            alternatives = [_required_literals(alt) for alt in av[1]]
+            if alternatives and all(alternatives):
+                candidate = set().union(*alternatives)
+        elif op in (_sre_parse.MAX_REPEAT, _sre_parse.MIN_REPEAT) and av[0] >= 1:
+            candidate = _required_literals(av[2])
+        best = _better(best, candidate)
+    flush()
+    return best
+
+
+def _can_repeat_empty_handed(parsed) -> bool:
+    """
+    True if the sequence has no mandatory character outside its unbounded repeats,
+    i.e. nothing separates one inner repetition from the next.
+    """
+    for op, av in parsed:
+        if op in _CONSUMING:
+            return False
+        if op is _sre_parse.SUBPATTERN and not _can_repeat_empty_handed(av[-1]):
+            return False
+        if op in _REPEATS and av[1] != _MAXREPEAT and av[0] >= 1 and not _can_repeat_empty_handed(av[2]):
+            return False
+    return True
+
+
+def _contains_unbounded_repeat(parsed) -> bool:
+    for op, av in parsed:
+        if op in _REPEATS and av[1] == _MAXREPEAT:
+            return True
+        if op is _sre_parse.SUBPATTERN and _contains_unbounded_repeat(av[-1]):
+            return True
+        if op is _sre_parse.BRANCH and any(_contains_unbounded_repeat(b) for b in av[1]):
+            return True
+    return False
+
+
+def _char_set(op, av) -> Optional[frozenset]:
+    """
+    Characters one consuming opcode accepts, over _ALPHABET.
+    """
+    if op is _sre_parse.LITERAL:
+        return frozenset((min(av, _OTHER),))
+    if op is _sre_parse.NOT_LITERAL:
+        return _ALPHABET - {av}
+    if op is _sre_parse.ANY:
+        return _ALPHABET - {10}
+    if op is _sre_parse.IN:
+        accepted = set()
+        for item_op, item_av in av:
+            if item_op is _sre_parse.LITERAL:
+                accepted.add(min(item_av, _OTHER))
+            elif item_op is _sre_parse.RANGE:
+                accepted.update(range(item_av[0], min(item_av[1], _OTHER) + 1))
+            elif item_op is _sre_parse.CATEGORY and item_av in _CATEGORIES:
+                accepted.update(_CATEGORIES[item_av])
+            elif item_op is not _sre_parse.NEGATE:
+                return None
+        return _ALPHABET - accepted if av and av[0][0] is _sre_parse.NEGATE else frozenset(accepted)
+    return None
+
+
+def _expand(parsed) -> Optional[List[Tuple[frozenset, ...]]]:
+    """
+    Every string shape a fixed-length (sub)pattern can take, one character set per
+    position, with the alternations sre_parse factored (a|aa -> a(?:|a)) multiplied
+    back out. None for anything else (repeats, anchors, lookarounds...) or when the
+    expansion grows past _MAX_EXPANSION shapes.
+    """
+    shapes = [()]
+    for op, av in parsed:
+        if op is _sre_parse.SUBPATTERN:
+            options = _expand(av[-1])
+        elif op is _sre_parse.BRANCH:
+            options = []
+            for branch in av[1]:
+                expanded = _expand(branch)
+                if expanded is None:
+                    return None
+                options.extend(expanded)
+        else:
+            chars = _char_set(op, av)
+            options = None if chars is None else [(chars,)]
+        if options is None or len(shapes) * len(options) > _MAX_EXPANSION:
+            return None
+        shapes = [shape + option for shape in shapes for option in options]
+    return shapes
+
+
+def _overlaps(a: Tuple[frozenset, ...], b: Tuple[frozenset, ...]) -> bool:
+    """
+    Some string matches both shapes' common-length prefix.
+    """
+    return all(x & y for x, y in zip(a, b))
+
+
+def _ambiguous_alternatives(parsed) -> bool:
+    """
+    True if repeating the body can split one input into iterations in more than one
+    way, e.g. (a|a)* or (a|aa)+: every extra way doubles the work when the rest of
+    the pattern fails. Sardinas-Patterson over the expanded alternatives: follow
+    the suffixes one parse leaves dangling past the other and report when one of
+    them lines up exactly with an alternative.
+    """
+    shapes = _expand(parsed)
+    if not shapes or len(shapes) < 2:
+        return False
+    words = [s for s in shapes if s]
+    # Two alternatives of equal length that accept a common string: (a|a), (\w|\d)
+    for i, a in enumerate(words):
+        for b in words[i + 1:]:
+            if len(a) == len(b) and _overlaps(a, b):
+                return True
+
+    def dangling(prefixes, words):
+        return {w[len(p):] for p in prefixes for w in words if len(w) > len(p) and _overlaps(p, w)}
+
+    seen = set()
+    pending = {w[len(p):] for p in words for w in words if len(w) > len(p) and _overlaps(p, w)}
+    while pending:
+        if any(len(s) == len(w) and _overlaps(s, w) for s in pending for w in words):
+            return True
+        seen |= pending
+        pending = (dangling(pending, words) | dangling(words, pending)) - seen
+    return False
+
+
+def _nested_quantifier(parsed) -> bool:
+    for op, av in parsed:
+        if op in _REPEATS:
+            body = av[2]
+            # (a+)+, (\w+\s?)*: an unbounded repeat of a body that is itself only
+            # repeats, so one input splits into exponentially many iterations
+            if av[1] == _MAXREPEAT and _contains_unbounded_repeat(body) and _can_repeat_empty_handed(body):
+                return True
+            # (a|aa)+, (a|a)*: alternatives that can tile the same input differently
+            if av[1] == _MAXREPEAT and _ambiguous_alternatives(body):
+                return True
+            if _nested_quantifier(body):
+                return True
+        elif op is _sre_parse.SUBPATTERN and _nested_quantifier(av[-1]):
+            return True
+        elif op is _sre_parse.BRANCH and any(_nested_quantifier(b) for b in av[1]):
+            return True
+    return False
+
+
+def _is_wildcard(parsed) -> bool:
+    """
+    ".", "[^...]" or a single negated literal: matches almost anything.
+    """
+    if len(parsed) != 1:
+        return False
+    op, av = parsed[0]
+    if op in (_sre_parse.ANY, _sre_parse.NOT_LITERAL):
+        return True
+    return op is _sre_parse.IN and bool(av) and av[0][0] is _sre_parse.NEGATE
+
+
+def _wildcard_degree(parsed) -> int:
+    """
+    Unbounded wildcard repeats along the worst path through the pattern. Each one
+    multiplies the backtracking work per start position by the line length, so
+    ".*x.*y.*" costs O(n^3) on a line that almost matches.
+    """
+    degree = 0
+    for op, av in parsed:
+        if op in _REPEATS:
+            if av[1] == _MAXREPEAT and _is_wildcard(av[2]):
+                degree += 1
+            else:
+                degree += _wildcard_degree(av[2])
+        elif op is _sre_parse.SUBPATTERN:
+            degree += _wildcard_degree(av[-1])
+        elif op is _sre_parse.BRANCH:
+            degree += max((_wildcard_degree(b) for b in av[1]), default=0)
+    return degree
+
+
+# Two wildcards (e.g. SAST-004's "SELECT.*\+.*") stay quadratic and cheap under the line cap
+MAX_WILDCARD_DEGREE = 2
+
+
+def has_catastrophic_backtracking(pattern: str) -> bool:
+    """
+    Load-time check for patterns whose matching time can explode: nested unbounded
+    quantifiers with nothing mandatory between the inner repetitions (exponential),
+    unbounded repeats of fixed-length alternatives that can tile one input in two
+    ways, like (a|aa)+ or (a|a)* (exponential), or more than MAX_WILDCARD_DEGREE
+    unbounded wildcards in sequence (high-degree polynomial).
+
+    A heuristic, not a proof. Missed: ambiguous alternatives of variable length such
+    as (a|a?b)*, bounded repeats like (a|aa){1,30}, and polynomial blow-ups from adjacent overlapping repeats like
+    \d+\d+\d+x. The per-file time budget in RuleMatcher is the backstop.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern)
+        return _nested_quantifier(parsed) or _wildcard_degree(parsed) > MAX_WILDCARD_DEGREE
+    except Exception:
+        return False
+
+
+class RuleStats:
+    """
+    Process-wide cumulative matching cost per rule id (all packs and overrides).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stats: Dict[str, List[float]] = {}
+
+    def record(self, rules: List[Dict[str, Any]], outcome: ScanOutcome):
+        _, timeouts, seconds, searches = outcome
+        with self._lock:
+            for rule, spent, count in zip(rules, seconds, searches):
+                if count:
+                    entry = self._stats.setdefault(rule["id"], [0.0, 0, 0])
+                    entry[0] += spent
+                    entry[1] += count
+            for rule_idx, _ in timeouts:
+                self._stats.setdefault(rules[rule_idx]["id"], [0.0, 0, 0])[2] += 1
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Slowest rules first.
+        """
+        with self._lock:
+            items = sorted(self._stats.items(), key=lambda x: x[1][0], reverse=True)
+            return {
+                rule_id: {"seconds": round(spent, 6), "searches": count, "timeouts": timeouts}
+                for rule_id, (spent, count, timeouts) in items
+            }
+
+
+rule_stats = RuleStats()
+
+
+def _literals_for(pattern: str) -> Optional[Set[str]]:
+    try:
+        literals = _required_literals(_sre_parse.parse(pattern))
+    except Exception:
+        return None
+    if not literals or min(map(len, literals)) < MIN_LITERAL_LENGTH:
+        return None
+    return literals
+
+
+class RuleMatcher:
+    """
+    Compiled, single-pass matcher for a list of regex rules.
+
+    Every rule is reduced to the literals any of its matches must contain. For ASCII
+    content one combined alternation of those literals is searched over the lowercased
+    buffer; rules without usable literals share a second combined alternation of their
+    full patterns. Hits only nominate candidate lines, which are then confirmed rule by
+    rule, so clean lines cost one pass of the combined automata instead of one
+    `re.search` per rule.
+
+    Guarded execution: lines longer than `max_line_length` are matched in bounded,
+    overlapping windows, and a rule that spends more than `time_budget` seconds on one
+    file is dropped for the rest of that file and reported as SYS-RULE-TIMEOUT. A single
+    `re` call cannot be interrupted, so the budget is checked between calls; the line
+    windows and the load-time backtracking check keep each call short.
+    """
+
+    def __init__(self, rules: List[Dict[str, Any]], max_line_length: int = None, time_budget: float = None):
+        self.rules = rules
+        self.max_line_length = settings.RULE_MAX_LINE_LENGTH if max_line_length is None else max_line_length
+        if time_budget is None:
+            time_budget = settings.RULE_TIME_BUDGET_MS / 1000.0
+        self.time_budget = time_budget
+        self.patterns = [re.compile(rule["pattern"]) for rule in rules]
+        self.line_only = any(_LINE_ONLY_RE.search(r["pattern"]) for r in rules)
+
+        literals = [_literals_for(r["pattern"]) for r in rules]
+        all_literals = set().union(*[l for l in literals if l])
+        self.literal_prefilter = None
+        if all_literals:
+            # Longest first so a shorter literal never shadows a longer one at the same offset
+            ordered = sorted(all_literals, key=lambda l: (-len(l), l))
+            self.literal_prefilter = re.compile("|".join(re.escape(l) for l in ordered))
+        self.regex_prefilters = self._build_prefilters([r for r, l in zip(rules, literals) if not l])
+        self.fallback_prefilters = self._build_prefilters(rules)
+
+    def _build_prefilters(self, rules: List[Dict[str, Any]]) -> List[re.Pattern]:
+        if not rules:
+            return []
+        # MULTILINE so "^"/"$" hold at every line boundary, as they do on isolated lines
+        if not any(_BACKREF_RE.search(r["pattern"]) for r in rules):
+            try:
+                return [re.compile("|".join(_scoped(r["pattern"]) for r in rules), re.MULTILINE)]
+            except re.error:
+                pass
+        # Exotic patterns (backreferences, clashing group names): prefilter rule by rule
+        return [re.compile(r["pattern"], re.MULTILINE) for r in rules]
+
+    @staticmethod
+    def newline_index(content: str) -> List[int]:
+        """
+        Offsets of every '\\n' in content, used to map match offsets to line numbers.
+        """
+        index = []
+        pos = content.find("\n")
+        while pos != -1:
+            index.append(pos)
+            pos = content.find("\n", pos + 1)
+        return index
+
+    @staticmethod
+    def _hit_lines(pattern: re.Pattern, buffer: str, newlines: List[int], candidates: set):
+        pos = 0
+        end = len(buffer)
+        while pos <= end:
+            m = pattern.search(buffer, pos)
+            if m is None:
+                return
+            line_idx = bisect_left(newlines, m.start())
+            candidates.add(line_idx)
+            # Resume at the start of the next line; one hit per line is enough
+            if line_idx >= len(newlines):
+                return
+            pos = newlines[line_idx] + 1
+
+    def _candidate_lines(self, content: str, newlines: List[int]):
+        """
+        Returns sorted 0-based indexes of lines on which at least one rule may match.
+        """
+        if self.line_only:
+            return range(len(newlines) + 1)
+
+        candidates = set()
+        long_lines = self._long_lines(content, newlines)
+        if content.isascii():
+            # ASCII lowercasing preserves offsets, and literals were lowercased at build time
+            if self.literal_prefilter is not None:
+                self._hit_lines(self.literal_prefilter, content.lower(), newlines, candidates)
+            prefilters = self.regex_prefilters
+        else:
+            prefilters = self.fallback_prefilters
+
+        if prefilters and long_lines:
+            # Regex prefilters could backtrack across a huge line: blank those lines out
+            # (keeping offsets) and send them straight to windowed confirmation instead
+            candidates.update(long_lines)
+            pieces = []
+            pos = 0
+            for line_idx in long_lines:
+                start = newlines[line_idx - 1] + 1 if line_idx > 0 else 0
+                end = newlines[line_idx] if line_idx < len(newlines) else len(content)
+                pieces.append(content[pos:start])
+                pieces.append(" " * (end - start))
+                pos = end
+            pieces.append(content[pos:])
+            content = "".join(pieces)
+        for pattern in prefilters:
+            self._hit_lines(pattern, content, newlines, candidates)
+        return sorted(candidates)
+
+    def _long_lines(self, content: str, newlines: List[int]) -> List[int]:
+        cap = self.max_line_length
+        if not cap or len(content) <= cap:
+            return []
+        long_lines = []
+        previous = -1
+        for line_idx, pos in enumerate(newlines + [len(content)]):
+            if pos - previous - 1 > cap:
+                long_lines.append(line_idx)
+            previous = pos
+        return long_lines
+
+    def _search(self, pattern: re.Pattern, line: str) -> bool:
+        cap = self.max_line_length
+        if not cap or len(line) <= cap:
+            return pattern.search(line) is not None
+        # Bounded windows: each call sees at most `cap` characters. Matches up to
+        # `overlap` long are never split across windows.
+        overlap = cap // 4
+        step = cap - overlap
+        length = len(line)
+        for pos in range(0, length, step):
+            endpos = min(length, pos + cap)
+            m = pattern.search(line, pos, endpos)
+            if m is not None:
+                # "$" also matches at an artificial window end: confirm in place
+                if m.end() < endpos or endpos == length or pattern.match(line, m.start()):
+                    return True
+            if endpos == length:
+                break
+        return False
+
+    def scan(self, filename: str, content: str, line_ranges: List[Tuple[int, int]] = None) -> List[Violation]:
+        """
+        Produces the same violations, in the same order (line, then rule), as
+        applying every rule with `re.search` to every line of content.
+
+        With `line_ranges` (1-based, inclusive, sorted, non-overlapping) only those
+        lines are scanned; line numbers stay absolute.
+        """
+        outcome = self.scan_hits(content, line_ranges)
+        rule_stats.record(self.rules, outcome)
+        return self.to_violations(filename, outcome)
+
+    def to_violations(self, filename: str, outcome: ScanOutcome) -> List[Violation]:
+        hits, timeouts = outcome[0], outcome[1]
+        violations = []
+        for rule_idx, line_number in hits:
+            rule = self.rules[rule_idx]
+            violations.append(Violation(
+                rule_id=rule["id"],
+                message=rule["message"],
+                severity=rule["severity"],
+                file_path=filename,
+                line_number=line_number,
+                category=rule["category"]
+            ))
+        for rule_idx, line_number in timeouts:
+            violations.append(Violation(
+                rule_id="SYS-RULE-TIMEOUT",
+                category="SYSTEM",
+                severity="WARNING",
+                message=(
+                    f"Rule {self.rules[rule_idx]['id']} exceeded its {self.time_budget * 1000:.0f}ms matching budget; "
+                    f"lines from {line_number} on were not checked against it."
+                ),
+                file_path=filename,
+                line_number=line_number
+            ))
+        return violations
+
+    def scan_hits(self, content: str, line_ranges: List[Tuple[int, int]] = None) -> ScanOutcome:
+        """
+        `scan` as compact (rule index, line number) pairs plus per-rule timings;
+        cheap to ship between processes.
+        """
+        outcome = ([], [], [0.0] * len(self.rules), [0] * len(self.rules))
+        if not self.rules:
+            return outcome
+        if line_ranges is None:
+            self._scan_buffer(content, 0, outcome)
+            return outcome
+
+        newlines = self.newline_index(content)
+        for start_line, end_line in line_ranges:
+            if start_line > len(newlines) + 1:
+                break
+            start = newlines[start_line - 2] + 1 if start_line > 1 else 0
+            end = newlines[end_line - 1] if end_line <= len(newlines) else len(content)
+            self._scan_buffer(content[start:end], start_line - 1, outcome)
+        return outcome
+
+    def _scan_buffer(self, content: str, first_line: int, outcome: ScanOutcome):
+        hits, timeouts, seconds, searches = outcome
+        budget = self.time_budget
+        timed_out = {rule_idx for rule_idx, _ in timeouts}
+        clock = time.perf_counter
+        newlines = self.newline_index(content)
+        for line_idx in self._candidate_lines(content, newlines):
+            start = newlines[line_idx - 1] + 1 if line_idx > 0 else 0
+            end = newlines[line_idx] if line_idx < len(newlines) else len(content)
+            line = content[start:end]
+            # Confirm on the isolated line so anchors and multi-line spans behave exactly as before
+            for rule_idx, pattern in enumerate(self.patterns):
+                if rule_idx in timed_out:
+                    continue
+                began = clock()
+                matched = self._search(pattern, line)
+                seconds[rule_idx] += clock() - began
+                searches[rule_idx] += 1
+                if matched:
+                    hits.append((rule_idx, first_line + line_idx + 1))
+                if budget and seconds[rule_idx] > budget:
+                    timed_out.add(rule_idx)
+                    timeouts.append((rule_idx, first_line + line_idx + 1))
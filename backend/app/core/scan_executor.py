@@ -0,0 +1,125 @@
+import os
+import asyncio
+import logging
+import multiprocessing
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Dict, Any, Tuple
+from app.core.config import settings
+from app.core.rule_matcher import rule_stats
+
+logger = logging.getLogger(__name__)
+
+# --- Worker side -------------------------------------------------------------
+# Compiled matchers by rule-set fingerprint, private to each worker process.
+_WORKER_MATCHER_CACHE_SIZE = 32
+_worker_matchers: "OrderedDict[str, Any]" = OrderedDict()
+
+
+def _init_worker():
+    """
+    Pool initializer: compiles the default rule pack up front, so the first heavy
+    file a worker sees doesn't also pay for building the matcher.
+    """
+    from app.core.rule_engine import rule_engine
+    default = rule_engine.resolve(None)
+    _worker_matchers[default.fingerprint] = default.matcher
+
+
+def _worker_matcher(fingerprint: str, rules: List[Dict[str, Any]]):
+    matcher = _worker_matchers.get(fingerprint)
+    if matcher is None:
+        from app.core.rule_matcher import RuleMatcher
+        matcher = RuleMatcher(rules)
+        _worker_matchers[fingerprint] = matcher
+        while len(_worker_matchers) > _WORKER_MATCHER_CACHE_SIZE:
+            _worker_matchers.popitem(last=False)
+    else:
+        _worker_matchers.move_to_end(fingerprint)
+    return matcher
+
+
+def _scan_static(fingerprint: str, rules: List[Dict[str, Any]], content: str,
+                 line_ranges: List[Tuple[int, int]] = None):
+    # (rule index, line) pairs: pickling thousands of Violation models costs more than the scan
+    return _worker_matcher(fingerprint, rules).scan_hits(content, line_ranges)
+
+
+def _scan_license(filename: str, content: str) -> List[dict]:
+    from app.services.license_scanner import LicenseScanner
+    return LicenseScanner.scan_content(filename, content)
+
+
+# --- Event-loop side ---------------------------------------------------------
+class ScanExecutor:
+    """
+    Runs CPU-bound scanning (regex rules, license checks) for large files in a
+    process pool, so one huge or minified file can't stall the event loop for every
+    other request, /health and the webhook proxy included.
+
+    Files below `threshold_bytes` are scanned inline: for them the round-trip to a
+    worker costs more than the scan. The pool is created on first use and sized to
+    the machine unless SCAN_PROCESS_WORKERS says otherwise.
+    """
+
+    def __init__(self, enabled: bool, workers: int, threshold_bytes: int):
+        self.enabled = enabled
+        self.workers = workers or os.cpu_count() or 1
+        self.threshold_bytes = threshold_bytes
+        self._pool: ProcessPoolExecutor = None
+
+    def offloads(self, content: str) -> bool:
+        return self.enabled and len(content) >= self.threshold_bytes
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # spawn: forking a process that already runs threads (audit writer, LLM SDKs) is unsafe
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            logger.info(f"⚙️ Scan process pool started ({self.workers} workers)")
+        return self._pool
+
+    async def _run(self, fn, *args):
+        for attempt in range(2):
+            pool = self._get_pool()
+            try:
+                return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM, killed). Concurrent scans see the same broken pool;
+                # only the first replaces it.
+                if self._pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self._pool = None
+                logger.error(f"Scan process pool broke (attempt {attempt + 1}); recreating it")
+        # Broke twice: likely this very file kills workers. Scan it in a thread, never on the loop.
+        logger.error(f"Scan process pool broke again; running {fn.__name__} in a thread")
+        return await asyncio.to_thread(fn, *args)
+
+    async def scan_static(self, rule_set, filename: str, content: str, line_ranges: List[Tuple[int, int]] = None):
+        if not self.offloads(content):
+            return rule_set.matcher.scan(filename, content, line_ranges)
+        outcome = await self._run(_scan_static, rule_set.fingerprint, rule_set.rules, content, line_ranges)
+        # Timings are recorded here: the worker's own rule_stats are never read
+        rule_stats.record(rule_set.rules, outcome)
+        return rule_set.matcher.to_violations(filename, outcome)
+
+    async def scan_license(self, filename: str, content: str) -> List[dict]:
+        if not self.offloads(content):
+            return _scan_license(filename, content)
+        return await self._run(_scan_license, filename, content)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+
+scan_executor = ScanExecutor(
+    enabled=settings.SCAN_PROCESS_POOL_ENABLED,
+    workers=settings.SCAN_PROCESS_WORKERS,
+    threshold_bytes=settings.SCAN_PROCESS_THRESHOLD_BYTES,
+)
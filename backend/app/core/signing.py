@@ -0,0 +1,14 @@
+import hmac
+import hashlib
+from app.core.config import settings
+
+# Header carrying the HMAC of backend -> GitHub App payloads, checked by the app
+SIGNATURE_HEADER = "X-Guardrails-Signature"
+
+
+def sign_payload(body: bytes) -> str:
+    """
+    "sha256=<hex>" HMAC of a request body under CALLBACK_SECRET.
+    """
+    digest = hmac.new(settings.CALLBACK_SECRET.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
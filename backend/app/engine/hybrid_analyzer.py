@@ -1,84 +1,170 @@
-from typing import List
+from typing import List, Callable
 from app.models.scan import ScanRequest, ScanResponse, Violation
 from app.services.static_analysis import static_analyzer
-from app.services.llm_service import llm_service
+from app.services.llm_service import llm_service, estimate_tokens
+from app.core.rule_engine import rule_engine
+from app.core.config import settings
+from app.services.license_scanner import LicenseScanner
+from app.engine.result_cache import result_cache
+from app.services.diff_parser import parse_patch, expand_ranges
+from app.services.prompt_builder import build_excerpt, remap_findings
+from app.core.scan_executor import scan_executor
+from app.core.metrics import STATIC_SCAN_SECONDS, LICENSE_SCAN_SECONDS, FILE_ANALYSIS_SECONDS, LLM_PROMPT_TOKENS
 
-# Global Semaphore for STRICT Rate Limiting across ALL requests
+# Rate limiting lives with the LLM clients (app/core/rate_limiter.py): only provider
+# round-trips are throttled, static and license analysis run unbounded (large files
+# in the process pool, see app/core/scan_executor.py).
 import asyncio
-import random
-# Using a global semaphore ensures that even if 5 different webhooks hit us at once,
-# they ALL queue up behind this single lock.
-# Using a global semaphore ensures that even if 5 different webhooks hit us at once,
-# they ALL queue up behind this single lock.
-_GLOBAL_SEMAPHORE = asyncio.Semaphore(1) 
+import time
 
 import logging
 logger = logging.getLogger(__name__) 
 
+class FileScan:
+    """
+    Per-file state carried between the analysis phases of one request.
+    """
+
+    def __init__(self, file: dict):
+        self.filename = file.get("filename", "")
+        self.content = file.get("content", "")
+        self.patch = file.get("patch") or ""
+        self.changed = parse_patch(self.patch)
+        self.line_ranges = None
+        # Excerpt line -> file line when the LLM was shown a minimized prompt
+        self.line_map = None
+        self.cache_key = None
+        self.cached = None
+        self.static_violations: List[Violation] = []
+        self.violations: List[Violation] = []
+
+    @property
+    def is_manifest(self) -> bool:
+        return self.filename.endswith(LicenseScanner.MANIFEST_FILES)
+
+
 class HybridAnalyzer:
-    async def analyze(self, request: ScanRequest) -> ScanResponse:
+    async def analyze(self, request: ScanRequest, on_file_done: Callable[[str, List[Violation]], None] = None) -> ScanResponse:
+        """
+        Runs the full hybrid scan. `on_file_done(filename, violations)` is called as
+        soon as each file's final violations are known (progress / streaming hooks).
+        """
         violations: List[Violation] = []
-        
-        # Define helper for single file processing
-        async def _analyze_file(file):
-            file_violations = []
-            content = file.get("content", "")
-            filename = file.get("filename", "")
-            
-            # 1. Static Analysis
-            static_violations = await static_analyzer.scan_content(filename, content, request.config_override)
-            file_violations.extend(static_violations)
+        rule_set = rule_engine.resolve(request.config_override)
+        cache_stats = {"hits": 0, "misses": 0}
+
+        def _changed_ranges(scan: FileScan):
+            """
+            Line ranges to scan in diff-aware mode, or None for a full-file scan
+            (full mode, or no usable patch, e.g. the pre-commit hook's empty patch).
+            """
+            if rule_set.scan_mode != "diff" or scan.changed is None:
+                return None
+            return expand_ranges(scan.changed, rule_set.diff_context, scan.content.count("\n") + 1)
+
+        def _finish(scan: FileScan):
+            # Fresh results are cached; cached ones become the file's violations
+            if scan.cached is not None:
+                scan.violations = scan.cached
+            else:
+                result_cache.set(scan.cache_key, scan.violations)
+            if on_file_done is not None:
+                on_file_done(scan.filename, scan.violations)
+
+        # Define helper for single file processing (everything except the LLM)
+        async def _prepare_file(file) -> FileScan:
+            started = time.perf_counter()
+            scan = await _analyze_file(file)
+            FILE_ANALYSIS_SECONDS.labels("true" if scan.cached is not None else "false").observe(time.perf_counter() - started)
+            return scan
+
+        async def _analyze_file(file) -> FileScan:
+            scan = FileScan(file)
+            scan.line_ranges = _changed_ranges(scan)
+
+            # 0. Content-addressed cache: byte-identical files skip static + LLM entirely
+            # The patch also shapes the LLM prompt when diff prompts are on
+            diff_prompt = settings.LLM_DIFF_PROMPTS and scan.changed is not None and not scan.is_manifest
+            scope = scan.patch if scan.line_ranges is not None or diff_prompt else ""
+            scan.cache_key = result_cache.make_key(scan.filename, scan.content, rule_set.fingerprint, llm_service.fingerprint, scope)
+            scan.cached = await result_cache.get(scan.cache_key, scan.filename)
+            if scan.cached is not None:
+                cache_stats["hits"] += 1
+                _finish(scan)
+                return scan
+            cache_stats["misses"] += 1
+
+            # 1. Static Analysis (only the changed hunks + context in diff-aware mode)
+            with STATIC_SCAN_SECONDS.time():
+                scan.static_violations = await static_analyzer.scan_content(scan.filename, scan.content, request.config_override, scan.line_ranges)
+            scan.violations.extend(scan.static_violations)
 
             # 1.5 License Scanning
-            from app.services.license_scanner import LicenseScanner
-            if filename.endswith(("package.json", "requirements.txt", "pom.xml")):
-                lic_violations = LicenseScanner.scan_content(filename, content)
+            if scan.is_manifest:
+                with LICENSE_SCAN_SECONDS.time():
+                    lic_violations = await scan_executor.scan_license(scan.filename, scan.content)
                 # Convert dicts to Violation objects
                 for v in lic_violations:
-                    file_violations.append(Violation(**v))
-            
-            # 2. AI Analysis (Needs static context, so must run after static)
-            # Only run AI analysis on code files, skip dependency configs to save tokens/time
-            if not filename.endswith(("package.json", "requirements.txt", "pom.xml")):
-                try:
-                    ai_violations = await llm_service.analyze_diff(filename, content, static_violations)
-                    file_violations.extend(ai_violations)
-                except Exception as e:
-                    logger.warning(f"⚠️ LLM Analysis Failed for {filename}: {e}")
-                    # Add a warning violation so user knows AI check was skipped
-                    file_violations.append(Violation(
-                        rule_id="SYS-LLM-FAIL",
-                        category="SYSTEM",
-                        severity="WARNING",
-                        message=f"AI Analysis unavailable: {str(e)}",
-                        file_path=filename,
-                        line_number=1
-                    ))
-            
-            return file_violations
-
-        # Run all files in parallel, but with concurrency limit to prevent 429s (Free Tier Resilience)
-        async def _bounded_analyze(file):
-            async with _GLOBAL_SEMAPHORE:
-                # Add delay to respect RPM limits (e.g. 15 RPM = 4s/req, but we can burst a little)
-                await asyncio.sleep(2) 
-                return await _analyze_file(file)
-
-        results = await asyncio.gather(*[_bounded_analyze(f) for f in request.files])
-        
-        # Flatten results
-        for res in results:
-            violations.extend(res)
-
-        # Determine Enforcement Mode
-        enforcement_mode = "blocking"
-        if request.config_override:
-            try:
-                import yaml
-                data = yaml.safe_load(request.config_override)
-                enforcement_mode = data.get("enforcement_mode", "blocking").lower()
-            except:
-                pass
+                    scan.violations.append(Violation(**v))
+                # Manifests skip the LLM, so they are done here
+                _finish(scan)
+            return scan
+
+        # Static and license analysis for all files in parallel (no rate limiting)
+        scans = await asyncio.gather(*[_prepare_file(f) for f in request.files])
+
+        # 2. AI Analysis (Needs static context, so must run after static)
+        # Only run AI analysis on code files, skip dependency configs to save tokens/time.
+        # Small files are packed into shared prompts; calls queue on the provider rate limiter.
+        pending = [scan for scan in scans if scan.cached is None and not scan.is_manifest]
+
+        def _ai_item(scan: FileScan):
+            """
+            What the LLM sees for a file: with a patch, only the changed hunks, their
+            enclosing definitions and imports (see app/services/prompt_builder.py).
+            """
+            LLM_PROMPT_TOKENS.labels("file").inc(estimate_tokens(scan.content))
+            excerpt = None
+            if settings.LLM_DIFF_PROMPTS and scan.changed is not None:
+                excerpt = build_excerpt(scan.filename, scan.content, scan.changed, scan.static_violations)
+            if excerpt is None:
+                LLM_PROMPT_TOKENS.labels("sent").inc(estimate_tokens(scan.content))
+                return (scan.filename, scan.content, scan.static_violations)
+            text, scan.line_map, static_context = excerpt
+            LLM_PROMPT_TOKENS.labels("sent").inc(estimate_tokens(text))
+            logger.debug(f"✂️ {scan.filename}: ~{estimate_tokens(scan.content)} -> ~{estimate_tokens(text)} tokens for the LLM")
+            return (scan.filename, text, static_context)
+
+        def _on_ai_result(index: int, ai_result):
+            scan = pending[index]
+            if isinstance(ai_result, Exception):
+                logger.warning(f"⚠️ LLM Analysis Failed for {scan.filename}: {ai_result}")
+                # Add a warning violation so user knows AI check was skipped
+                scan.violations.append(Violation(
+                    rule_id="SYS-LLM-FAIL",
+                    category="SYSTEM",
+                    severity="WARNING",
+                    message=f"AI Analysis unavailable: {str(ai_result)}",
+                    file_path=scan.filename,
+                    line_number=1
+                ))
+            else:
+                if scan.line_map is not None:
+                    ai_result = remap_findings(ai_result, scan.line_map)
+                scan.violations.extend(ai_result)
+            _finish(scan)
+
+        await llm_service.analyze_many(
+            [_ai_item(scan) for scan in pending],
+            on_result=_on_ai_result
+        )
+
+        # Flatten results (request order)
+        for scan in scans:
+            violations.extend(scan.violations)
+
+        # Determine Enforcement Mode (resolved together with the rules, cached per override)
+        enforcement_mode = rule_set.enforcement_mode
 
         # Calculate Success
         # Block on BLOCKING, CRITICAL, or HIGH severity
@@ -91,6 +177,9 @@ class HybridAnalyzer:
         else:
             succeeded = not has_blocking_violations
             summary = f"Found {len(violations)} violations."
+
+        if result_cache.enabled:
+            summary += f" Cache: {cache_stats['hits']} hit(s), {cache_stats['misses']} miss(es)."
         
         return ScanResponse(
             status="success",
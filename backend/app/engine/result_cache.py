@@ -0,0 +1,65 @@
+import os
+import json
+import hashlib
+from typing import List, Optional
+from app.core.cache import TieredCache, CACHE_DIR
+from app.core.config import settings
+from app.models.scan import Violation
+from app.services.license_scanner import LicenseScanner
+from app.services.license_db import license_db
+
+
+class ScanResultCache:
+    """
+    Content-addressed cache of per-file scan results.
+
+    The key covers everything that can change a file's findings: the content bytes,
+    the file extension (which decides static/license/LLM routing), the resolved
+    rule-set fingerprint and the LLM provider/model/prompt version. The file path is
+    not part of the key, so the same vendored file under another name still hits.
+    """
+
+    def __init__(self):
+        self.enabled = settings.SCAN_CACHE_ENABLED
+        self.cache = TieredCache(
+            name="scan_results",
+            db_file=os.path.join(CACHE_DIR, "scan_cache.db"),
+            memory_entries=settings.SCAN_CACHE_MEMORY_ENTRIES,
+            max_entries=settings.SCAN_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.SCAN_CACHE_TTL_SECONDS,
+        ) if self.enabled else None
+
+    @staticmethod
+    def make_key(filename: str, content: str, rules_fingerprint: str, llm_fingerprint: str, scope: str = "") -> str:
+        content_hash = hashlib.sha256(content.encode("utf-8", errors="surrogatepass")).hexdigest()
+        # Manifests route to the license scanner instead of the LLM, so "package.json"
+        # must not share entries with any other ".json" file
+        ext = os.path.splitext(filename)[1]
+        if filename.endswith(LicenseScanner.MANIFEST_FILES):
+            ext = os.path.basename(filename)
+            # Their findings also depend on the license database
+            scope += "\0" + license_db.fingerprint
+        # scope: anything else that narrows the scan, e.g. the patch in diff-aware mode
+        raw = "\0".join([content_hash, ext, rules_fingerprint, llm_fingerprint, scope])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    async def get(self, key: str, filename: str) -> Optional[List[Violation]]:
+        if not self.enabled:
+            return None
+        cached = await self.cache.get(key)
+        if cached is None:
+            return None
+        # Re-attach the current path; the entry may have been produced under another name
+        return [Violation(**v, file_path=filename) for v in json.loads(cached)]
+
+    def set(self, key: str, violations: List[Violation]):
+        if not self.enabled:
+            return
+        # Never persist degraded results (e.g. SYS-LLM-FAIL) - the next push should retry
+        if any(v.rule_id.startswith("SYS-") for v in violations):
+            return
+        payload = [v.dict(exclude={"file_path"}) for v in violations]
+        self.cache.set(key, json.dumps(payload))
+
+
+result_cache = ScanResultCache()
@@ -0,0 +1,330 @@
+import time
+import uuid
+import json
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.scan import ScanRequest, ScanJobRequest, ScanJobStatus, ScanResponse
+from app.core.metrics import SCAN_JOB_QUEUE_DEPTH
+from app.core.outbox import outbox_store, outbox_dispatcher, EVENT_SCAN_JOB
+
+logger = logging.getLogger(__name__)
+
+
+class ScanJobStore:
+    """
+    The `scan_jobs` table in audit.db, used as a persistent work queue.
+
+    Both backend processes (8000 and 8081) run workers against the same table.
+    A worker claims a job under BEGIN IMMEDIATE and holds a time-limited lease that it
+    keeps renewing; a job whose lease expires (worker crashed or was killed) becomes
+    claimable again, up to SCAN_JOB_MAX_ATTEMPTS. Every claim issues a new lease
+    token, and heartbeat / release / finish only apply while the caller still holds
+    it, so a stalled worker that comes back cannot overwrite a reclaimed job.
+    """
+
+    def __init__(self, lease_seconds: int, max_attempts: int, retention_hours: int):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retention_hours = retention_hours
+
+    def enqueue(self, request: ScanJobRequest) -> str:
+        job_id = uuid.uuid4().hex
+        payload = request.dict(exclude={"callback_url"})
+        conn = get_db()
+        conn.execute('''
+            INSERT INTO scan_jobs (id, status, repo, commit_sha, pr_number, request_json, callback_url, files_total, created_at)
+            VALUES (?, 'queued', ?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            job_id, request.repo_full_name, request.commit_sha, request.pr_number,
+            json.dumps(payload), request.callback_url, len(request.files), datetime.utcnow().isoformat()
+        ))
+        conn.commit()
+        conn.close()
+        return job_id
+
+    def claim(self) -> Optional[dict]:
+        """
+        Takes the oldest runnable job (queued, or running with an expired lease),
+        with the lease token to pass to heartbeat / release / finish.
+        """
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            while True:
+                row = conn.execute('''
+                    SELECT id, attempts, request_json, callback_url FROM scan_jobs
+                    WHERE status = 'queued' OR (status = 'running' AND lease_until < ?)
+                    ORDER BY created_at LIMIT 1
+                ''', (now,)).fetchone()
+                if row is None:
+                    conn.commit()
+                    return None
+                if row["attempts"] >= self.max_attempts:
+                    # Died mid-scan too many times; likely the request itself kills the worker
+                    conn.execute('''
+                        UPDATE scan_jobs SET status = 'failed', error = ?, finished_at = ?, lease_until = NULL, lease_token = NULL WHERE id = ?
+                    ''', (f"Gave up after {row['attempts']} attempt(s)", datetime.utcnow().isoformat(), row["id"]))
+                    self._enqueue_callback(conn, row["id"])
+                    continue
+                lease_token = uuid.uuid4().hex
+                conn.execute('''
+                    UPDATE scan_jobs SET status = 'running', attempts = attempts + 1, lease_until = ?,
+                        lease_token = ?, started_at = ?, files_done = 0
+                    WHERE id = ?
+                ''', (now + self.lease_seconds, lease_token, datetime.utcnow().isoformat(), row["id"]))
+                conn.commit()
+                return dict(row, lease_token=lease_token)
+        finally:
+            conn.close()
+
+    def heartbeat(self, job_id: str, lease_token: str, files_done: int) -> bool:
+        """
+        Renews the lease. False if it was lost (expired and reclaimed, or the job is over).
+        """
+        conn = get_db()
+        cursor = conn.execute(
+            "UPDATE scan_jobs SET lease_until = ?, files_done = ? WHERE id = ? AND status = 'running' AND lease_token = ?",
+            (time.time() + self.lease_seconds, files_done, job_id, lease_token)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.rowcount == 1
+
+    def release(self, job_id: str, lease_token: str):
+        """
+        Hands a job back to the queue (shutdown mid-scan), without counting the attempt.
+        """
+        conn = get_db()
+        conn.execute('''
+            UPDATE scan_jobs SET status = 'queued', attempts = MAX(attempts - 1, 0), lease_until = NULL,
+                lease_token = NULL, files_done = 0
+            WHERE id = ? AND status = 'running' AND lease_token = ?
+        ''', (job_id, lease_token))
+        conn.commit()
+        conn.close()
+
+    def finish(self, job_id: str, lease_token: str, response: ScanResponse = None, error: str = None) -> bool:
+        """
+        Stores the outcome and, in the same transaction, queues the job's callback
+        in the outbox (app/core/outbox.py), so it is retried until the receiver
+        gets it. False (nothing stored) if the lease was lost meanwhile: the job
+        belongs to whichever worker reclaimed it.
+        """
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            cursor = conn.execute('''
+                UPDATE scan_jobs SET status = ?, result_json = ?, error = ?, finished_at = ?, lease_until = NULL,
+                    lease_token = NULL, files_done = CASE WHEN ? IS NULL THEN files_total ELSE files_done END
+                WHERE id = ? AND status = 'running' AND lease_token = ?
+            ''', (
+                "failed" if error is not None else "superseded" if response is not None and response.status == "superseded" else "completed",
+                json.dumps(response.dict()) if response is not None else None,
+                error,
+                datetime.utcnow().isoformat(),
+                error,
+                job_id,
+                lease_token
+            ))
+            if cursor.rowcount != 1:
+                conn.rollback()
+                return False
+            self._enqueue_callback(conn, job_id)
+            conn.commit()
+            return True
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    @classmethod
+    def _enqueue_callback(cls, conn, job_id: str):
+        row = conn.execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None or not row["callback_url"]:
+            return
+        outbox_store.enqueue(
+            conn, EVENT_SCAN_JOB, cls._status(row).dict(),
+            idempotency_key=f"scan-job-{job_id}", endpoint=row["callback_url"]
+        )
+
+    def get(self, job_id: str) -> Optional[ScanJobStatus]:
+        conn = get_db()
+        row = conn.execute("SELECT * FROM scan_jobs WHERE id = ?", (job_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return self._status(row)
+
+    @staticmethod
+    def _status(row) -> ScanJobStatus:
+        return ScanJobStatus(
+            job_id=row["id"],
+            status=row["status"],
+            repo_full_name=row["repo"],
+            commit_sha=row["commit_sha"],
+            pr_number=row["pr_number"],
+            files_total=row["files_total"],
+            files_done=row["files_done"],
+            attempts=row["attempts"],
+            created_at=row["created_at"],
+            started_at=row["started_at"],
+            finished_at=row["finished_at"],
+            error=row["error"],
+            result=ScanResponse(**json.loads(row["result_json"])) if row["result_json"] else None
+        )
+
+    def queued_count(self) -> int:
+        conn = get_db()
+        count = conn.execute("SELECT COUNT(*) FROM scan_jobs WHERE status = 'queued'").fetchone()[0]
+        conn.close()
+        return count
+
+    def purge_finished(self) -> int:
+        cutoff = (datetime.utcnow() - timedelta(hours=self.retention_hours)).isoformat()
+        conn = get_db()
+        cursor = conn.execute(
+            "DELETE FROM scan_jobs WHERE status IN ('completed', 'failed', 'superseded') AND finished_at < ?", (cutoff,)
+        )
+        conn.commit()
+        conn.close()
+        return cursor.rowcount
+
+
+class ScanJobWorkers:
+    """
+    Pool of asyncio workers that drain the job store through the normal scan
+    pipeline. Idle workers poll every SCAN_JOB_POLL_INTERVAL_SECONDS, and are woken
+    immediately when this process enqueues a job.
+    """
+
+    def __init__(self, store: ScanJobStore, workers: int, poll_interval: float):
+        self.store = store
+        self.workers = workers
+        self.poll_interval = poll_interval
+        self._tasks = []
+        self._wakeup: asyncio.Event = None
+        # Live progress of jobs running in this process (the DB copy lags by a heartbeat)
+        self._progress: Dict[str, int] = {}
+
+    @property
+    def running(self) -> bool:
+        return any(not t.done() for t in self._tasks)
+
+    async def start(self):
+        if self.running or self.workers <= 0:
+            return
+        self._wakeup = asyncio.Event()
+        await asyncio.to_thread(self.store.purge_finished)
+        self._tasks = [asyncio.create_task(self._run(i)) for i in range(self.workers)]
+        SCAN_JOB_QUEUE_DEPTH.set_function(self.store.queued_count)
+        logger.info(f"🧵 Scan job workers started ({self.workers})")
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: ScanJobRequest) -> ScanJobStatus:
+        job_id = await asyncio.to_thread(self.store.enqueue, request)
+        if self._wakeup is not None:
+            self._wakeup.set()
+        return ScanJobStatus(
+            job_id=job_id,
+            status="queued",
+            repo_full_name=request.repo_full_name,
+            commit_sha=request.commit_sha,
+            pr_number=request.pr_number,
+            files_total=len(request.files)
+        )
+
+    async def get(self, job_id: str) -> Optional[ScanJobStatus]:
+        status = await asyncio.to_thread(self.store.get, job_id)
+        if status is not None and status.status == "running" and job_id in self._progress:
+            status.files_done = self._progress[job_id]
+        return status
+
+    async def _run(self, worker_id: int):
+        while True:
+            try:
+                job = await asyncio.to_thread(self.store.claim)
+            except Exception as e:
+                logger.error(f"Scan job worker {worker_id}: claim failed: {e}")
+                job = None
+            if job is None:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                    self._wakeup.clear()
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(job)
+
+    async def _process(self, job: dict):
+        # Imported here: the pipeline pulls in the analyzer and LLM clients
+        from app.engine.scan_pipeline import run_scan
+
+        job_id, lease_token = job["id"], job["lease_token"]
+        self._progress[job_id] = 0
+
+        def _on_file_done(filename, violations):
+            self._progress[job_id] += 1
+
+        heartbeat = asyncio.create_task(self._heartbeat(job_id, lease_token))
+        response, error = None, None
+        try:
+            request = ScanRequest(**json.loads(job["request_json"]))
+            logger.info(f"▶️ Scan job {job_id} started: {request.repo_full_name}@{request.commit_sha} ({len(request.files)} files)")
+            response = await run_scan(request, on_file_done=_on_file_done)
+        except asyncio.CancelledError:
+            # Shutting down: give the job back instead of waiting for the lease to expire
+            heartbeat.cancel()
+            self._progress.pop(job_id, None)
+            # Off the loop, and shielded so the release still lands if the caller is cancelled again
+            await asyncio.shield(asyncio.to_thread(self.store.release, job_id, lease_token))
+            raise
+        except Exception as e:
+            logger.exception(f"Scan job {job_id} failed")
+            error = str(e)
+        finally:
+            heartbeat.cancel()
+
+        stored = await asyncio.to_thread(self.store.finish, job_id, lease_token, response, error)
+        self._progress.pop(job_id, None)
+        if not stored:
+            logger.warning(f"⚠️ Scan job {job_id}: lease lost mid-scan, result discarded (another worker owns the job)")
+            return
+        outcome = "failed" if error is not None else response.status if response.status == "superseded" else "completed"
+        logger.info(f"⏹️ Scan job {job_id} {outcome}")
+
+        if job["callback_url"]:
+            outbox_dispatcher.notify()
+
+    async def _heartbeat(self, job_id: str, lease_token: str):
+        interval = max(1.0, self.store.lease_seconds / 3)
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await asyncio.to_thread(self.store.heartbeat, job_id, lease_token, self._progress.get(job_id, 0)):
+                    logger.warning(f"⚠️ Scan job {job_id}: lease lost, the result of this run will be discarded")
+                    return
+            except Exception as e:
+                logger.warning(f"Scan job {job_id}: heartbeat failed: {e}")
+
+
+scan_job_store = ScanJobStore(
+    lease_seconds=settings.SCAN_JOB_LEASE_SECONDS,
+    max_attempts=settings.SCAN_JOB_MAX_ATTEMPTS,
+    retention_hours=settings.SCAN_JOB_RETENTION_HOURS,
+)
+scan_jobs = ScanJobWorkers(
+    store=scan_job_store,
+    workers=settings.SCAN_JOB_WORKERS,
+    poll_interval=settings.SCAN_JOB_POLL_INTERVAL_SECONDS,
+)
@@ -0,0 +1,119 @@
+import asyncio
+import logging
+from typing import AsyncIterator, Callable, List
+from app.models.scan import ScanRequest, ScanResponse, Violation
+from app.engine.hybrid_analyzer import analyzer
+from app.engine.single_flight import scan_coalescer
+from app.engine.scan_registry import scan_registry
+from app.core.audit import audit_logger
+from app.core.override_index import override_index
+from app.core.rule_engine import rule_engine
+from app.core.metrics import SCANS_IN_FLIGHT
+
+logger = logging.getLogger(__name__)
+
+
+async def run_scan(request: ScanRequest, on_file_done: Callable[[str, List[Violation]], None] = None) -> ScanResponse:
+    """
+    One complete scan as served by `POST /scan` and the job workers: admin-override
+    check, analysis and audit logging.
+    """
+    # Check for Admin Override (Persistence) before spending any analysis or LLM time
+    repo = request.repo_full_name
+    sha = request.commit_sha
+
+    coalesced = None
+    if override_index.is_overridden(repo, sha):
+        logger.info(f"🔒 Override detected for {repo}@{sha}. Skipping analysis, forcing success.")
+        if on_file_done is not None:
+            for file in request.files:
+                on_file_done(file.get("filename", ""), [])
+        response = ScanResponse(
+            status="success",
+            violations=[],
+            succeeded=True,
+            summary="Commit overridden by admin; analysis skipped.",
+            enforcement_mode=rule_engine.resolve(request.config_override).enforcement_mode
+        )
+    else:
+        # Identical concurrent requests (webhook redeliveries etc.) share one analysis
+        try:
+            response, coalesced = await scan_coalescer.run(request, _analyze, on_file_done)
+        except asyncio.CancelledError:
+            # The analysis (not this caller) was cancelled because the PR got a newer head
+            newer_sha = scan_registry.superseded_by(request)
+            if newer_sha is None or asyncio.current_task().cancelling():
+                raise
+            await audit_logger.log_superseded(request, newer_sha)
+            return ScanResponse(
+                status="superseded",
+                violations=[],
+                succeeded=False,
+                summary=f"Scan cancelled: superseded by newer commit {newer_sha}.",
+                enforcement_mode=rule_engine.resolve(request.config_override).enforcement_mode
+            )
+        # An override may have landed while the scan was running
+        if override_index.is_overridden(repo, sha):
+            logger.info(f"🔒 Override detected for {repo}@{sha}. Forcing Success.")
+            response.succeeded = True
+            response.violations = [] # Clear violations so it doesn't block
+
+    await audit_logger.log_scan(request, response, coalesced=coalesced)
+    return response
+
+
+async def _analyze(request: ScanRequest, on_file_done: Callable[[str, List[Violation]], None]) -> ScanResponse:
+    # Registered per PR, so a newer head sha can cancel this task (see ScanRegistry)
+    async with scan_registry.track(request):
+        with SCANS_IN_FLIGHT.track_inprogress():
+            return await analyzer.analyze(request, on_file_done=on_file_done)
+
+
+async def stream_scan(request: ScanRequest) -> AsyncIterator[dict]:
+    """
+    `run_scan` as a sequence of frames for `POST /scan/stream`:
+
+    - {"type": "start", "files_total", "enforcement_mode"}
+    - {"type": "file", "file_path", "violations"} as soon as each file completes
+    - {"type": "summary", ...ScanResponse fields except violations, "violations_count"}
+      or {"type": "error", "detail"} if the scan failed.
+
+    If the client goes away mid-stream the scan is cancelled.
+    """
+    frames: asyncio.Queue = asyncio.Queue()
+
+    def _on_file_done(filename: str, violations: List[Violation]):
+        frames.put_nowait({
+            "type": "file",
+            "file_path": filename,
+            "violations": [v.dict() for v in violations]
+        })
+
+    yield {
+        "type": "start",
+        "files_total": len(request.files),
+        "enforcement_mode": rule_engine.resolve(request.config_override).enforcement_mode
+    }
+
+    task = asyncio.create_task(run_scan(request, on_file_done=_on_file_done))
+    task.add_done_callback(lambda _: frames.put_nowait(None))
+    try:
+        while True:
+            frame = await frames.get()
+            if frame is None:
+                break
+            yield frame
+    finally:
+        if not task.done():
+            task.cancel()
+
+    try:
+        response = task.result()
+    except Exception as e:
+        logger.exception("Streaming scan failed")
+        yield {"type": "error", "detail": str(e)}
+        return
+
+    summary = response.dict(exclude={"violations"})
+    summary["violations_count"] = len(response.violations)
+    yield {"type": "summary", **summary}
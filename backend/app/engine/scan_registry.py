@@ -0,0 +1,203 @@
+import time
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.core.database import get_db
+from app.models.scan import ScanRequest
+from app.core.metrics import SCANS_SUPERSEDED
+
+logger = logging.getLogger(__name__)
+
+PullRequestKey = Tuple[str, int]
+
+# Remembered (repo, pr, sha) -> newer sha verdicts, for the cancelled callers
+_SUPERSEDED_MEMORY = 4096
+# scan_heads / scan_shas rows untouched this long are dropped at startup
+_HEAD_RETENTION_SECONDS = 7 * 24 * 3600
+
+
+class _ActiveScan:
+    def __init__(self, sha: str, task: asyncio.Task, seq: int, head_seq: int):
+        self.sha = sha
+        self.task = task
+        self.seq = seq
+        # Newest head of the PR known when this scan registered. A late redelivery of an
+        # older sha starts below the head and is only superseded once the head moves again
+        self.seen_head = max(seq, head_seq)
+
+
+class ScanRegistry:
+    """
+    In-flight PR scans keyed by (repo, pr_number). GitHub only gates on the latest
+    head, so when a newer commit_sha of the same PR starts scanning, the analysis
+    task of the older one is cancelled - LLM calls still queued on the rate limiter
+    included - and its callers get a "superseded" response instead of a result.
+
+    "Newer" is the order in which a PR's shas were first seen (`scan_shas`, shared by
+    both processes), not arrival order: GitHub redelivering the webhook of an older,
+    already scanned sha must not cancel the scan of the current head.
+
+    Within a process this happens as the newer scan registers. Scans running in the
+    other backend process (8000/8081, e.g. scan-job workers) are reached through the
+    `scan_heads` table: registrations move the PR's head forward (never back), and a
+    watcher polls the heads of PRs with scans in flight every
+    SCAN_SUPERSEDE_POLL_SECONDS.
+    """
+
+    def __init__(self, enabled: bool, poll_interval: float):
+        self.enabled = enabled
+        self.poll_interval = poll_interval
+        self._active: Dict[PullRequestKey, List[_ActiveScan]] = {}
+        self._superseded: "OrderedDict[Tuple[str, int, str], str]" = OrderedDict()
+        self._watcher: Optional[asyncio.Task] = None
+
+    async def start(self):
+        if not self.enabled or self._watcher is not None:
+            return
+        await asyncio.to_thread(self._purge_heads)
+        self._watcher = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._watcher is not None:
+            self._watcher.cancel()
+            await asyncio.gather(self._watcher, return_exceptions=True)
+            self._watcher = None
+
+    def superseded_by(self, request: ScanRequest) -> Optional[str]:
+        """
+        The commit that superseded this request's scan, if it was.
+        """
+        return self._superseded.get((request.repo_full_name, request.pr_number, request.commit_sha))
+
+    @asynccontextmanager
+    async def track(self, request: ScanRequest):
+        """
+        Registers the current task as the scan of request's PR head for its duration,
+        cancelling scans of older heads of the same PR.
+        """
+        if not self.enabled or request.pr_number is None:
+            yield
+            return
+
+        key = (request.repo_full_name, request.pr_number)
+        try:
+            seq, head_seq = await asyncio.to_thread(self._observe, key, request.commit_sha)
+        except Exception as e:
+            # Without the shared order nothing can be safely superseded; just scan
+            logger.warning(f"Could not record PR head for {key[0]}#{key[1]}: {e}")
+            seq = None
+        if seq is None:
+            yield
+            return
+
+        scan = _ActiveScan(request.commit_sha, asyncio.current_task(), seq, head_seq)
+        for other in list(self._active.get(key, [])):
+            if other.sha != scan.sha and seq > other.seen_head:
+                self._supersede(key, other, scan.sha)
+
+        self._active.setdefault(key, []).append(scan)
+        try:
+            yield
+        finally:
+            scans = self._active.get(key, [])
+            if scan in scans:
+                scans.remove(scan)
+            if not scans:
+                self._active.pop(key, None)
+
+    def _supersede(self, key: PullRequestKey, scan: _ActiveScan, newer_sha: str):
+        if scan.task is None or scan.task.done():
+            return
+        self._superseded[key + (scan.sha,)] = newer_sha
+        self._superseded.move_to_end(key + (scan.sha,))
+        while len(self._superseded) > _SUPERSEDED_MEMORY:
+            self._superseded.popitem(last=False)
+        SCANS_SUPERSEDED.inc()
+        logger.info(f"⏭️ {key[0]}#{key[1]}: scan of {scan.sha[:7]} superseded by {newer_sha[:7]}, cancelling it")
+        scan.task.cancel()
+
+    @staticmethod
+    def _observe(key: PullRequestKey, sha: str) -> Tuple[int, int]:
+        """
+        Records that sha was seen for the PR and moves the PR's head to it if it is
+        the newest seen. Returns (sequence of sha, sequence of the head).
+        """
+        now = time.time()
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            # First sight fixes a sha's place in the order; redeliveries keep it
+            conn.execute(
+                "INSERT OR IGNORE INTO scan_shas (repo, pr_number, commit_sha, seen_at) VALUES (?, ?, ?, ?)",
+                key + (sha, now)
+            )
+            conn.execute(
+                "UPDATE scan_shas SET seen_at = ? WHERE repo = ? AND pr_number = ? AND commit_sha = ?",
+                (now,) + key + (sha,)
+            )
+            seq = conn.execute(
+                "SELECT seq FROM scan_shas WHERE repo = ? AND pr_number = ? AND commit_sha = ?", key + (sha,)
+            ).fetchone()[0]
+            conn.execute('''
+                INSERT INTO scan_heads (repo, pr_number, commit_sha, seq, updated_at) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT(repo, pr_number) DO UPDATE SET
+                    commit_sha = excluded.commit_sha, seq = excluded.seq, updated_at = excluded.updated_at
+                WHERE excluded.seq > scan_heads.seq
+            ''', key + (sha, seq, now))
+            head_seq = conn.execute(
+                "SELECT seq FROM scan_heads WHERE repo = ? AND pr_number = ?", key
+            ).fetchone()[0]
+            conn.commit()
+            return seq, head_seq
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _read_heads(keys: List[PullRequestKey]) -> Dict[PullRequestKey, Tuple[str, int]]:
+        conn = get_db()
+        try:
+            heads = {}
+            for repo, pr_number in keys:
+                row = conn.execute(
+                    "SELECT commit_sha, seq FROM scan_heads WHERE repo = ? AND pr_number = ?", (repo, pr_number)
+                ).fetchone()
+                if row is not None:
+                    heads[(repo, pr_number)] = (row[0], row[1])
+            return heads
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _purge_heads():
+        conn = get_db()
+        try:
+            cutoff = time.time() - _HEAD_RETENTION_SECONDS
+            conn.execute("DELETE FROM scan_heads WHERE updated_at < ?", (cutoff,))
+            conn.execute("DELETE FROM scan_shas WHERE seen_at < ?", (cutoff,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    async def _watch(self):
+        """
+        Cancels local scans whose PR got a newer head in the other process.
+        """
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            if not self._active:
+                continue
+            try:
+                heads = await asyncio.to_thread(self._read_heads, list(self._active))
+            except Exception as e:
+                logger.warning(f"Scan registry: reading PR heads failed: {e}")
+                continue
+            for key, (sha, head_seq) in heads.items():
+                for scan in list(self._active.get(key, [])):
+                    if scan.sha != sha and head_seq > scan.seen_head:
+                        self._supersede(key, scan, sha)
+
+
+scan_registry = ScanRegistry(settings.SCAN_SUPERSEDE_ENABLED, settings.SCAN_SUPERSEDE_POLL_SECONDS)
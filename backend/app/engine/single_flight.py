@@ -0,0 +1,148 @@
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+from app.core.config import settings
+from app.models.scan import ScanRequest, ScanResponse, Violation
+from app.core.metrics import SCANS_COALESCED
+
+logger = logging.getLogger(__name__)
+
+FileDone = Callable[[str, List[Violation]], None]
+Analyze = Callable[[ScanRequest, FileDone], Awaitable[ScanResponse]]
+
+
+class _Flight:
+    """
+    One shared analysis and the callers waiting on it.
+    """
+
+    def __init__(self):
+        self.task: Optional[asyncio.Task] = None
+        self.waiters = 0
+        # Files finished so far, replayed to callers that join late
+        self.files_done: List[Tuple[str, List[Violation]]] = []
+        self.listeners: List[FileDone] = []
+
+    def file_done(self, filename: str, violations: List[Violation]):
+        self.files_done.append((filename, violations))
+        for listener in list(self.listeners):
+            listener(filename, violations)
+
+
+class ScanCoalescer:
+    """
+    Single-flight for scans: webhook redeliveries, `synchronize` + `reopened` and
+    retries can submit the same repo@sha with the same files at the same time.
+    Concurrent duplicates await one shared analysis task instead of each running
+    the pipeline (and paying for the LLM), and a completed result is memoized for
+    SCAN_COALESCE_TTL_SECONDS to serve late arrivals.
+
+    Per process: the other backend process still benefits from the shared
+    per-file result cache (scan_cache.db) once this one finishes.
+    """
+
+    def __init__(self, ttl_seconds: float, max_entries: int):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._flights: Dict[str, _Flight] = {}
+        self._recent: "OrderedDict[str, Tuple[float, ScanResponse]]" = OrderedDict()
+
+    @staticmethod
+    def make_key(request: ScanRequest) -> str:
+        """
+        repo, sha, config and a digest of every file (path, content, patch) in
+        request order: anything that could change the response.
+        """
+        digest = hashlib.sha256()
+        for part in (request.repo_full_name, request.commit_sha, request.config_override or "",
+                     str(request.is_copilot_generated)):
+            digest.update(part.encode("utf-8", errors="surrogatepass") + b"\0")
+        for file in request.files:
+            for field in ("filename", "content", "patch"):
+                digest.update((file.get(field) or "").encode("utf-8", errors="surrogatepass") + b"\0")
+            digest.update(b"\1")
+        return digest.hexdigest()
+
+    @staticmethod
+    def _copy(response: ScanResponse) -> ScanResponse:
+        # Callers adjust their response (override clearing), so each gets its own
+        return response.model_copy(update={"violations": list(response.violations)})
+
+    def _recent_result(self, key: str) -> Optional[ScanResponse]:
+        entry = self._recent.get(key)
+        if entry is None:
+            return None
+        stored_at, response = entry
+        if time.monotonic() - stored_at > self.ttl_seconds:
+            del self._recent[key]
+            return None
+        return response
+
+    def _landed(self, key: str, flight: _Flight, task: asyncio.Task):
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+        if task.cancelled() or task.exception() is not None or self.ttl_seconds <= 0:
+            return
+        self._recent[key] = (time.monotonic(), task.result())
+        self._recent.move_to_end(key)
+        while len(self._recent) > self.max_entries:
+            self._recent.popitem(last=False)
+
+    @staticmethod
+    def _replay(request: ScanRequest, response: ScanResponse, on_file_done: FileDone):
+        by_file: Dict[str, List[Violation]] = {}
+        for v in response.violations:
+            by_file.setdefault(v.file_path, []).append(v)
+        for file in request.files:
+            filename = file.get("filename", "")
+            on_file_done(filename, by_file.get(filename, []))
+
+    async def run(self, request: ScanRequest, analyze: Analyze,
+                  on_file_done: FileDone = None) -> Tuple[ScanResponse, Optional[str]]:
+        """
+        `analyze(request, on_file_done)`, shared with identical concurrent requests.
+        Returns the response and how it was coalesced: None (this call ran the
+        analysis), "in_flight" (joined a running one) or "recent" (memoized result).
+
+        The shared task is cancelled only when every caller waiting on it has gone.
+        """
+        key = self.make_key(request)
+        recent = self._recent_result(key)
+        if recent is not None:
+            SCANS_COALESCED.labels("recent").inc()
+            if on_file_done is not None:
+                self._replay(request, recent, on_file_done)
+            return self._copy(recent), "recent"
+
+        flight = self._flights.get(key)
+        coalesced = None
+        if flight is None:
+            flight = _Flight()
+            flight.task = asyncio.create_task(analyze(request, flight.file_done))
+            flight.task.add_done_callback(lambda task, key=key, flight=flight: self._landed(key, flight, task))
+            self._flights[key] = flight
+        else:
+            coalesced = "in_flight"
+            SCANS_COALESCED.labels("in_flight").inc()
+            logger.info(f"🔗 Joining in-flight scan of {request.repo_full_name}@{request.commit_sha}")
+
+        if on_file_done is not None:
+            for filename, violations in flight.files_done:
+                on_file_done(filename, violations)
+            flight.listeners.append(on_file_done)
+        flight.waiters += 1
+        try:
+            response = await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if on_file_done is not None:
+                flight.listeners.remove(on_file_done)
+            if flight.waiters == 0 and not flight.task.done():
+                flight.task.cancel()
+        return self._copy(response), coalesced
+
+
+scan_coalescer = ScanCoalescer(settings.SCAN_COALESCE_TTL_SECONDS, settings.SCAN_COALESCE_MAX_ENTRIES)
@@ -5,6 +5,7 @@ from pathlib import Path
 from app.api.routes import router as api_router
 from app.core.config import settings
 from app.api import audit
+import asyncio
 import logging
 
 logger = logging.getLogger(__name__)
@@ -63,22 +64,45 @@ import urllib.error
 # Configured Endpoint
 API_URL = "$API_URL"
 
+# Severities that fail the scan (matches HybridAnalyzer)
+BLOCKING_SEVERITIES = {"BLOCKING", "CRITICAL", "HIGH"}
+
 def get_staged_files():
     try:
-        result = subprocess.check_output(['git', 'diff', '--cached', '--name-only'], encoding='utf-8')
+        # Deleted files have no staged content to scan
+        result = subprocess.check_output(['git', 'diff', '--cached', '--name-only', '--diff-filter=d'], encoding='utf-8')
         return [f for f in result.splitlines() if f]
     except subprocess.CalledProcessError:
         return []
 
-def read_file_content(filepath):
+def get_staged_patch(filepath):
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
-    except Exception:
+        return subprocess.check_output(['git', 'diff', '--cached', '--', filepath], encoding='utf-8', errors='ignore')
+    except subprocess.CalledProcessError:
+        return ""
+
+def read_staged_content(filepath):
+    # The index version, not the working tree: a partially staged file would
+    # otherwise not match the line numbers of its staged patch
+    try:
+        return subprocess.check_output(['git', 'show', ':' + filepath], encoding='utf-8', errors='ignore')
+    except subprocess.CalledProcessError:
         return ""
 
+def stream_scan(payload):
+    req = urllib.request.Request(API_URL.rstrip("/") + "/stream")
+    req.add_header('Content-Type', 'application/json')
+    req.add_header('Accept', 'application/x-ndjson')
+    jsondata = json.dumps(payload).encode('utf-8')
+    req.add_header('Content-Length', len(jsondata))
+
+    with urllib.request.urlopen(req, jsondata) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
 def main():
-    print("🛡️  AI Guardrails: Local Scan (v2.1 - Enhanced Output)...")
+    print("🛡️  AI Guardrails: Local Scan (v2.2 - Streaming)...")
     
     files = get_staged_files()
     if not files:
@@ -86,11 +110,11 @@ def main():
 
     files_payload = []
     for f in files:
-        if os.path.exists(f) and not f.endswith(('.png', '.jpg', '.lock', '.zip')):
+        if not f.endswith(('.png', '.jpg', '.lock', '.zip')):
             files_payload.append({
                 "filename": f,
-                "content": read_file_content(f),
-                "patch": ""
+                "content": read_staged_content(f),
+                "patch": get_staged_patch(f)
             })
             
     if not files_payload:
@@ -104,59 +128,64 @@ def main():
         "is_copilot_generated": False
     }
 
+    # ANSI Colors
+    RED = "\033[91m"
+    GREEN = "\033[92m"
+    YELLOW = "\033[93m"
+    BLUE = "\033[94m"
+    BOLD = "\033[1m"
+    RESET = "\033[0m"
+
+    def print_violation(v):
+        severity = v["severity"]
+        color = RED if severity in BLOCKING_SEVERITIES else YELLOW
+        icon = "❌" if severity in BLOCKING_SEVERITIES else "⚠️ "
+        print(f"{color}{icon} [{v['rule_id']}] {severity}{RESET}")
+
+        line_str = f":{v.get('line_number', '?')}" if v.get('line_number') else ""
+        print(f"   📂 File: {BOLD}{v['file_path']}{line_str}{RESET}")
+        print(f"   📝 Msg:  {v['message']}")
+
+        if v.get("suggestion"):
+            print(f"   💡 Fix:  {BLUE}{v['suggestion']}{RESET}")
+        print("") # Spacer
+
+    def reject():
+        print(f"{RED}{BOLD}🚫 COMMIT REJECTED{RESET}")
+        print("   Blocking violations must be resolved before committing.")
+        print("   (Use --no-verify to bypass if absolutely necessary, but this is logged.)")
+        sys.exit(1)
+
     try:
-        req = urllib.request.Request(API_URL)
-        req.add_header('Content-Type', 'application/json')
-        jsondata = json.dumps(payload).encode('utf-8')
-        req.add_header('Content-Length', len(jsondata))
-        
-        response = urllib.request.urlopen(req, jsondata)
-        res_body = response.read()
-        data = json.loads(res_body)
-        
-        if not data.get("succeeded", True):
-            # ANSI Colors
-            RED = "\033[91m"
-            GREEN = "\033[92m"
-            YELLOW = "\033[93m"
-            BLUE = "\033[94m"
-            BOLD = "\033[1m"
-            RESET = "\033[0m"
-
-            print(f"\n{RED}{BOLD}🛡️  AI GUARDRAILS POLICY CHECK FAILED{RESET}")
-            print(f"{RED}========================================{RESET}\n")
-            
-            violations = data.get("violations", [])
-            blocking_count = sum(1 for v in violations if v["severity"] == "BLOCKING")
-            
-            print(f"{BOLD}Found {len(violations)} violations ({blocking_count} BLOCKING){RESET}\n")
-
-            current_file = ""
-            for v in violations:
-                severity = v["severity"]
-                color = RED if severity == "BLOCKING" else YELLOW
-                icon = "❌" if severity == "BLOCKING" else "⚠️ "
-                
-                # Group visual separation by file if needed, but simple list is robust
-                print(f"{color}{icon} [{v['rule_id']}] {severity}{RESET}")
-                
-                line_str = f":{v.get('line_number', '?')}" if v.get('line_number') else ""
-                print(f"   📂 File: {BOLD}{v['file_path']}{line_str}{RESET}")
-                print(f"   📝 Msg:  {v['message']}")
-                
-                if v.get("suggestion"):
-                    print(f"   💡 Fix:  {BLUE}{v['suggestion']}{RESET}")
-                print("") # Spacer
-
-            if blocking_count > 0:
-                print(f"{RED}{BOLD}🚫 COMMIT REJECTED{RESET}")
-                print("   Blocking violations must be resolved before committing.")
-                print("   (Use --no-verify to bypass if absolutely necessary, but this is logged.)")
-                sys.exit(1)
-            else:
-                 print(f"{YELLOW}⚠️  Warnings found, but commit proceeds.{RESET}")
-                 sys.exit(0)
-            
+        # Results stream in per file: findings show up as soon as each file is done,
+        # and the first blocking violation rejects the commit right away
+        enforcement_mode = "blocking"
+        violations = []
+        for frame in stream_scan(payload):
+            if frame["type"] == "start":
+                enforcement_mode = frame.get("enforcement_mode", "blocking")
+            elif frame["type"] == "file":
+                for v in frame.get("violations", []):
+                    if not violations:
+                        print(f"\n{BOLD}🛡️  AI GUARDRAILS FINDINGS{RESET}")
+                        print(f"========================================\n")
+                    violations.append(v)
+                    print_violation(v)
+                if enforcement_mode == "blocking" and any(v["severity"] in BLOCKING_SEVERITIES for v in violations):
+                    print(f"{RED}{BOLD}🛡️  AI GUARDRAILS POLICY CHECK FAILED{RESET}")
+                    reject()
+            elif frame["type"] == "error":
+                # The server failed mid-scan; treat it like an unreachable server
+                print(f"⚠️  Guardrails scan failed on the server: {frame.get('detail')}")
+                print(f"   (Proceeding commit in fail-open mode)")
+                sys.exit(0)
+            elif frame["type"] == "summary":
+                if not frame.get("succeeded", True):
+                    reject()
+                if violations:
+                    print(f"{YELLOW}⚠️  Warnings found, but commit proceeds.{RESET}")
+                    sys.exit(0)
+
         print("✅ Guardrails passed.")
         sys.exit(0)
 
@@ -192,8 +221,43 @@ except ImportError:
     client = None
     HTTPX_AVAILABLE = False
 
+@app.on_event("startup")
+async def startup_event():
+    from app.core.audit_writer import audit_writer
+    from app.core.database import start_violations_migration
+    from app.engine.scan_jobs import scan_jobs
+    from app.core.override_index import override_index
+    from app.engine.scan_registry import scan_registry
+    from app.core.outbox import outbox_dispatcher
+    from app.core.audit_maintenance import audit_maintenance
+    await asyncio.to_thread(override_index.load)
+    # Before anything writes: the one-time conversion is a full VACUUM
+    await asyncio.to_thread(audit_maintenance.enable_incremental_vacuum)
+    await audit_writer.start()
+    await audit_maintenance.start()
+    await scan_registry.start()
+    await scan_jobs.start()
+    await outbox_dispatcher.start()
+    # Copies pre-existing violations_json rows into the normalized table, in the background
+    start_violations_migration()
+
 @app.on_event("shutdown")
 async def shutdown_event():
+    # Hand running jobs back to the queue, then flush queued audit events
+    from app.core.audit_writer import audit_writer
+    from app.engine.scan_jobs import scan_jobs
+    from app.core.scan_executor import scan_executor
+    from app.core.override_index import override_index
+    from app.engine.scan_registry import scan_registry
+    from app.core.outbox import outbox_dispatcher
+    from app.core.audit_maintenance import audit_maintenance
+    await outbox_dispatcher.stop()
+    await scan_jobs.stop()
+    await scan_registry.stop()
+    await audit_maintenance.stop()
+    await audit_writer.stop()
+    scan_executor.shutdown()
+    override_index.close()
     if client:
         await client.aclose()
 
@@ -243,13 +307,51 @@ async def get_hooks_script(request: Request):
 def health_check():
     return {"status": "ok"}
 
+@app.get("/metrics", include_in_schema=False)
+def prometheus_metrics():
+    """
+    Prometheus scrape target (text format 0.0.4). Sync handler: queue-depth gauges
+    are read from audit.db at scrape time, off the event loop.
+    """
+    from app.core.metrics import metrics
+    return Response(content=metrics.render(), media_type=metrics.CONTENT_TYPE)
+
+def _commit_override(repo: str, commit_sha: str, reason: str) -> tuple:
+    """
+    One transaction: the override row, the override change counter, the audit event
+    and the outbox event that tells the GitHub App to flip the commit status.
+    """
+    from app.core.database import get_db, record_override, insert_audit_events
+    from app.core.outbox import outbox_store, EVENT_OVERRIDE
+
+    conn = get_db()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        override_id, version = record_override(conn, repo, commit_sha, "admin", reason)
+        insert_audit_events(conn, [(
+            "ADMIN_OVERRIDE", repo, commit_sha, None, "SUCCESS",
+            {"reason": reason, "action": "BLOCKING_OVERRIDDEN"}, None
+        )])
+        event_id = outbox_store.enqueue(conn, EVENT_OVERRIDE, {
+            "repo_full_name": repo,
+            "commit_sha": commit_sha,
+            "reason": reason
+        }, idempotency_key=f"override-{override_id}")
+        conn.commit()
+        return version, event_id
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
 # Q6: Admin Override Endpoint
 @app.post("/api/v1/override")
 async def admin_override(request: Request):
     """
     Allows Admin to override a blocking status.
-    1. Log to DB.
-    2. Call Node App to update GitHub status.
+    1. Log to DB, together with an outbox event for the GitHub status update.
+    2. Return; the outbox dispatcher delivers the event to the Node App (with retries).
     """
     try:
         body = await request.json()
@@ -260,45 +362,61 @@ async def admin_override(request: Request):
         if not repo or not commit_sha:
              return Response(content="Missing repo or commit_sha", status_code=400)
 
-        # 1. Log to SQLite
-        from app.core.database import get_db, log_audit_event
-        from datetime import datetime
-        
-        conn = get_db()
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO audit_overrides (timestamp, repo, commit_sha, admin_user, reason)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (datetime.utcnow().isoformat(), repo, commit_sha, "admin", reason))
-        conn.commit()
-        conn.close()
+        # 1. Log to SQLite, then make it visible to scans in this process right away
+        # (other processes pick it up through the override change counter)
+        from app.core.override_index import override_index
+        from app.core.outbox import outbox_dispatcher
 
-        # Log as main audit event too
-        log_audit_event(
-            event_type="ADMIN_OVERRIDE",
-            repo=repo,
-            commit_sha=commit_sha,
-            status="SUCCESS",
-            details={"reason": reason, "action": "BLOCKING_OVERRIDDEN"}
-        )
+        version, event_id = await asyncio.to_thread(_commit_override, repo, commit_sha, reason)
+        override_index.add(repo, commit_sha, version)
 
-        # 2. Call Node App (Internal)
-        if HTTPX_AVAILABLE and client:
-            # We use the same 'client' but target port 3000 explicitly
-            # client base_url is "http://127.0.0.1:3000"
-            res = await client.post("/api/override", json={
-                "repo_full_name": repo,
-                "commit_sha": commit_sha,
-                "reason": reason
-            })
-            if res.status_code != 200:
-                logger.error(f"Node App Override failed: {res.text}")
-                return Response(content=f"Upstream Error: {res.text}", status_code=500)
-        else:
-            return Response(content="Internal Communication Error (HTTPX missing)", status_code=500)
+        # 2. Node App is updated in the background: a slow or restarting app no longer
+        # holds up (or fails) the request after the override is already stored
+        outbox_dispatcher.notify()
 
-        return {"status": "overridden"}
+        # Not running = no CALLBACK_SECRET: the event waits in the outbox until one is set
+        github_status = "queued" if outbox_dispatcher.running else "held"
+        return {"status": "overridden", "github_status": github_status, "event_id": event_id}
 
     except Exception as e:
         logger.error(f"Override Error: {e}")
         return Response(content=str(e), status_code=500)
+
+
+# LLM response cache administration (hit rate + purge)
+@app.get("/api/v1/admin/llm-cache")
+async def llm_cache_stats():
+    from app.services.llm_cache import llm_response_cache
+    return await asyncio.to_thread(llm_response_cache.stats)
+
+@app.get("/api/v1/admin/outbox")
+async def outbox_status():
+    """
+    Outbox health: whether this process delivers, how many events wait, and the
+    latest events that failed permanently (with their last error).
+    """
+    from app.core.outbox import outbox_dispatcher, outbox_store
+    return {
+        "dispatcher_running": outbox_dispatcher.running,
+        "pending": await asyncio.to_thread(outbox_store.pending_count),
+        "failed": await asyncio.to_thread(outbox_store.failed_events),
+    }
+
+@app.get("/api/v1/admin/rule-stats")
+async def rule_match_stats():
+    """
+    Cumulative matching time, search count and budget timeouts per rule id,
+    to spot expensive custom patterns.
+    """
+    from app.core.rule_matcher import rule_stats
+    return rule_stats.snapshot()
+
+@app.delete("/api/v1/admin/llm-cache")
+async def purge_llm_cache():
+    """
+    Drops every cached LLM response (memory and disk), e.g. after a model upgrade.
+    """
+    from app.services.llm_cache import llm_response_cache
+    removed = await asyncio.to_thread(llm_response_cache.purge)
+    logger.info(f"🧹 LLM response cache purged ({removed} entries)")
+    return {"status": "purged", "removed": removed}
@@ -1,5 +1,6 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, field_validator
 from typing import List, Optional, Dict, Any
+from app.core.config import settings
 
 class Violation(BaseModel):
     rule_id: str
@@ -21,8 +22,40 @@ class ScanRequest(BaseModel):
     is_copilot_generated: bool = False
     
 class ScanResponse(BaseModel):
-    status: str # "success", "failed"
+    status: str # "success", "failed", "superseded"
     violations: List[Violation]
     succeeded: bool # True if no blocking violations (or if advisory)
     summary: str
     enforcement_mode: str = "blocking" # "blocking" or "advisory"
+
+class ScanJobRequest(ScanRequest):
+    # Receives the final ScanJobStatus as JSON (POST) when the job finishes.
+    # Must be one of SCAN_JOB_CALLBACK_URLS: the backend never calls arbitrary URLs.
+    callback_url: Optional[str] = None
+
+    @field_validator("callback_url")
+    @classmethod
+    def _allowed_callback(cls, url: Optional[str]) -> Optional[str]:
+        if url is None:
+            return url
+        allowed = {u.strip() for u in settings.SCAN_JOB_CALLBACK_URLS.split(",") if u.strip()}
+        if url not in allowed:
+            raise ValueError("callback_url is not an allowed callback (SCAN_JOB_CALLBACK_URLS)")
+        if not settings.CALLBACK_SECRET:
+            raise ValueError("callbacks are disabled until CALLBACK_SECRET is configured")
+        return url
+
+class ScanJobStatus(BaseModel):
+    job_id: str
+    status: str # "queued", "running", "completed", "failed", "superseded"
+    repo_full_name: Optional[str] = None
+    commit_sha: Optional[str] = None
+    pr_number: Optional[int] = None
+    files_total: int = 0
+    files_done: int = 0
+    attempts: int = 0
+    created_at: Optional[str] = None
+    started_at: Optional[str] = None
+    finished_at: Optional[str] = None
+    error: Optional[str] = None
+    result: Optional[ScanResponse] = None
@@ -0,0 +1,144 @@
+import ast
+import re
+from typing import List, Optional, Tuple
+
+# (first line, last line, text): 1-based, inclusive, in the original file
+Chunk = Tuple[int, int, str]
+
+# Split-point cost of a line that should never start a chunk (inside an expression, string...)
+_NO_SPLIT = 1 << 20
+
+# String literals and line comments, blanked out before counting braces
+_BRACE_NOISE = re.compile(r"\"(?:[^\"\\\n]|\\.)*\"|'(?:[^'\\\n]|\\.)*'|`(?:[^`\\]|\\.)*`|//.*$|#.*$")
+_OPENERS = "{(["
+_CLOSERS = "})]"
+
+
+def _python_split_costs(content: str, line_count: int) -> List[int]:
+    """
+    Cost of starting a chunk at each line: 0 for top-level statements (decorators
+    included), the nesting depth for statements inside def/class bodies, _NO_SPLIT
+    for continuation lines. Raises SyntaxError for code ast cannot parse.
+    """
+    costs = [_NO_SPLIT] * (line_count + 2)
+    tree = ast.parse(content)
+
+    stack = [(tree.body, 0)]
+    while stack:
+        body, depth = stack.pop()
+        for node in body:
+            start = min([node.lineno] + [d.lineno for d in getattr(node, "decorator_list", [])])
+            if start <= line_count:
+                costs[start] = min(costs[start], depth)
+            for field in ("body", "orelse", "finalbody"):
+                child = getattr(node, field, None)
+                if isinstance(child, list) and child and isinstance(child[0], ast.stmt):
+                    stack.append((child, depth + 1))
+            for handler in getattr(node, "handlers", []):
+                stack.append((handler.body, depth + 1))
+    costs[line_count + 1] = 0
+    return costs
+
+
+def brace_depths(lines: List[str]) -> List[Optional[int]]:
+    """
+    Bracket depth before each line (index 0 = line 1), ignoring brackets in string
+    literals and comments; None for lines inside a /* block comment */. One extra
+    entry holds the depth after the last line.
+    """
+    depths: List[Optional[int]] = []
+    depth = 0
+    in_block_comment = False
+    for line in lines:
+        if in_block_comment:
+            depths.append(None)
+            if "*/" not in line:
+                continue
+            in_block_comment = False
+            line = line.split("*/", 1)[1]
+        else:
+            depths.append(depth)
+
+        code = _BRACE_NOISE.sub("", line)
+        if "/*" in code:
+            before, _, after = code.partition("/*")
+            in_block_comment = "*/" not in after
+            code = before + (after.split("*/", 1)[1] if not in_block_comment else "")
+        for ch in code:
+            if ch in _OPENERS:
+                depth += 1
+            elif ch in _CLOSERS:
+                depth = max(0, depth - 1)
+    depths.append(depth)
+    return depths
+
+
+def _brace_split_costs(lines: List[str]) -> List[int]:
+    """
+    Heuristic for brace languages (JS/TS, Java, Go, C#, SQL blocks...): the bracket
+    depth before each line, with a small bonus for lines that follow a blank line.
+    """
+    costs = [_NO_SPLIT] * (len(lines) + 2)
+    previous_blank = True
+    for number, (line, depth) in enumerate(zip(lines, brace_depths(lines)), 1):
+        if depth is not None:
+            costs[number] = depth * 2 + (0 if previous_blank or depth == 0 else 1)
+        previous_blank = not line.strip()
+    costs[len(lines) + 1] = 0
+    return costs
+
+
+def split_costs(filename: str, content: str, lines: List[str]) -> List[int]:
+    if filename.endswith(".py"):
+        try:
+            return _python_split_costs(content, len(lines))
+        except (SyntaxError, ValueError, RecursionError):
+            pass  # Fragments or other Python versions: fall back to indentation-agnostic braces
+    return _brace_split_costs(lines)
+
+
+def chunk_file(filename: str, content: str, token_budget: int, overlap_lines: int = 0) -> List[Chunk]:
+    """
+    Splits a file into windows of at most ~token_budget tokens (4 chars per token,
+    as estimate_tokens), cutting at the cheapest syntactic boundary in the second
+    half of each window: top-level def/class for Python, brace depth 0 elsewhere.
+    Each window after the first repeats the last `overlap_lines` lines of the
+    previous one, so code straddling a cut is seen whole at least once.
+
+    Files within the budget come back as a single chunk. Lines are split on newlines
+    only, as git and the rule matcher number them: splitlines also breaks on carriage
+    returns, form feeds and Unicode separators, shifting every later line.
+    """
+    lines = content.split("\n")
+    if not content or token_budget <= 0 or len(content) // 4 <= token_budget:
+        return [(1, max(1, len(lines)), content)]
+
+    costs = split_costs(filename, content, lines)
+    char_budget = token_budget * 4
+    # offsets[i] = characters before line i + 1 (newlines included)
+    offsets = [0]
+    for line in lines:
+        offsets.append(offsets[-1] + len(line) + 1)
+
+    chunks: List[Chunk] = []
+    start = 1
+    while start <= len(lines):
+        # Furthest line that still fits (always at least one line)
+        end = start
+        while end < len(lines) and offsets[end + 1] - offsets[start - 1] <= char_budget:
+            end += 1
+        if end == len(lines):
+            chunks.append((start, end, "\n".join(lines[start - 1:end])))
+            break
+
+        # Cheapest split in the second half of the window; ties go to the later line
+        floor = start + max(1, (end - start + 1) // 2)
+        split = end + 1
+        for line in range(end + 1, floor - 1, -1):
+            if costs[line] < costs[split]:
+                split = line
+        chunks.append((start, split - 1, "\n".join(lines[start - 1:split - 1])))
+        # Overlap never eats more than a quarter of the window, so every step makes progress
+        start = split - min(overlap_lines, (split - start) // 4)
+    return chunks
+
@@ -0,0 +1,84 @@
+import re
+from typing import List, Optional, Tuple
+
+# "@@ -12,7 +12,8 @@ optional section heading"
+_HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+LineRange = Tuple[int, int]  # 1-based, inclusive, in the NEW version of the file
+
+
+def parse_patch(patch: str) -> Optional[List[LineRange]]:
+    """
+    Parses a unified diff (a GitHub `patch` field or `git diff` output for one file)
+    into the new-file line ranges that were added or modified.
+
+    Pure deletions are reported as the single new-file line where the removal
+    happened, so checks that depend on surrounding code still look there.
+    Returns None when the patch has no hunks (empty, binary or truncated diffs),
+    meaning "changed lines unknown" rather than "nothing changed".
+    """
+    if not patch:
+        return None
+
+    ranges: List[LineRange] = []
+    seen_hunk = False
+    new_line = 0
+    old_left = new_left = 0
+
+    def mark(line: int):
+        line = max(1, line)
+        if ranges and ranges[-1][1] >= line - 1:
+            ranges[-1] = (ranges[-1][0], max(ranges[-1][1], line))
+        else:
+            ranges.append((line, line))
+
+    for raw in patch.splitlines():
+        m = _HUNK_HEADER_RE.match(raw)
+        if m:
+            seen_hunk = True
+            old_left = int(m.group(2)) if m.group(2) is not None else 1
+            new_left = int(m.group(4)) if m.group(4) is not None else 1
+            # An empty new side ("+5,0", from -U0 diffs) names the line *before* the
+            # removal; context-bearing hunks land on the line after it, so match that
+            new_line = int(m.group(3)) + (1 if new_left == 0 else 0)
+            continue
+        # Outside a hunk: file headers ("diff --git", "---", "+++", "index ...")
+        if old_left <= 0 and new_left <= 0:
+            continue
+        if raw.startswith("\\"):
+            continue  # "\ No newline at end of file"
+        if raw.startswith("+"):
+            mark(new_line)
+            new_line += 1
+            new_left -= 1
+        elif raw.startswith("-"):
+            mark(new_line)
+            old_left -= 1
+        else:
+            new_line += 1
+            old_left -= 1
+            new_left -= 1
+
+    return ranges if seen_hunk else None
+
+
+def expand_ranges(ranges: List[LineRange], context: int, max_line: int) -> List[LineRange]:
+    """
+    Widens each range by `context` lines on both sides, clamps to the file and
+    merges ranges that touch or overlap.
+    """
+    merged: List[LineRange] = []
+    for start, end in sorted(ranges):
+        start = max(1, start - context)
+        end = min(max_line, end + context)
+        if start > end:
+            continue
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def line_in_ranges(line: int, ranges: List[LineRange]) -> bool:
+    return any(start <= line <= end for start, end in ranges)
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import sqlite3
+import logging
+from typing import Dict, List, Optional, Tuple
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LICENSE_DB = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), "rules", "license_db.json")
+DEFAULT_RESTRICTED = ["GPL", "LGPL", "AGPL", "Affero", "SSPL", "Commercial", "Sleepycat"]
+# Entries under this ecosystem match a package name from any manifest type
+ANY_ECOSYSTEM = "*"
+
+_SEPARATORS = re.compile(r"[-_.]+")
+
+
+def normalize_package(name: str) -> str:
+    """
+    Case- and separator-insensitive package key (PEP 503 style), so "PyQt5",
+    "pyqt5" and "py_qt5" hit the same entry.
+    """
+    return _SEPARATORS.sub("-", name.strip().lower())
+
+
+class LicenseDatabase:
+    """
+    Package -> license knowledge base for the license scanner.
+
+    Loaded from a local file (LICENSE_DB_PATH, default rules/license_db.json) into
+    one dict per ecosystem, so every lookup is a hash probe however many packages a
+    lockfile lists. `refresh()` re-reads the file when its mtime changed.
+
+    JSON layout:
+        {"restricted_licenses": ["GPL", ...],
+         "packages": {"pypi": {"pyqt5": "GPL-3.0"}, "npm": {...}, "maven": {"group:artifact": ...}, "*": {...}}}
+
+    SQLite layout: table `packages(ecosystem, name, license)` and, optionally,
+    `restricted_licenses(term)`.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._mtime = None
+        self._packages: Dict[str, Dict[str, str]] = {}
+        self._restricted_terms: List[str] = DEFAULT_RESTRICTED
+        self._restricted_re = None
+        self._verdicts: Dict[str, bool] = {}
+
+    @property
+    def fingerprint(self) -> str:
+        try:
+            return f"{self.path}:{os.stat(self.path).st_mtime_ns}"
+        except OSError:
+            return f"{self.path}:missing"
+
+    def refresh(self):
+        """
+        Loads the file, or reloads it if it changed: one stat, call once per scan.
+        """
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except OSError:
+            if self._mtime is not None or self._restricted_re is None:
+                logger.warning(f"⚠️ License database {self.path} not found; package license checks disabled.")
+                self._install({}, DEFAULT_RESTRICTED)
+                self._mtime = None
+            return
+        if mtime == self._mtime:
+            return
+        try:
+            if self.path.endswith((".db", ".sqlite", ".sqlite3")):
+                packages, restricted = self._read_sqlite(self.path)
+            else:
+                packages, restricted = self._read_json(self.path)
+        except Exception as e:
+            logger.error(f"Error loading license database {self.path}: {e}")
+            if self._restricted_re is None:
+                self._install({}, DEFAULT_RESTRICTED)
+            return
+        self._install(packages, restricted)
+        self._mtime = mtime
+        logger.info(f"📜 Loaded license database: {sum(len(p) for p in packages.values())} packages from {self.path}")
+
+    def _install(self, packages: Dict[str, Dict[str, str]], restricted: List[str]):
+        self._packages = {
+            eco: {normalize_package(name): lic for name, lic in entries.items()}
+            for eco, entries in packages.items()
+        }
+        self._restricted_terms = restricted or DEFAULT_RESTRICTED
+        self._restricted_re = re.compile(
+            r"\b(?:" + "|".join(re.escape(t) for t in self._restricted_terms) + r")", re.IGNORECASE
+        )
+        self._verdicts = {}
+
+    @staticmethod
+    def _read_json(path: str) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+        with open(path, "r") as f:
+            data = json.load(f)
+        return data.get("packages", {}), data.get("restricted_licenses", [])
+
+    @staticmethod
+    def _read_sqlite(path: str) -> Tuple[Dict[str, Dict[str, str]], List[str]]:
+        conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        try:
+            packages: Dict[str, Dict[str, str]] = {}
+            for eco, name, lic in conn.execute("SELECT ecosystem, name, license FROM packages"):
+                packages.setdefault(eco, {})[name] = lic
+            try:
+                restricted = [row[0] for row in conn.execute("SELECT term FROM restricted_licenses")]
+            except sqlite3.OperationalError:
+                restricted = []
+        finally:
+            conn.close()
+        return packages, restricted
+
+    def lookup(self, ecosystem: str, name: str) -> Optional[str]:
+        """
+        License recorded for a package, or None if it is not in the database.
+        """
+        if self._restricted_re is None:
+            self.refresh()
+        key = normalize_package(name)
+        entries = self._packages.get(ecosystem)
+        if entries is not None and key in entries:
+            return entries[key]
+        return self._packages.get(ANY_ECOSYSTEM, {}).get(key)
+
+    def is_restricted(self, license_name: str) -> bool:
+        if self._restricted_re is None:
+            self.refresh()
+        verdict = self._verdicts.get(license_name)
+        if verdict is None:
+            verdict = bool(self._restricted_re.search(license_name))
+            self._verdicts[license_name] = verdict
+        return verdict
+
+
+license_db = LicenseDatabase(settings.LICENSE_DB_PATH or DEFAULT_LICENSE_DB)
@@ -1,67 +1,323 @@
 import re
 import json
+from typing import Iterator, Optional, Tuple
+from app.services.license_db import license_db
+
+# (ecosystem, package name, 1-based line, license declared by the manifest itself or None)
+Dependency = Tuple[str, str, int, Optional[str]]
+
+
+class _KeyLocator:
+    """
+    Line numbers of JSON object keys, found in document order.
+
+    json.loads keeps keys in the order they appear, so each search resumes where the
+    previous key was found: locating every dependency of a multi-megabyte lockfile
+    is one forward pass over the text, counting newlines along the way.
+    """
+
+    def __init__(self, content: str):
+        self.content = content
+        self.pos = 0
+        self.line = 1
+
+    def line_of(self, key: str) -> int:
+        content = self.content
+        needle = '"' + key.replace("\\", "\\\\").replace('"', '\\"') + '"'
+        i = content.find(needle, self.pos)
+        while i != -1:
+            j = i + len(needle)
+            while j < len(content) and content[j] in " \t\r\n":
+                j += 1
+            if j < len(content) and content[j] == ":":
+                self.line += content.count("\n", self.pos, i)
+                self.pos = i
+                return self.line
+            i = content.find(needle, i + 1)   # a string value, not a key
+        return self.line
+
+
+def _declared_license(entry: dict) -> Optional[str]:
+    lic = entry.get("license")
+    if isinstance(lic, dict):
+        lic = lic.get("type")
+    if lic is None and isinstance(entry.get("licenses"), list):
+        lic = " OR ".join(str(l.get("type", l) if isinstance(l, dict) else l) for l in entry["licenses"])
+    return lic if isinstance(lic, str) and lic else None
+
+
+# --- Python -----------------------------------------------------------------
+# PEP 508 name at the start of a requirement ("name[extra] >= 1; marker", "name @ url")
+_PEP508_NAME = re.compile(r"^\s*([A-Za-z0-9][A-Za-z0-9._-]*)\s*(?:\[[^\]]*\])?\s*(?:[<>=!~;@(,]|$)")
+
+
+# One requirement per line: options (-r, -e, --hash continuations), comments and URLs never start with a name
+_REQUIREMENT_LINE = re.compile(
+    r"^[ \t]*([A-Za-z0-9][A-Za-z0-9._-]*)[ \t]*(?:\[[^\]\n]*\])?[ \t]*(?:[<>=!~;@(,#]|\\?\r?$)", re.MULTILINE
+)
+
+
+def _parse_requirements(content: str) -> Iterator[Dependency]:
+    line, pos = 1, 0
+    for m in _REQUIREMENT_LINE.finditer(content):
+        line += content.count("\n", pos, m.start())
+        pos = m.start()
+        yield ("pypi", m.group(1), line, None)
+
+
+_TOML_TABLE = re.compile(r"^\s*\[\[?\s*([^\]]+?)\s*\]\]?\s*(?:#.*)?$")
+_TOML_ARRAY_START = re.compile(r"^\s*([A-Za-z0-9_.\"'-]+)\s*=\s*\[(.*)$")
+_TOML_KEY = re.compile(r"^\s*[\"']?([A-Za-z0-9][A-Za-z0-9._-]*)[\"']?\s*=")
+_TOML_STRING = re.compile(r"\"((?:[^\"\\]|\\.)*)\"|'([^']*)'")
+
+
+def _is_poetry_dependency_table(table: str) -> bool:
+    return table in ("tool.poetry.dependencies", "tool.poetry.dev-dependencies") or (
+        table.startswith("tool.poetry.group.") and table.endswith(".dependencies")
+    )
+
+
+def _parse_pyproject(content: str) -> Iterator[Dependency]:
+    """
+    PEP 621 `[project]` dependencies / optional-dependencies and Poetry dependency
+    tables, read line by line (tomllib would lose the line numbers).
+    """
+    table = ""
+    in_array = False
+    for number, line in enumerate(content.splitlines(), 1):
+        if in_array:
+            rest = line
+        else:
+            header = _TOML_TABLE.match(line)
+            if header:
+                table = header.group(1).replace('"', "").replace("'", "")
+                continue
+            if _is_poetry_dependency_table(table):
+                m = _TOML_KEY.match(line)
+                if m and m.group(1).lower() != "python":
+                    yield ("pypi", m.group(1), number, None)
+                continue
+            m = _TOML_ARRAY_START.match(line)
+            key = m.group(1).strip("\"'") if m else None
+            if not m or not ((table == "project" and key == "dependencies") or table == "project.optional-dependencies"):
+                continue
+            rest = m.group(2)
+            in_array = True
+
+        for s in _TOML_STRING.finditer(rest):
+            req = _PEP508_NAME.match(s.group(1) if s.group(1) is not None else s.group(2))
+            if req:
+                yield ("pypi", req.group(1), number, None)
+        if "]" in _TOML_STRING.sub("", rest.split("#", 1)[0]):
+            in_array = False
+
+
+def _parse_pipfile_lock(content: str) -> Iterator[Dependency]:
+    data = json.loads(content)
+    keys = _KeyLocator(content)
+    for section, packages in data.items():
+        if section not in ("default", "develop") or not isinstance(packages, dict):
+            continue
+        keys.line_of(section)
+        for name in packages:
+            yield ("pypi", name, keys.line_of(name), None)
+
+
+# --- JavaScript ---------------------------------------------------------------
+_NPM_SECTIONS = ("dependencies", "devDependencies", "peerDependencies", "optionalDependencies")
+
+
+def _parse_package_json(content: str) -> Iterator[Dependency]:
+    data = json.loads(content)
+    keys = _KeyLocator(content)
+    for section, packages in data.items():
+        if section not in _NPM_SECTIONS or not isinstance(packages, dict):
+            continue
+        keys.line_of(section)
+        for name in packages:
+            yield ("npm", name, keys.line_of(name), None)
+
+
+def _parse_package_lock(content: str) -> Iterator[Dependency]:
+    """
+    npm lockfiles: v2/v3 `packages` map keyed by install path (with the declared
+    license of every package), or the v1 nested `dependencies` tree.
+    """
+    data = json.loads(content)
+    keys = _KeyLocator(content)
+    packages = data.get("packages")
+    if isinstance(packages, dict):
+        keys.line_of("packages")
+        for path, entry in packages.items():
+            if not path or not isinstance(entry, dict) or entry.get("link"):
+                continue   # "" is the project itself; links point at workspace folders
+            name = entry.get("name") or path.rsplit("node_modules/", 1)[-1]
+            yield ("npm", name, keys.line_of(path), _declared_license(entry))
+        return
+
+    # v1: pre-order walk of the nested tree (document order, no recursion for deep trees)
+    keys.line_of("dependencies")
+    stack = [iter((data.get("dependencies") or {}).items())]
+    seen = set()
+    while stack:
+        item = next(stack[-1], None)
+        if item is None:
+            stack.pop()
+            continue
+        name, entry = item
+        line = keys.line_of(name)
+        if name not in seen:
+            seen.add(name)
+            yield ("npm", name, line, None)
+        if isinstance(entry, dict) and isinstance(entry.get("dependencies"), dict):
+            keys.line_of("dependencies")
+            stack.append(iter(entry["dependencies"].items()))
+
+
+def _yarn_entry_name(header: str) -> Optional[str]:
+    # '"@scope/pkg@^1.0.0", "@scope/pkg@^1.2.0":' or 'pkg@npm:^1.0.0:'
+    spec = header.rstrip(":").split(",", 1)[0].strip().strip('"')
+    at = spec.find("@", 1)
+    name = spec[:at] if at > 0 else spec
+    return name or None
+
+
+def _parse_yarn_lock(content: str) -> Iterator[Dependency]:
+    """
+    yarn v1 and berry lockfiles: every unindented "spec[, spec...]:" line starts an entry.
+    """
+    seen = set()
+    for number, line in enumerate(content.splitlines(), 1):
+        if not line or line[0] in " \t#" or not line.rstrip().endswith(":"):
+            continue
+        name = _yarn_entry_name(line)
+        if name and name != "__metadata" and name not in seen:
+            seen.add(name)
+            yield ("npm", name, number, None)
+
+
+# --- Java -----------------------------------------------------------------------
+_POM_TOKEN = re.compile(
+    r"<(/?)(dependency|exclusions)\s*>|<(groupId|artifactId)>\s*([^<\s]+)\s*</\3>"
+)
+
+
+def _parse_pom(content: str) -> Iterator[Dependency]:
+    """
+    <dependency> blocks (dependencies and dependencyManagement), ignoring the
+    coordinates inside <exclusions>. Plugins are build-time and not checked.
+    """
+    in_dependency = False
+    in_exclusions = False
+    group = artifact = None
+    artifact_line = 0
+    for number, line in enumerate(content.splitlines(), 1):
+        if "<" not in line:
+            continue
+        for m in _POM_TOKEN.finditer(line):
+            closing, block, tag, value = m.groups()
+            if block == "exclusions":
+                in_exclusions = not closing
+            elif block == "dependency":
+                if not closing:
+                    in_dependency, group, artifact = True, None, None
+                elif in_dependency and not in_exclusions:
+                    in_dependency = False
+                    if artifact:
+                        yield ("maven", f"{group}:{artifact}" if group else artifact, artifact_line, None)
+            elif in_dependency and not in_exclusions:
+                if tag == "groupId":
+                    group = value
+                else:
+                    artifact, artifact_line = value, number
+
 
 class LicenseScanner:
-    RESTRICTED_LICENSES = ["GPL", "AGPL", "Affero"]
-    
-    # Simple knowledge base of common packages with strong copyleft licenses (Demo purpose)
-    KNOWN_RESTRICTED_PACKAGES = {
-        "ffmpeg": "LGPL/GPL",
-        "linux": "GPL-2.0",
-        "bash": "GPL-3.0",
-        "ghostscript": "AGPL",
-        "itext": "AGPL",
-        "sharp": "LGPL",
-        "highcharts": "Prosper/Commercial",
-        "mysqldb": "GPL",
-        "sleepycat": "Sleepycat",
-        "json-c": "Public Domain/MIT" # Example of permissive
+    # Dependency manifests routed here instead of to the LLM, with their parsers
+    PARSERS = {
+        "package.json": _parse_package_json,
+        "package-lock.json": _parse_package_lock,
+        "npm-shrinkwrap.json": _parse_package_lock,
+        "yarn.lock": _parse_yarn_lock,
+        "requirements.txt": _parse_requirements,
+        "pyproject.toml": _parse_pyproject,
+        "Pipfile.lock": _parse_pipfile_lock,
+        "pom.xml": _parse_pom,
     }
+    MANIFEST_FILES = tuple(PARSERS)
+
+    RESTRICTED_LICENSES = ["GPL", "AGPL", "Affero"]
+
+    @staticmethod
+    def _find_word(text: str, word: str) -> int:
+        """
+        Offset of the first whole-word occurrence (regex \\b semantics), using str.find:
+        several times faster than a case-insensitive regex on large files.
+        """
+        i = text.find(word)
+        while i != -1:
+            before = text[i - 1] if i > 0 else " "
+            after = text[i + len(word)] if i + len(word) < len(text) else " "
+            if not (before.isalnum() or before == "_") and not (after.isalnum() or after == "_"):
+                return i
+            i = text.find(word, i + 1)
+        return -1
+
+    @staticmethod
+    def _parser_for(filename: str):
+        for suffix, parser in LicenseScanner.PARSERS.items():
+            if filename.endswith(suffix):
+                return parser
+        return None
 
     @staticmethod
     def scan_content(filename: str, content: str) -> list[dict]:
+        """
+        One linear pass over the manifest: explicit restricted-license terms (LIC-002)
+        and parsed dependencies checked against the license database (LIC-003), each
+        reported at the line it appears on.
+        """
         violations = []
-        
-        # 1. Check for explicit license strings in the file (e.g. "License: GPL")
-        for lic in LicenseScanner.RESTRICTED_LICENSES:
-            if re.search(rf"\b{lic}\b", content, re.IGNORECASE):
+
+        # 1. Check for explicit license strings in the file (e.g. "License: GPL"), first whole-word occurrence of each
+        lowered = content.lower()
+        for term in LicenseScanner.RESTRICTED_LICENSES:
+            offset = LicenseScanner._find_word(lowered, term.lower())
+            if offset != -1:
                 violations.append({
                     "rule_id": "LIC-002",
-                    "message": f"Restricted license term '{lic}' detected in dependency file configuration.",
+                    "message": f"Restricted license term '{term}' detected in dependency file configuration.",
                     "severity": "BLOCKING",
                     "category": "COMPLIANCE",
-                    "file": filename,
-                    "line": 1 # Generic line for file-level check
+                    "file_path": filename,
+                    "line_number": lowered.count("\n", 0, offset) + 1
                 })
 
-        # 2. Heuristic check for known restricted packages
-        if filename.endswith("package.json"):
-            try:
-                data = json.loads(content)
-                deps = {**data.get("dependencies", {}), **data.get("devDependencies", {})}
-                for pkg in deps:
-                    if pkg in LicenseScanner.KNOWN_RESTRICTED_PACKAGES:
-                         violations.append({
-                            "rule_id": "LIC-003",
-                            "message": f"Package '{pkg}' is known to use restricted license: {LicenseScanner.KNOWN_RESTRICTED_PACKAGES[pkg]}",
-                            "severity": "BLOCKING",
-                            "category": "COMPLIANCE",
-                            "file": filename,
-                            "line": 1
-                        })
-            except json.JSONDecodeError:
-                pass # Ignore invalid JSON
-        
-        elif filename.endswith("requirements.txt"):
-             for pkg in LicenseScanner.KNOWN_RESTRICTED_PACKAGES:
-                 if re.search(rf"^\s*{pkg}\b", content, re.MULTILINE):
-                     violations.append({
-                            "rule_id": "LIC-003",
-                            "message": f"Package '{pkg}' is known to use restricted license: {LicenseScanner.KNOWN_RESTRICTED_PACKAGES[pkg]}",
-                            "severity": "BLOCKING",
-                            "category": "COMPLIANCE",
-                            "file": filename,
-                            "line": 1
-                        })
+        # 2. Parsed dependencies vs. the license database (or the license the lockfile declares)
+        parser = LicenseScanner._parser_for(filename)
+        if parser is None:
+            return violations
+        try:
+            dependencies = list(parser(content))
+        except (ValueError, AttributeError, TypeError):
+            return violations   # Ignore invalid manifests (malformed JSON etc.)
+
+        license_db.refresh()
+        reported = set()
+        for ecosystem, name, line_number, declared in dependencies:
+            lic = declared or license_db.lookup(ecosystem, name)
+            if ecosystem == "maven" and lic is None and ":" in name:
+                lic = license_db.lookup(ecosystem, name.split(":", 1)[1])
+            if lic is None or name in reported or not license_db.is_restricted(lic):
+                continue
+            reported.add(name)
+            violations.append({
+                "rule_id": "LIC-003",
+                "message": f"Package '{name}' is known to use restricted license: {lic}",
+                "severity": "BLOCKING",
+                "category": "COMPLIANCE",
+                "file_path": filename,
+                "line_number": line_number
+            })
 
         return violations
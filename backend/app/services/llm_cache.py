@@ -0,0 +1,53 @@
+import os
+import hashlib
+from typing import Optional, Dict, Any
+from app.core.cache import TieredCache, CACHE_DIR
+from app.core.config import settings
+
+
+class LLMResponseCache:
+    """
+    Cache of raw provider responses keyed by a hash of (provider, model, full prompt).
+
+    Sits below the scan result cache and catches identical prompts whose scan keys
+    differ, e.g. a rule-pack edit that leaves a file's static findings unchanged.
+    Batched prompts only hit when the whole batch repeats.
+    """
+
+    def __init__(self):
+        self.enabled = settings.LLM_CACHE_ENABLED
+        self.cache = TieredCache(
+            name="llm_responses",
+            db_file=os.path.join(CACHE_DIR, "llm_cache.db"),
+            memory_entries=settings.LLM_CACHE_MEMORY_ENTRIES,
+            max_entries=settings.LLM_CACHE_MAX_ENTRIES,
+            ttl_seconds=settings.LLM_CACHE_TTL_SECONDS,
+        ) if self.enabled else None
+
+    @staticmethod
+    def make_key(provider: str, model: str, prompt: str) -> str:
+        digest = hashlib.sha256()
+        for part in (provider, model, prompt):
+            digest.update(part.encode("utf-8", errors="surrogatepass"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    async def get(self, key: str) -> Optional[str]:
+        if not self.enabled:
+            return None
+        return await self.cache.get(key)
+
+    def set(self, key: str, response_text: str):
+        if self.enabled:
+            self.cache.set(key, response_text)
+
+    def purge(self) -> int:
+        return self.cache.purge() if self.enabled else 0
+
+    def stats(self) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"enabled": False}
+        return {"enabled": True, **self.cache.stats()}
+
+
+llm_response_cache = LLMResponseCache()
@@ -6,14 +6,63 @@ logger = logging.getLogger(__name__)
 import openai
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from app.core.config import settings
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple, Callable
 from app.models.scan import Violation
 import json
 import os
 import asyncio
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from app.core.rate_limiter import get_rate_limiter, is_rate_limit_error
+from app.services.llm_cache import llm_response_cache
+from app.services.llm_stub import StubBehavior, StubRateLimitError
+from app.services.chunker import chunk_file
+from app.core.metrics import LLM_REQUEST_SECONDS, LLM_RETRIES
+
+# Bump whenever _prepare_prompt/_parse_response change meaningfully, so cached
+# results produced by the old prompt are not served for the new one.
+PROMPT_VERSION = "1"
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Rough token count (~4 characters per token) used for rate limiting and budgets.
+    """
+    return max(1, len(text) // 4)
+
+
+# Provider round-trips made by the current completion, tenacity retries included
+_attempts: ContextVar[list] = ContextVar("llm_attempts", default=None)
+
 
 # --- Abstract Base Class ---
 class BaseLLMClient:
+    provider: str = ""
+    model: str = ""
+
+    @asynccontextmanager
+    async def _rate_limited(self, prompt: str):
+        """
+        Wraps one provider round-trip: waits for RPM/TPM budget and a concurrency slot,
+        and feeds 429s back into the limiter so it adapts its rate.
+        """
+        limiter = get_rate_limiter(self.provider)
+        async with limiter.acquire(estimate_tokens(prompt)):
+            attempts = _attempts.get()
+            if attempts is not None:
+                attempts[0] += 1
+            started = time.perf_counter()
+            try:
+                yield
+            except Exception as e:
+                LLM_REQUEST_SECONDS.labels(self.provider, "error").observe(time.perf_counter() - started)
+                if is_rate_limit_error(e):
+                    limiter.record_rate_limited()
+                raise
+            LLM_REQUEST_SECONDS.labels(self.provider, "ok").observe(time.perf_counter() - started)
+            limiter.record_success()
+
     async def analyze_diff(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
         raise NotImplementedError
 
@@ -57,31 +106,155 @@ Return your findings in valid JSON format ONLY (under "findings" key):
 }}
 """
 
+    def _prepare_batch_prompt(self, files: List[Tuple[str, str, List[Violation]]]) -> str:
+        sections = []
+        for filename, content, static_violations in files:
+            static_context = "\n".join([f"- Line {v.line_number}: {v.message}" for v in static_violations])
+            sections.append(f"""=== FILE: {filename} ===
+Static Analysis Context:
+{static_context}
+
+Code Content:
+```
+{content}
+```
+=== END FILE: {filename} ===""")
+        files_block = "\n\n".join(sections)
+        return f"""
+You are an expert Secure Code Reviewer.
+Analyze EACH of the following {len(files)} files independently for:
+1. Logic Bugs
+2. Security Vulnerabilities (STATIC ANALYSIS MISSED THESE)
+3. Performance Issues
+4. Best Practices
+
+Each file starts with "=== FILE: <path> ===" and ends with "=== END FILE: <path> ===".
+Line numbers are relative to the start of that file's Code Content.
+
+{files_block}
+
+REQUIREMENT:
+- Map every security vulnerability to an **OWASP Top 10** category (e.g., "A03: Injection") and **CWE ID** (e.g., "CWE-89") if applicable.
+- **Check for IP/Copyright Risks**: Flag any code that looks like it was copied from well-known open source projects (GPL/AGPL) or contains copyright headers not matching the project.
+- If the code seems AI-generated, be extra strict on logic/security.
+- Every finding MUST include "file_path" set to the exact path from its FILE delimiter.
+
+Return your findings for ALL files in valid JSON format ONLY (under "findings" key):
+{{
+  "findings": [
+      {{
+        "file_path": "path/of/the/file.py",
+        "rule_id": "AI-SEC-...",
+        "message": "Description...",
+        "severity": "WARNING",
+        "line_number": 10,
+        "suggestion": "Better code...",
+        "owasp_category": "A03:2021-Injection",
+        "cwe_id": "CWE-89"
+      }}
+  ]
+}}
+"""
+
+    @staticmethod
+    def _load_findings(text_response: str) -> List[Dict[str, Any]]:
+        # Clean up potential markdown formatting
+        if text_response.startswith("```json"):
+            text_response = text_response.replace("```json", "").replace("```", "")
+
+        data = json.loads(text_response)
+        return data.get("findings", [])
+
+    @staticmethod
+    def _to_violation(f: Dict[str, Any], filename: str) -> Violation:
+        return Violation(
+            rule_id=f.get("rule_id", "AI-GEN"),
+            message=f.get("message"),
+            severity=f.get("severity", "INFO"),
+            file_path=filename,
+            line_number=f.get("line_number", 1),
+            suggestion=f.get("suggestion"),
+            category="AI_REVIEW"
+        )
+
     def _parse_response(self, text_response: str, filename: str) -> List[Violation]:
         try:
-            # Clean up potential markdown formatting
-            if text_response.startswith("```json"):
-                text_response = text_response.replace("```json", "").replace("```", "")
-            
-            data = json.loads(text_response)
-            findings = data.get("findings", [])
-            
-            violations = []
-            for f in findings:
-                violations.append(Violation(
-                    rule_id=f.get("rule_id", "AI-GEN"),
-                    message=f.get("message"),
-                    severity=f.get("severity", "INFO"),
-                    file_path=filename,
-                    line_number=f.get("line_number", 1),
-                    suggestion=f.get("suggestion"),
-                    category="AI_REVIEW"
-                ))
-            return violations
+            return [self._to_violation(f, filename) for f in self._load_findings(text_response)]
         except Exception as e:
             logger.error(f"LLM Parse Error: {e}")
             return []
 
+    def _parse_batch_response(self, text_response: str, filenames: List[str]) -> Dict[str, List[Violation]]:
+        """
+        Splits the findings of a batched prompt back into per-file violations.
+        """
+        results = {filename: [] for filename in filenames}
+        by_basename = {os.path.basename(filename): filename for filename in filenames}
+        try:
+            findings = self._load_findings(text_response)
+        except Exception as e:
+            logger.error(f"LLM Parse Error (batch of {len(filenames)}): {e}")
+            return results
+
+        for f in findings:
+            path = str(f.get("file_path") or f.get("file") or "")
+            # Models occasionally shorten paths; fall back to the basename when unambiguous
+            filename = path if path in results else by_basename.get(os.path.basename(path))
+            if filename is None:
+                logger.warning(f"Dropping batched LLM finding for unknown file '{path}'")
+                continue
+            try:
+                results[filename].append(self._to_violation(f, filename))
+            except Exception as e:
+                logger.error(f"LLM Parse Error: {e}")
+        return results
+
+    async def _complete(self, prompt: str) -> str:
+        """
+        One provider round-trip returning the raw text response.
+        """
+        raise NotImplementedError
+
+    async def _cached_complete(self, prompt: str) -> str:
+        """
+        _complete() behind the prompt-hash response cache. Only responses that parse
+        as findings JSON are stored, so a garbled answer is retried next time.
+        """
+        key = llm_response_cache.make_key(self.provider, self.model, prompt)
+        cached = await llm_response_cache.get(key)
+        if cached is not None:
+            return cached
+
+        attempts = [0]
+        token = _attempts.set(attempts)
+        try:
+            text = await self._complete(prompt)
+        finally:
+            _attempts.reset(token)
+            if attempts[0]:
+                LLM_RETRIES.labels(self.provider).observe(attempts[0] - 1)
+        try:
+            self._load_findings(text)
+        except Exception:
+            return text
+        llm_response_cache.set(key, text)
+        return text
+
+    async def analyze_batch(self, files: List[Tuple[str, str, List[Violation]]]) -> Dict[str, List[Violation]]:
+        """
+        Reviews several (filename, content, static_violations) in a single prompt.
+        """
+        if not self.client:
+            return {filename: self._mock_analysis(filename, content) for filename, content, _ in files}
+
+        prompt = self._prepare_batch_prompt(files)
+        try:
+            text = await self._cached_complete(prompt)
+        except Exception as e:
+            logger.error(f"{self.provider} batch Error ({len(files)} files): {e}")
+            raise
+        return self._parse_batch_response(text, [filename for filename, _, _ in files])
+
     def _mock_analysis(self, filename: str, content: str) -> List[Violation]:
         # Mock findings if no key provided
         violations = []
@@ -99,6 +272,9 @@ Return your findings in valid JSON format ONLY (under "findings" key):
 
 # --- Gemini Implementation ---
 class GeminiClient(BaseLLMClient):
+    provider = "gemini"
+    model = "gemini-2.5-flash"
+
     def __init__(self):
         self.api_key = settings.GEMINI_API_KEY
         self.client = None
@@ -132,13 +308,19 @@ class GeminiClient(BaseLLMClient):
             ),
         ]
 
-        return await self.client.aio.models.generate_content(
-            model='gemini-2.5-flash',
-            contents=prompt,
-            config=types.GenerateContentConfig(
-                safety_settings=safety_config
+        # Each retry attempt pays into the limiter again
+        async with self._rate_limited(prompt):
+            return await self.client.aio.models.generate_content(
+                model=self.model,
+                contents=prompt,
+                config=types.GenerateContentConfig(
+                    safety_settings=safety_config
+                )
             )
-        )
+
+    async def _complete(self, prompt: str) -> str:
+        response = await self._call_gemini(prompt)
+        return response.text
 
     async def analyze_diff(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
         if not self.client:
@@ -146,24 +328,28 @@ class GeminiClient(BaseLLMClient):
         
         prompt = self._prepare_prompt(filename, content, static_violations)
         try:
-            response = await self._call_gemini(prompt)
-            return self._parse_response(response.text, filename)
+            text = await self._cached_complete(prompt)
+            return self._parse_response(text, filename)
         except Exception as e:
             # Check for RetryError structure from google.api_core
             if "RetryError" in str(type(e)):
                  logger.error(f"Gemini Retry failed. Underlying cause: {getattr(e, 'cause', e)}")
                  # Continue to try fallback
             logger.error(f"Gemini Error: {e}")
-            return []
+            # Surface the failure so the analyzer reports SYS-LLM-FAIL (and never caches it)
+            raise
 
 # --- OpenAI Implementation ---
 class OpenAIClient(BaseLLMClient):
+    provider = "openai"
+    model = "gpt-3.5-turbo"
+
     def __init__(self):
         self.api_key = settings.OPENAI_API_KEY
         self.client = None
         if self.api_key:
             from openai import AsyncOpenAI
-            self.client = AsyncOpenAI(api_key=self.api_key)
+            self.client = AsyncOpenAI(api_key=self.api_key, base_url=settings.OPENAI_BASE_URL or None)
 
     @retry(
         retry=retry_if_exception_type(Exception), 
@@ -171,11 +357,16 @@ class OpenAIClient(BaseLLMClient):
         wait=wait_exponential(multiplier=1, min=2, max=60)
     )
     async def _call_openai(self, prompt: str):
-        return await self.client.chat.completions.create(
-            model="gpt-3.5-turbo", # Or gpt-3.5-turbo
-            messages=[{"role": "user", "content": prompt}],
-            response_format={"type": "json_object"}
-        )
+        async with self._rate_limited(prompt):
+            return await self.client.chat.completions.create(
+                model=self.model,
+                messages=[{"role": "user", "content": prompt}],
+                response_format={"type": "json_object"}
+            )
+
+    async def _complete(self, prompt: str) -> str:
+        response = await self._call_openai(prompt)
+        return response.choices[0].message.content
 
     async def analyze_diff(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
         if not self.client:
@@ -183,12 +374,57 @@ class OpenAIClient(BaseLLMClient):
         
         prompt = self._prepare_prompt(filename, content, static_violations)
         try:
-            response = await self._call_openai(prompt)
-            content = response.choices[0].message.content
-            return self._parse_response(content, filename)
+            text = await self._cached_complete(prompt)
+            return self._parse_response(text, filename)
         except Exception as e:
             logger.error(f"OpenAI Error: {e}")
-            return []
+            raise
+
+# --- Stub Implementation (load testing) ---
+class StubClient(BaseLLMClient):
+    """
+    Simulated provider (LLM_PROVIDER=stub): no network, no quota. Latency, 429s and
+    canned findings come from StubBehavior, and calls go through the same rate
+    limiter and retries as a real provider, so limits can be tuned offline.
+    """
+    provider = "stub"
+    model = "stub-1"
+
+    def __init__(self):
+        self.behavior = StubBehavior(
+            latency_ms=settings.STUB_LLM_LATENCY_MS,
+            sigma=settings.STUB_LLM_LATENCY_SIGMA,
+            ms_per_1k_tokens=settings.STUB_LLM_MS_PER_1K_TOKENS,
+            rate_limit_rate=settings.STUB_LLM_RATE_LIMIT_RATE,
+            findings_per_file=settings.STUB_LLM_FINDINGS_PER_FILE,
+        )
+        self.client = self.behavior
+
+    @retry(
+        retry=retry_if_exception_type(Exception), 
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=60)
+    )
+    async def _call_stub(self, prompt: str) -> str:
+        async with self._rate_limited(prompt):
+            if self.behavior.should_rate_limit():
+                # Real providers answer 429s fast
+                await asyncio.sleep(self.behavior.latency(0) / 10)
+                raise StubRateLimitError(retry_after=1.0)
+            await asyncio.sleep(self.behavior.latency(estimate_tokens(prompt)))
+            return self.behavior.response_text(prompt)
+
+    async def _complete(self, prompt: str) -> str:
+        return await self._call_stub(prompt)
+
+    async def analyze_diff(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
+        prompt = self._prepare_prompt(filename, content, static_violations)
+        try:
+            text = await self._cached_complete(prompt)
+            return self._parse_response(text, filename)
+        except Exception as e:
+            logger.error(f"Stub LLM Error: {e}")
+            raise
 
 # --- Factory / Singleton Wrapper ---
 class LLMServiceWrapper:
@@ -198,11 +434,117 @@ class LLMServiceWrapper:
         
         if self.provider == "openai":
             self.client = OpenAIClient()
+        elif self.provider == "stub":
+            self.client = StubClient()
         else:
             self.client = GeminiClient()
 
+    @property
+    def fingerprint(self) -> str:
+        """
+        Identifies what produced AI findings: provider, model, prompt version, and
+        whether a real model or the offline mock answered.
+        """
+        mode = "live" if self.client.client else "mock"
+        return f"{self.provider}:{self.client.model}:{mode}:v{PROMPT_VERSION}"
+
     async def analyze_diff(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
+        limit = settings.LLM_CHUNK_TOKEN_LIMIT
+        if limit > 0 and estimate_tokens(content) > limit:
+            return await self._analyze_chunked(filename, content, static_violations)
         return await self.client.analyze_diff(filename, content, static_violations)
 
+    async def _analyze_chunked(self, filename: str, content: str, static_violations: List[Violation]) -> List[Violation]:
+        """
+        Reviews an oversized file as overlapping, syntax-aligned windows (see
+        app/services/chunker.py), all queued on the rate limiter at once. Findings are
+        mapped back to absolute line numbers and duplicates from the overlaps merged.
+        """
+        chunks = chunk_file(filename, content, settings.LLM_CHUNK_TOKEN_LIMIT, settings.LLM_CHUNK_OVERLAP_LINES)
+        logger.info(f"✂️ Reviewing {filename} in {len(chunks)} chunks")
+
+        async def _review(first: int, last: int, text: str) -> List[Violation]:
+            # Static context for this window only, numbered like the code the model sees
+            local_static = [v.model_copy(update={"line_number": v.line_number - first + 1})
+                            for v in static_violations if first <= v.line_number <= last]
+            found = await self.client.analyze_diff(f"{filename} (lines {first}-{last})", text, local_static)
+            span = last - first + 1
+            return [v.model_copy(update={"file_path": filename,
+                                   "line_number": first + min(max(v.line_number, 1), span) - 1})
+                    for v in found]
+
+        # Let every chunk finish even if one fails: successful answers land in the LLM
+        # cache, so the retry on the next push only pays for the failed windows
+        results = await asyncio.gather(*[_review(*chunk) for chunk in chunks], return_exceptions=True)
+        for result in results:
+            if isinstance(result, Exception):
+                raise result
+
+        merged: List[Violation] = []
+        seen = set()
+        for found in results:
+            for v in found:
+                key = (v.rule_id, v.line_number)
+                if key not in seen:
+                    seen.add(key)
+                    merged.append(v)
+        return merged
+
+    @staticmethod
+    def _plan_batches(items: List[Tuple[str, str, List[Violation]]]) -> List[List[int]]:
+        """
+        Groups item indexes into prompts: small files are packed greedily under the
+        token budget, oversized files (and leftovers) go out on their own.
+        """
+        budget = settings.LLM_BATCH_TOKEN_BUDGET
+        plan: List[List[int]] = []
+        batch: List[int] = []
+        batch_tokens = 0
+        batch_names = set()
+
+        for i, (filename, content, static_violations) in enumerate(items):
+            tokens = estimate_tokens(content) + 20 * len(static_violations)
+            if budget <= 0 or tokens > settings.LLM_BATCH_FILE_TOKEN_LIMIT:
+                plan.append([i])
+                continue
+            if batch and (batch_tokens + tokens > budget
+                          or len(batch) >= settings.LLM_BATCH_MAX_FILES
+                          or filename in batch_names):
+                plan.append(batch)
+                batch, batch_tokens, batch_names = [], 0, set()
+            batch.append(i)
+            batch_tokens += tokens
+            batch_names.add(filename)
+        if batch:
+            plan.append(batch)
+        return plan
+
+    async def analyze_many(self, items: List[Tuple[str, str, List[Violation]]], on_result: Callable[[int, Any], None] = None) -> List[Any]:
+        """
+        AI review of many (filename, content, static_violations) items with as few
+        provider round-trips as the batch budget allows. Returns, aligned with items,
+        each file's violations or the exception that prevented its review.
+        `on_result(index, result)` is called as soon as each item's result is known.
+        """
+        results: List[Any] = [None] * len(items)
+
+        async def _run(indexes: List[int]):
+            try:
+                if len(indexes) == 1:
+                    results[indexes[0]] = await self.analyze_diff(*items[indexes[0]])
+                else:
+                    by_file = await self.client.analyze_batch([items[i] for i in indexes])
+                    for i in indexes:
+                        results[i] = by_file.get(items[i][0], [])
+            except Exception as e:
+                for i in indexes:
+                    results[i] = e
+            if on_result is not None:
+                for i in indexes:
+                    on_result(i, results[i])
+
+        await asyncio.gather(*[_run(indexes) for indexes in self._plan_batches(items)])
+        return results
+
 # Export the singleton
 llm_service = LLMServiceWrapper()
@@ -0,0 +1,95 @@
+import re
+import json
+import math
+import random
+import hashlib
+from typing import Any, Dict, List, Optional
+
+_BATCH_FILE = re.compile(r"^=== FILE: (.+) ===$", re.MULTILINE)
+_SINGLE_FILE = re.compile(r"^File: (.+)$", re.MULTILINE)
+
+_CANNED = [
+    ("AI-SEC-STUB-01", "WARNING", "Untrusted input reaches a sensitive sink without validation.", "A03:2021-Injection", "CWE-20"),
+    ("AI-PERF-STUB-01", "INFO", "Loop performs a blocking call per iteration; batch or parallelize it.", None, None),
+    ("AI-BUG-STUB-01", "WARNING", "Error is swallowed; failures here will go unnoticed.", None, "CWE-390"),
+]
+
+
+class StubRateLimitError(Exception):
+    """
+    Injected 429, shaped like the provider SDK errors `is_rate_limit_error` detects.
+    """
+    status_code = 429
+
+    def __init__(self, retry_after: float):
+        self.retry_after = retry_after
+        super().__init__(f"429 Rate limit reached (stub). Retry after {retry_after:.1f}s")
+
+
+class StubBehavior:
+    """
+    Simulated LLM provider: latency, rate limiting and answers.
+
+    Latency is lognormal around `latency_ms` (the median) with spread `sigma`
+    (0 = fixed), plus `ms_per_1k_tokens` for prompt size, so large prompts are
+    slower like they are for real models. `rate_limit_rate` of the calls fail with
+    a 429. Findings are canned, `findings_per_file` per file named in the prompt,
+    and deterministic per prompt so response caching behaves as it would live.
+
+    Shared by `StubClient` (LLM_PROVIDER=stub, in-process) and the standalone fake
+    OpenAI server (scripts/fake_openai_server.py).
+    """
+
+    def __init__(self, latency_ms: float, sigma: float, ms_per_1k_tokens: float,
+                 rate_limit_rate: float, findings_per_file: int, seed: Optional[int] = None):
+        self.latency_ms = latency_ms
+        self.sigma = sigma
+        self.ms_per_1k_tokens = ms_per_1k_tokens
+        self.rate_limit_rate = rate_limit_rate
+        self.findings_per_file = findings_per_file
+        self._rng = random.Random(seed)
+        self.calls = 0
+        self.rate_limited = 0
+
+    def latency(self, prompt_tokens: int) -> float:
+        """
+        Seconds this call should take.
+        """
+        base = self.latency_ms * math.exp(self.sigma * self._rng.gauss(0.0, 1.0)) if self.sigma > 0 else self.latency_ms
+        return max(0.0, base + self.ms_per_1k_tokens * prompt_tokens / 1000.0) / 1000.0
+
+    def should_rate_limit(self) -> bool:
+        self.calls += 1
+        if self.rate_limit_rate > 0 and self._rng.random() < self.rate_limit_rate:
+            self.rate_limited += 1
+            return True
+        return False
+
+    def findings(self, prompt: str) -> List[Dict[str, Any]]:
+        batch_files = _BATCH_FILE.findall(prompt)
+        files = batch_files or _SINGLE_FILE.findall(prompt)[:1] or [None]
+        # Seeded by the prompt, not the shared RNG: the same prompt always gets the same answer
+        rng = random.Random(hashlib.sha256(prompt.encode("utf-8")).digest())
+        findings = []
+        for path in files:
+            for _ in range(self.findings_per_file):
+                rule_id, severity, message, owasp, cwe = rng.choice(_CANNED)
+                finding = {
+                    "rule_id": rule_id,
+                    "message": message,
+                    "severity": severity,
+                    "line_number": rng.randint(1, 40),
+                    "suggestion": None,
+                    "owasp_category": owasp,
+                    "cwe_id": cwe,
+                }
+                if batch_files:
+                    finding["file_path"] = path
+                findings.append(finding)
+        return findings
+
+    def response_text(self, prompt: str) -> str:
+        return json.dumps({"findings": self.findings(prompt)})
+
+    def stats(self) -> Dict[str, Any]:
+        return {"calls": self.calls, "rate_limited": self.rate_limited}
@@ -0,0 +1,163 @@
+import ast
+import os
+import re
+from typing import List, Optional, Set, Tuple
+from app.core.config import settings
+from app.models.scan import Violation
+from app.services.chunker import brace_depths
+from app.services.diff_parser import LineRange, expand_ranges
+
+# (excerpt text, file line of each excerpt line, static findings renumbered to the excerpt)
+Excerpt = Tuple[str, List[int], List[Violation]]
+
+# Send the excerpt only when it saves at least a fifth of the file
+_MAX_EXCERPT_RATIO = 0.8
+
+_IMPORT_LINE = re.compile(
+    r"^\s*(?:import\b|from\s+\S+\s+import\b|#\s*include\b|using\s+[\w.]+\s*;|package\s+[\w.]+|require\b|"
+    r"(?:const|let|var)\s+[^=]+=\s*require\s*\()"
+)
+_HASH_COMMENTS = (".py", ".rb", ".sh", ".yaml", ".yml", ".toml", ".pl", ".r")
+
+
+def _gap_marker(filename: str, first: int, last: int) -> str:
+    ext = os.path.splitext(filename)[1].lower()
+    prefix = "#" if ext in _HASH_COMMENTS else "--" if ext == ".sql" else "//"
+    return f"{prefix} ... lines {first}-{last} omitted ..."
+
+
+def _python_context(content: str, changed: List[LineRange], max_def_lines: int) -> Set[int]:
+    """
+    Imports plus, for every changed range, the enclosing def/class chain: the outermost
+    definition short enough is included whole, the ones around it by their header.
+    """
+    tree = ast.parse(content)
+    include: Set[int] = set()
+    definitions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and node.col_offset == 0:
+            include.update(range(node.lineno, node.end_lineno + 1))
+        elif isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+            header_end = max(node.lineno, node.body[0].lineno - 1)
+            definitions.append((start, header_end, node.end_lineno))
+
+    for first, last in changed:
+        # Outermost first: ast.walk is breadth-first, but sort to be explicit
+        enclosing = sorted(d for d in definitions if d[0] <= first and last <= d[2])
+        whole = False
+        for start, header_end, end in enclosing:
+            if not whole and end - start + 1 <= max_def_lines:
+                include.update(range(start, end + 1))
+                whole = True
+            else:
+                include.update(range(start, header_end + 1))
+    return include
+
+
+def _brace_context(lines: List[str], changed: List[LineRange], max_def_lines: int) -> Set[int]:
+    """
+    Same idea for brace languages: import-like lines plus the chain of block headers
+    (lines that open a bracket enclosing the change), found by walking back through
+    bracket depths.
+    """
+    include = {number for number, line in enumerate(lines, 1) if _IMPORT_LINE.match(line)}
+    depths = brace_depths(lines)
+
+    def _block_end(header: int) -> int:
+        # Last line before the depth drops back to the header's level
+        level = depths[header - 1]
+        for number in range(header + 1, len(lines) + 1):
+            if depths[number] is not None and depths[number] <= level:
+                return number
+        return len(lines)
+
+    for first, last in changed:
+        target = depths[first - 1]
+        headers = []
+        number = first - 1
+        while number >= 1 and target:
+            depth = depths[number - 1]
+            if depth is not None and depth < target and (depths[number] or 0) > depth:
+                headers.append(number)
+                target = depth
+            number -= 1
+
+        whole = False
+        for header in reversed(headers):   # outermost first
+            # A lone "{" belongs to the signature on the line above
+            start = header - 1 if lines[header - 1].strip() == "{" and header > 1 else header
+            end = _block_end(header)
+            if not whole and end >= last and end - start + 1 <= max_def_lines:
+                include.update(range(start, end + 1))
+                whole = True
+            else:
+                include.update(range(start, header + 1))
+    return include
+
+
+def build_excerpt(filename: str, content: str, changed: List[LineRange],
+                  static_violations: List[Violation]) -> Optional[Excerpt]:
+    """
+    Minimal review context for a patch: the changed hunks (plus LLM_DIFF_CONTEXT_LINES),
+    the definitions enclosing them, the file's imports and the static findings inside
+    that selection. Omitted stretches become one comment line each, so the model still
+    sees the shape of the file.
+
+    Returns None when the excerpt would not be meaningfully smaller than the file.
+    Lines are split on newlines only, matching the patch line numbers in `changed`.
+    """
+    lines = content.split("\n")
+    if not content or not changed:
+        return None
+    changed = expand_ranges([(max(1, a), min(len(lines), b)) for a, b in changed], 0, len(lines))
+    if not changed:
+        return None
+
+    include: Set[int] = set()
+    for first, last in expand_ranges(changed, settings.LLM_DIFF_CONTEXT_LINES, len(lines)):
+        include.update(range(first, last + 1))
+    context = None
+    if filename.endswith(".py"):
+        try:
+            context = _python_context(content, changed, settings.LLM_DIFF_MAX_DEF_LINES)
+        except (SyntaxError, ValueError, RecursionError):
+            pass
+    if context is None:
+        context = _brace_context(lines, changed, settings.LLM_DIFF_MAX_DEF_LINES)
+    include.update(n for n in context if 1 <= n <= len(lines))
+
+    out: List[str] = []
+    line_map: List[int] = []
+    position = {}
+    previous = 0
+    for number in sorted(include):
+        if number > previous + 1:
+            out.append(_gap_marker(filename, previous + 1, number - 1))
+            line_map.append(number)   # findings on a marker point at the next shown line
+        out.append(lines[number - 1])
+        line_map.append(number)
+        position[number] = len(line_map)
+        previous = number
+    if previous < len(lines):
+        out.append(_gap_marker(filename, previous + 1, len(lines)))
+        line_map.append(previous)
+
+    text = "\n".join(out)
+    if len(text) >= len(content) * _MAX_EXCERPT_RATIO:
+        return None
+
+    static = [v.model_copy(update={"line_number": position[v.line_number]})
+              for v in static_violations if v.line_number in include]
+    return text, line_map, static
+
+
+def remap_findings(violations: List[Violation], line_map: List[int]) -> List[Violation]:
+    """
+    Excerpt line numbers in LLM findings -> line numbers in the file.
+    """
+    remapped = []
+    for v in violations:
+        index = min(max(v.line_number, 1), len(line_map)) - 1
+        remapped.append(v.model_copy(update={"line_number": line_map[index]}))
+    return remapped
@@ -3,33 +3,31 @@ import re
 import tempfile
 import os
 import json
-from typing import List
+from typing import List, Tuple
 from app.models.scan import Violation
 from app.core.rule_engine import rule_engine
+from app.core.scan_executor import scan_executor
 
 class StaticAnalysisService:
     def __init__(self):
         # Load rules from engine
         self.regex_rules = rule_engine.get_rules()
 
-    async def scan_content(self, filename: str, content: str, config_override: str = None) -> List[Violation]:
+    async def scan_content(self, filename: str, content: str, config_override: str = None,
+                           line_ranges: List[Tuple[int, int]] = None) -> List[Violation]:
+        """
+        Runs the regex rules over content. `line_ranges` (1-based, inclusive) restricts
+        the scan to those lines, e.g. the changed hunks in diff-aware mode.
+        """
         violations = []
         
         # 1. Run Regex Checks (with potential override)
-        current_rules = rule_engine.get_rules(config_override)
+        # Resolved once per distinct override; the matcher comes precompiled
+        rule_set = rule_engine.resolve(config_override)
         
-        lines = content.split('\n')
-        for i, line in enumerate(lines):
-            for rule in current_rules:
-                if re.search(rule["pattern"], line):
-                    violations.append(Violation(
-                        rule_id=rule["id"],
-                        message=rule["message"],
-                        severity=rule["severity"],
-                        file_path=filename,
-                        line_number=i + 1,
-                        category=rule["category"]
-                    ))
+        # Single pass over the buffer with all rules combined (see RuleMatcher);
+        # large files go to the process pool so the event loop stays responsive
+        violations.extend(await scan_executor.scan_static(rule_set, filename, content, line_ranges))
         
         # 2. Run Bandit (if python)
         if filename.endswith(".py"):
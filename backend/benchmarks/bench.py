@@ -0,0 +1,312 @@
+"""
+Benchmark suite for the scan pipeline.
+
+Measures throughput and peak memory of static analysis, license scanning, rule
+resolution and the full hybrid analysis (LLM mocked) over the deterministic corpora
+in benchmarks/corpus.py, writes the results as JSON and can compare them against a
+stored baseline.
+
+    cd backend
+    python -m benchmarks.bench --out bench_results.json
+    python -m benchmarks.bench --compare baseline.json --threshold 0.25
+
+The comparison exits with status 1 when any benchmark got slower (median time per
+operation) or hungrier (peak traced memory) than the threshold allows.
+"""
+import os
+import sys
+
+# Result and LLM caches would turn every iteration after the first into a cache hit
+os.environ.setdefault("SCAN_CACHE_ENABLED", "false")
+os.environ.setdefault("LLM_CACHE_ENABLED", "false")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import re
+import gc
+import json
+import time
+import asyncio
+import argparse
+import platform
+import statistics
+import subprocess
+import tracemalloc
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from benchmarks import corpus
+
+# Quiet the app's INFO logging (rule loading, pool start) so the report stays readable
+import logging
+logging.disable(logging.INFO)
+
+from app.core.config import settings
+from app.core.rule_engine import RuleEngine, rule_engine
+from app.core.scan_executor import scan_executor
+from app.services.static_analysis import static_analyzer
+from app.services.license_scanner import LicenseScanner
+from app.services.llm_service import BaseLLMClient, llm_service
+from app.engine.hybrid_analyzer import analyzer
+from app.models.scan import ScanRequest
+
+FILE_PATTERN = re.compile(r"^=== FILE: (.+) ===$", re.MULTILINE)
+
+
+class MockLLMClient(BaseLLMClient):
+    """
+    Answers instantly with one canned finding per file, so the benchmark covers
+    prompt building, batching and response parsing without a provider round-trip
+    (and without the provider rate limiter, which would dominate every number).
+    """
+    provider = "benchmark"
+    model = "mock"
+
+    def __init__(self):
+        self.client = self
+
+    async def _complete(self, prompt: str) -> str:
+        files = FILE_PATTERN.findall(prompt) or [None]
+        return json.dumps({"findings": [
+            {"file_path": f, "rule_id": "AI-BENCH-01", "message": "Canned finding.", "severity": "INFO", "line_number": 1}
+            for f in files
+        ]})
+
+    async def analyze_diff(self, filename, content, static_violations):
+        prompt = self._prepare_prompt(filename, content, static_violations)
+        return self._parse_response(await self._cached_complete(prompt), filename)
+
+
+class Benchmark:
+    def __init__(self, name: str, group: str, fn: Callable[[], Any], bytes_per_op: int = 0, files_per_op: int = 1):
+        self.name = name
+        self.group = group
+        self.fn = fn
+        self.bytes_per_op = bytes_per_op
+        self.files_per_op = files_per_op
+
+
+def _run_once(fn: Callable[[], Any], loop: asyncio.AbstractEventLoop):
+    result = fn()
+    if asyncio.iscoroutine(result):
+        result = loop.run_until_complete(result)
+    return result
+
+
+def _count(result) -> int:
+    if hasattr(result, "violations"):
+        return len(result.violations)
+    if isinstance(result, list):
+        return len(result)
+    return 0
+
+
+def measure(bench: Benchmark, loop: asyncio.AbstractEventLoop, min_time: float, min_iterations: int) -> Dict[str, Any]:
+    # Warm-up: first-use costs (pool start, regex compile, rule resolution) are not the steady state
+    result = _run_once(bench.fn, loop)
+
+    timings: List[float] = []
+    started = time.perf_counter()
+    while len(timings) < min_iterations or time.perf_counter() - started < min_time:
+        t0 = time.perf_counter()
+        _run_once(bench.fn, loop)
+        timings.append(time.perf_counter() - t0)
+
+    # Separate traced pass: tracemalloc slows allocation-heavy code several times over
+    gc.collect()
+    tracemalloc.start()
+    _run_once(bench.fn, loop)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    median = statistics.median(timings)
+    return {
+        "group": bench.group,
+        "iterations": len(timings),
+        "median_s": median,
+        "mean_s": statistics.fmean(timings),
+        "min_s": min(timings),
+        "stdev_s": statistics.stdev(timings) if len(timings) > 1 else 0.0,
+        "ops_per_s": 1 / median if median else None,
+        "files_per_s": bench.files_per_op / median if median else None,
+        "mb_per_s": bench.bytes_per_op / median / 1e6 if median and bench.bytes_per_op else None,
+        "peak_memory_bytes": peak,
+        "violations": _count(result),
+    }
+
+
+def build_benchmarks() -> List[Benchmark]:
+    benches: List[Benchmark] = []
+
+    # 1. StaticAnalysisService.scan_content: size x language x density, default pack
+    for size, lines in corpus.SIZES.items():
+        for language in corpus.LANGUAGES:
+            for density_name, density in corpus.DENSITIES.items():
+                content = corpus.source_file(language, lines, density, seed=1)
+                filename = f"bench.{corpus.EXTENSIONS[language]}"
+                benches.append(Benchmark(
+                    f"static.scan_content[{size}-{language}-{density_name}]", "static",
+                    lambda f=filename, c=content: static_analyzer.scan_content(f, c),
+                    bytes_per_op=len(content.encode("utf-8"))
+                ))
+
+    # ... every rule pack over the same mixed-language file
+    mixed = corpus.mixed_file(corpus.SIZES["medium"], corpus.DENSITIES["sparse"], seed=2)
+    for pack in corpus.RULE_PACKS:
+        override = corpus.pack_override(pack)
+        benches.append(Benchmark(
+            f"static.scan_content[pack-{pack}]", "static",
+            lambda o=override: static_analyzer.scan_content("bench.py", mixed, o),
+            bytes_per_op=len(mixed.encode("utf-8"))
+        ))
+
+    # 2. LicenseScanner.scan_content
+    for kind in corpus.MANIFEST_KINDS:
+        for size, count in corpus.MANIFEST_SIZES.items():
+            content = corpus.manifest_file(kind, count, restricted_rate=0.05, seed=3)
+            benches.append(Benchmark(
+                f"license.scan_content[{kind}-{size}]", "license",
+                lambda k=kind, c=content: LicenseScanner.scan_content(k, c),
+                bytes_per_op=len(content.encode("utf-8"))
+            ))
+
+    # 3. RuleEngine.get_rules: warm (resolved-rule cache) and cold (YAML load + compile)
+    for pack in corpus.RULE_PACKS:
+        override = corpus.pack_override(pack)
+        benches.append(Benchmark(
+            f"rules.get_rules[{pack}-warm]", "rules",
+            lambda o=override: rule_engine.get_rules(o)
+        ))
+        benches.append(Benchmark(
+            f"rules.get_rules[{pack}-cold]", "rules",
+            lambda o=override: RuleEngine().get_rules(o)
+        ))
+
+    # 4. HybridAnalyzer.analyze end to end, LLM mocked
+    for name in corpus.PULL_REQUESTS:
+        payload = corpus.pull_request(name, seed=4)
+        size = sum(len(f["content"].encode("utf-8")) for f in payload["files"])
+        benches.append(Benchmark(
+            f"analyze[{name}]", "analyze",
+            lambda p=payload: analyzer.analyze(ScanRequest(**p)),
+            bytes_per_op=size, files_per_op=len(payload["files"])
+        ))
+    return benches
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, timeout=5,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip() or None
+    except Exception:
+        return None
+
+
+def run(selected: str = None, min_time: float = 1.0, min_iterations: int = 5) -> Dict[str, Any]:
+    llm_service.client = MockLLMClient()
+    loop = asyncio.new_event_loop()
+    asyncio.set_event_loop(loop)
+
+    results = {}
+    try:
+        for bench in build_benchmarks():
+            if selected and not re.search(selected, bench.name):
+                continue
+            results[bench.name] = measure(bench, loop, min_time, min_iterations)
+            r = results[bench.name]
+            print(f"{bench.name:<48} {r['median_s'] * 1000:>10.3f} ms  "
+                  f"{(r['mb_per_s'] or 0):>8.2f} MB/s  {r['peak_memory_bytes'] / 1024:>10.0f} KiB  "
+                  f"({r['iterations']} runs)")
+    finally:
+        scan_executor.shutdown()
+        loop.close()
+
+    return {
+        "meta": {
+            "created_at": datetime.utcnow().isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "min_time_s": min_time,
+            "filter": selected,
+            # Memory is traced in this process only: files handed to the scan pool are not counted
+            "process_pool": {
+                "enabled": settings.SCAN_PROCESS_POOL_ENABLED,
+                "threshold_bytes": settings.SCAN_PROCESS_THRESHOLD_BYTES,
+            },
+        },
+        "benchmarks": results,
+    }
+
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float, memory_threshold: float) -> List[str]:
+    """
+    Returns one message per regression. Time compares medians; memory ignores
+    growth under 64 KiB, which is allocator noise at these sizes.
+    """
+    regressions = []
+    base = baseline.get("benchmarks", {})
+    for name, cur in current["benchmarks"].items():
+        old = base.get(name)
+        if old is None:
+            print(f"  new        {name}")
+            continue
+        ratio = cur["median_s"] / old["median_s"] if old["median_s"] else 1.0
+        mem_delta = cur["peak_memory_bytes"] - old["peak_memory_bytes"]
+        mem_ratio = cur["peak_memory_bytes"] / old["peak_memory_bytes"] if old["peak_memory_bytes"] else 1.0
+
+        flags = []
+        if ratio > 1 + threshold:
+            flags.append(f"time x{ratio:.2f}")
+        if mem_ratio > 1 + memory_threshold and mem_delta > 64 * 1024:
+            flags.append(f"memory x{mem_ratio:.2f}")
+        if cur.get("violations") != old.get("violations"):
+            # Not a performance regression, but a benchmark that finds different things measures different work
+            print(f"  changed    {name}: {old.get('violations')} -> {cur.get('violations')} violations")
+
+        status = "REGRESSED" if flags else ("faster" if ratio < 1 - threshold else "ok")
+        print(f"  {status:<10} {name}: time x{ratio:.2f}, memory x{mem_ratio:.2f}")
+        if flags:
+            regressions.append(f"{name}: {', '.join(flags)}")
+
+    if not current["meta"].get("filter"):
+        for name in base:
+            if name not in current["benchmarks"]:
+                print(f"  missing    {name}")
+    return regressions
+
+
+def main(argv: List[str] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the scan pipeline")
+    parser.add_argument("--out", default="bench_results.json", help="Where to write the JSON results")
+    parser.add_argument("--compare", metavar="BASELINE", help="Baseline JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown ratio (0.25 = 25%%)")
+    parser.add_argument("--memory-threshold", type=float, default=0.25, help="Allowed peak memory growth ratio")
+    parser.add_argument("--filter", help="Regex selecting benchmarks by name")
+    parser.add_argument("--min-time", type=float, default=1.0, help="Minimum measuring time per benchmark (s)")
+    parser.add_argument("--min-iterations", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    results = run(args.filter, args.min_time, args.min_iterations)
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nResults written to {args.out}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        print(f"\nComparing against {args.compare} (commit {baseline.get('meta', {}).get('git_commit')}):")
+        regressions = compare(results, baseline, args.threshold, args.memory_threshold)
+        if regressions:
+            print(f"\n❌ {len(regressions)} regression(s):")
+            for r in regressions:
+                print(f"  - {r}")
+            return 1
+        print("\n✅ No regressions.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,199 @@
+"""
+Deterministic synthetic corpora for the benchmark suite.
+
+Every generator takes an explicit seed and uses its own random.Random, so the same
+arguments always produce byte-identical content (and the same violation counts)
+across runs and machines.
+"""
+import json
+import random
+from typing import Dict, List
+
+SIZES = {"small": 60, "medium": 2000, "huge": 40000}   # lines per file
+DENSITIES = {"sparse": 0.002, "dense": 0.2}            # share of lines that violate a rule
+LANGUAGES = ("python", "javascript", "sql")
+EXTENSIONS = {"python": "py", "javascript": "js", "sql": "sql"}
+RULE_PACKS = ("default", "banking", "healthcare", "telecom", "government")
+
+# {i} is the line number; clean lines are realistic enough to exercise the prefilters
+_CLEAN = {
+    "python": [
+        "def handler_{i}(request, retries=3):",
+        "    total = sum(item.amount for item in request.items if item.id != {i})",
+        "    if total > limit_{i} and not request.dry_run:",
+        "        return {{'status': 'ok', 'count': {i}}}",
+        "    logger.debug('processed batch %s', batch_{i})",
+        "    result = session.query(Order).filter(Order.id == order_id).first()",
+        "# Keep the public contract stable for client {i}",
+        "",
+    ],
+    "javascript": [
+        "function handler{i}(req, res) {{",
+        "  const items = req.body.items.filter((x) => x.id !== {i});",
+        "  const total = items.reduce((acc, x) => acc + x.amount, 0);",
+        "  if (total > limit{i}) {{ return res.status(400).json({{ error: 'limit' }}); }}",
+        "  await cache.set(`order:${{req.params.id}}`, total, {{ ttl: {i} }});",
+        "}}",
+        "// Shared helpers for module {i}",
+        "",
+    ],
+    "sql": [
+        "SELECT o.id, o.amount FROM orders o WHERE o.customer_id = :customer_{i};",
+        "CREATE INDEX IF NOT EXISTS idx_orders_{i} ON orders (customer_id, created_at);",
+        "UPDATE accounts SET balance = balance - :amount WHERE id = :id_{i};",
+        "INSERT INTO ledger (account_id, amount) VALUES (:account_{i}, :amount);",
+        "-- migration step {i}",
+        "",
+    ],
+}
+
+_VIOLATING = {
+    "python": [
+        "    password = 'hunter{i}secret'",
+        "    eval(user_input_{i})",
+        "    print(debug_value_{i})",
+        "    cursor.execute('SELECT * FROM users WHERE id = ' + user_{i})",
+        "    api_key = \"sk_live_{i}abcdef\"",
+    ],
+    "javascript": [
+        "  eval(req.query.expr{i});",
+        "  const secret = 'tok_{i}abcdef';",
+        "  db.query('SELECT * FROM users WHERE name = ' + req.query.name{i});",
+        "  exec(cmd{i});",
+    ],
+    "sql": [
+        "EXECUTE 'SELECT * FROM ' + table_{i};",
+        "DELETE FROM audit WHERE id = ' + raw_{i};",
+        "-- password = 'changeme{i}'",
+    ],
+}
+
+
+def source_file(language: str, lines: int, density: float, seed: int) -> str:
+    rng = random.Random(f"{language}:{lines}:{density}:{seed}")
+    clean, violating = _CLEAN[language], _VIOLATING[language]
+    out = []
+    for i in range(1, lines + 1):
+        template = rng.choice(violating) if rng.random() < density else clean[i % len(clean)]
+        out.append(template.format(i=i))
+    return "\n".join(out) + "\n"
+
+
+def mixed_file(lines: int, density: float, seed: int) -> str:
+    """
+    Python with embedded SQL and JS snippets, e.g. a view with inline queries.
+    """
+    chunk = max(1, lines // 3)
+    return "".join(
+        source_file(language, chunk, density, seed + n) for n, language in enumerate(LANGUAGES)
+    )
+
+
+# --- Dependency manifests ----------------------------------------------------
+_PACKAGES = [
+    "requests", "flask", "django", "numpy", "pandas", "boto3", "pyyaml", "click", "rich",
+    "sqlalchemy", "pydantic", "httpx", "celery", "redis", "jinja2", "pytest", "attrs",
+]
+# Names the license scanner knows as copyleft/commercial
+_RESTRICTED = ["mysqldb", "ghostscript", "itext", "sharp", "highcharts"]
+
+
+def _dependencies(count: int, restricted_rate: float, seed: int) -> List[str]:
+    rng = random.Random(f"deps:{count}:{restricted_rate}:{seed}")
+    names = []
+    for i in range(count):
+        if rng.random() < restricted_rate:
+            names.append(rng.choice(_RESTRICTED))
+        else:
+            names.append(f"{rng.choice(_PACKAGES)}-{i}" if i >= len(_PACKAGES) else _PACKAGES[i])
+    return names
+
+
+def manifest_file(kind: str, count: int, restricted_rate: float, seed: int) -> str:
+    rng = random.Random(f"{kind}:{count}:{seed}")
+    deps = _dependencies(count, restricted_rate, seed)
+    if kind == "requirements.txt":
+        return "\n".join(f"{name}=={rng.randint(0, 9)}.{rng.randint(0, 30)}.{rng.randint(0, 9)}" for name in deps) + "\n"
+    if kind == "package.json":
+        return json.dumps({
+            "name": "bench-app",
+            "version": "1.0.0",
+            "dependencies": {name: f"^{rng.randint(0, 9)}.{rng.randint(0, 30)}.0" for name in deps},
+        }, indent=2) + "\n"
+    if kind == "pom.xml":
+        entries = "\n".join(
+            f"    <dependency>\n      <groupId>org.bench</groupId>\n      <artifactId>{name}</artifactId>\n"
+            f"      <version>{rng.randint(0, 9)}.{rng.randint(0, 30)}</version>\n    </dependency>"
+            for name in deps
+        )
+        return f"<project>\n  <dependencies>\n{entries}\n  </dependencies>\n</project>\n"
+    if kind == "pyproject.toml":
+        entries = "\n".join(f'  "{name}>={rng.randint(0, 9)}.{rng.randint(0, 30)}",' for name in deps)
+        return f'[project]\nname = "bench-app"\nversion = "1.0.0"\ndependencies = [\n{entries}\n]\n'
+    if kind == "Pipfile.lock":
+        packages = {name: {"hashes": [f"sha256:{rng.getrandbits(256):064x}"], "version": f"=={rng.randint(0, 9)}.0"} for name in deps}
+        return json.dumps({"_meta": {"hash": {"sha256": "0" * 64}}, "default": packages, "develop": {}}, indent=4) + "\n"
+    if kind == "package-lock.json":
+        packages = {"": {"name": "bench-app", "version": "1.0.0"}}
+        for name in deps:
+            packages[f"node_modules/{name}"] = {
+                "version": f"{rng.randint(0, 9)}.{rng.randint(0, 30)}.0",
+                "resolved": f"https://registry.npmjs.org/{name}/-/{name}-1.0.0.tgz",
+                "integrity": f"sha512-{rng.getrandbits(256):064x}",
+                "license": "MIT",
+            }
+        return json.dumps({"name": "bench-app", "lockfileVersion": 3, "packages": packages}, indent=2) + "\n"
+    if kind == "yarn.lock":
+        return "".join(
+            f'"{name}@^1.0.0":\n  version "1.{rng.randint(0, 30)}.0"\n  resolved "https://registry.yarnpkg.com/{name}"\n\n'
+            for name in deps
+        )
+    raise ValueError(f"Unknown manifest kind: {kind}")
+
+
+MANIFEST_KINDS = ("requirements.txt", "pyproject.toml", "Pipfile.lock", "package.json",
+                  "package-lock.json", "yarn.lock", "pom.xml")
+MANIFEST_SIZES = {"small": 20, "large": 2000, "lockfile": 50000}   # dependencies per manifest
+
+
+# --- Scan requests -----------------------------------------------------------
+def pull_request(name: str, seed: int = 0) -> Dict:
+    """
+    ScanRequest payloads shaped like real pull requests.
+    """
+    files = []
+    if name == "pr-small":
+        # Typical PR: a handful of small code files plus a manifest bump
+        for n in range(12):
+            language = LANGUAGES[n % len(LANGUAGES)]
+            files.append({"filename": f"src/module_{n}.{EXTENSIONS[language]}",
+                          "content": source_file(language, SIZES["small"], DENSITIES["sparse"], seed + n)})
+        files.append({"filename": "requirements.txt",
+                      "content": manifest_file("requirements.txt", MANIFEST_SIZES["small"], 0.1, seed)})
+    elif name == "pr-medium":
+        for n in range(8):
+            language = LANGUAGES[n % len(LANGUAGES)]
+            density = DENSITIES["dense"] if n % 4 == 0 else DENSITIES["sparse"]
+            files.append({"filename": f"src/service_{n}.{EXTENSIONS[language]}",
+                          "content": source_file(language, SIZES["medium"], density, seed + n)})
+        files.append({"filename": "package.json",
+                      "content": manifest_file("package.json", MANIFEST_SIZES["small"], 0.1, seed)})
+    elif name == "pr-huge":
+        # Generated/vendored files next to ordinary ones
+        files.append({"filename": "vendor/bundle.js",
+                      "content": source_file("javascript", SIZES["huge"], DENSITIES["sparse"], seed)})
+        files.append({"filename": "migrations/0001_initial.sql",
+                      "content": source_file("sql", SIZES["huge"] // 2, DENSITIES["dense"], seed)})
+        for n in range(10):
+            files.append({"filename": f"app/views_{n}.py",
+                          "content": mixed_file(SIZES["small"], DENSITIES["sparse"], seed + n)})
+    else:
+        raise ValueError(f"Unknown pull request corpus: {name}")
+    return {"repo_full_name": "bench/repo", "pr_number": 1, "commit_sha": f"bench{seed:04d}", "files": files}
+
+
+PULL_REQUESTS = ("pr-small", "pr-medium", "pr-huge")
+
+
+def pack_override(pack: str) -> str:
+    return None if pack == "default" else f"rule_pack: {pack}\n"
@@ -10,22 +10,45 @@ import urllib.error
 API_URL = os.environ.get("GUARDRAILS_API_URL", "http://127.0.0.1:8000/api/v1/scan")
 # In production, users should set this env var or update the script
 
+# Severities that fail the scan (matches HybridAnalyzer)
+BLOCKING_SEVERITIES = {"BLOCKING", "CRITICAL", "HIGH"}
+
 def get_staged_files():
     """Get list of staged files"""
     try:
-        result = subprocess.check_output(['git', 'diff', '--cached', '--name-only'], encoding='utf-8')
+        # Deleted files have no staged content to scan
+        result = subprocess.check_output(['git', 'diff', '--cached', '--name-only', '--diff-filter=d'], encoding='utf-8')
         return [f for f in result.splitlines() if f]
     except subprocess.CalledProcessError:
         return []
 
-def read_file_content(filepath):
-    """Read content of a file"""
+def get_staged_patch(filepath):
+    """Get the staged unified diff of a file (used by diff-aware scan_mode)"""
+    try:
+        return subprocess.check_output(['git', 'diff', '--cached', '--', filepath], encoding='utf-8', errors='ignore')
+    except subprocess.CalledProcessError:
+        return ""
+
+def read_staged_content(filepath):
+    """Staged (index) version of a file: what is committed, and what the patch line numbers refer to"""
     try:
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            return f.read()
-    except Exception:
+        return subprocess.check_output(['git', 'show', ':' + filepath], encoding='utf-8', errors='ignore')
+    except subprocess.CalledProcessError:
         return ""
 
+def stream_scan(payload):
+    """Yield result frames from the streaming scan endpoint (newline-delimited JSON)"""
+    req = urllib.request.Request(API_URL.rstrip("/") + "/stream")
+    req.add_header('Content-Type', 'application/json')
+    req.add_header('Accept', 'application/x-ndjson')
+    jsondata = json.dumps(payload).encode('utf-8')
+    req.add_header('Content-Length', len(jsondata))
+
+    with urllib.request.urlopen(req, jsondata) as response:
+        for line in response:
+            if line.strip():
+                yield json.loads(line)
+
 def main():
     print("🛡️  AI Guardrails: Local Scan...")
     
@@ -36,11 +59,11 @@ def main():
     # Prepare payload
     files_payload = []
     for f in files:
-        if os.path.exists(f) and not f.endswith(('.png', '.jpg', '.lock', '.zip')):
+        if not f.endswith(('.png', '.jpg', '.lock', '.zip')):
             files_payload.append({
                 "filename": f,
-                "content": read_file_content(f),
-                "patch": "" # Optional for local scan
+                "content": read_staged_content(f),
+                "patch": get_staged_patch(f)
             })
             
     if not files_payload:
@@ -55,24 +78,30 @@ def main():
     }
 
     try:
-        req = urllib.request.Request(API_URL)
-        req.add_header('Content-Type', 'application/json')
-        jsondata = json.dumps(payload).encode('utf-8')
-        req.add_header('Content-Length', len(jsondata))
-        
-        response = urllib.request.urlopen(req, jsondata)
-        res_body = response.read()
-        data = json.loads(res_body)
-        
-        if not data.get("succeeded", True):
-            print("\n❌ Blocking Issues Found:")
-            for v in data.get("violations", []):
-                if v["severity"] == "BLOCKING":
-                    print(f"  - [{v['rule_id']}] {v['file_path']}: {v['message']}")
-            
-            print("\n🚫 Commit rejected. Please fix the above issues.")
-            sys.exit(1)
-            
+        # Streamed: findings print as each file finishes, and the first BLOCKING
+        # violation rejects the commit without waiting for the slower LLM reviews
+        enforcement_mode = "blocking"
+        blocking = []
+        for frame in stream_scan(payload):
+            if frame["type"] == "start":
+                enforcement_mode = frame.get("enforcement_mode", "blocking")
+            elif frame["type"] == "file":
+                for v in frame.get("violations", []):
+                    print(f"  - [{v['rule_id']}] {v['severity']} {v['file_path']}:{v.get('line_number', '?')}: {v['message']}")
+                    if v["severity"] in BLOCKING_SEVERITIES:
+                        blocking.append(v)
+                if blocking and enforcement_mode == "blocking":
+                    print("\n🚫 Commit rejected. Please fix the above issues.")
+                    sys.exit(1)
+            elif frame["type"] == "error":
+                # The server failed mid-scan; treat it like an unreachable server
+                print(f"⚠️  Guardrails scan failed on the server: {frame.get('detail')}")
+                print("   Proceeding with commit (fail-open strategy for local dev).")
+                sys.exit(0)
+            elif frame["type"] == "summary" and not frame.get("succeeded", True):
+                print("\n🚫 Commit rejected. Please fix the above issues.")
+                sys.exit(1)
+
         print("✅ Guardrails passed.")
         sys.exit(0)
 
@@ -0,0 +1,102 @@
+"""
+Local fake of the OpenAI chat-completions API for load tests.
+
+Answers POST /v1/chat/completions with canned findings JSON after a simulated
+latency, and injects 429s at a configurable rate. Point the backend at it with:
+
+    python scripts/fake_openai_server.py --port 8900 --latency-ms 800 --rate-limit-rate 0.05
+    LLM_PROVIDER=openai OPENAI_API_KEY=fake OPENAI_BASE_URL=http://127.0.0.1:8900/v1 uvicorn app.main:app
+
+GET /stats reports calls served and 429s injected.
+"""
+import os
+import sys
+import time
+import uuid
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from app.services.llm_stub import StubBehavior
+
+
+def create_app(behavior: StubBehavior) -> FastAPI:
+    app = FastAPI(title="Fake OpenAI")
+
+    @app.get("/v1/models")
+    async def list_models():
+        return {"object": "list", "data": [{"id": "gpt-3.5-turbo", "object": "model", "owned_by": "stub"}]}
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(
+            m.get("content") or "" for m in body.get("messages", []) if isinstance(m.get("content"), str)
+        )
+        prompt_tokens = max(1, len(prompt) // 4)
+
+        if behavior.should_rate_limit():
+            await asyncio.sleep(behavior.latency(0) / 10)
+            return JSONResponse(
+                status_code=429,
+                headers={"retry-after": "1"},
+                content={"error": {
+                    "message": "Rate limit reached for requests (stub).",
+                    "type": "requests",
+                    "param": None,
+                    "code": "rate_limit_exceeded",
+                }},
+            )
+
+        await asyncio.sleep(behavior.latency(prompt_tokens))
+        content = behavior.response_text(prompt)
+        completion_tokens = max(1, len(content) // 4)
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-3.5-turbo"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    @app.get("/stats")
+    async def stats():
+        return behavior.stats()
+
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Fake OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=800.0, help="Median response latency")
+    parser.add_argument("--sigma", type=float, default=0.5, help="Lognormal spread of the latency (0 = fixed)")
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=0.0, help="Extra latency per 1k prompt tokens")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Share of calls answered with 429")
+    parser.add_argument("--findings-per-file", type=int, default=1)
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    import uvicorn
+    behavior = StubBehavior(
+        latency_ms=args.latency_ms,
+        sigma=args.sigma,
+        ms_per_1k_tokens=args.ms_per_1k_tokens,
+        rate_limit_rate=args.rate_limit_rate,
+        findings_per_file=args.findings_per_file,
+        seed=args.seed,
+    )
+    uvicorn.run(create_app(behavior), host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,164 @@
+"""
+Load generator for POST /api/v1/scan.
+
+Drives concurrent scans and reports latency percentiles, throughput and error
+rates. By default the FastAPI app runs in this process (no server needed) with
+the stub LLM provider, so nothing touches real Gemini/OpenAI quota:
+
+    python scripts/load_test.py --requests 200 --concurrency 16
+    STUB_LLM_RATE_LIMIT_RATE=0.05 LLM_MAX_CONCURRENCY=8 python scripts/load_test.py
+    python scripts/load_test.py --url http://localhost:8000 --corpus pr-medium
+
+Every request carries distinct content (a different corpus seed), so the result
+and LLM caches miss like they would for real pull requests.
+"""
+import os
+import sys
+import json
+import math
+import time
+import asyncio
+import argparse
+from collections import Counter
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks import corpus
+
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    # Nearest-rank
+    index = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[index]
+
+
+async def _scan(client, payload: dict, timeout: float) -> Dict[str, Any]:
+    started = time.perf_counter()
+    try:
+        resp = await client.post("/api/v1/scan", json=payload, timeout=timeout)
+        outcome = {"status": resp.status_code}
+        if resp.status_code == 200:
+            violations = resp.json().get("violations", [])
+            outcome["llm_failures"] = sum(1 for v in violations if v.get("rule_id") == "SYS-LLM-FAIL")
+    except Exception as e:
+        outcome = {"status": type(e).__name__}
+    outcome["latency"] = time.perf_counter() - started
+    outcome["files"] = len(payload["files"])
+    return outcome
+
+
+async def run_load(client, total: int, concurrency: int, corpus_name: str, timeout: float) -> Dict[str, Any]:
+    payloads = [corpus.pull_request(corpus_name, seed=1000 + i) for i in range(total)]
+    outcomes: List[Dict[str, Any]] = []
+    next_index = 0
+
+    async def _worker():
+        nonlocal next_index
+        while next_index < total:
+            payload = payloads[next_index]
+            next_index += 1
+            outcomes.append(await _scan(client, payload, timeout))
+
+    started = time.perf_counter()
+    await asyncio.gather(*[_worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - started
+
+    ok = [o for o in outcomes if o["status"] == 200]
+    latencies = sorted(o["latency"] for o in ok)
+    files_ok = sum(o["files"] for o in ok)
+    llm_failures = sum(o.get("llm_failures", 0) for o in ok)
+    return {
+        "requests": total,
+        "concurrency": concurrency,
+        "corpus": corpus_name,
+        "elapsed_s": elapsed,
+        "throughput_rps": len(ok) / elapsed if elapsed else 0.0,
+        "throughput_files_per_s": files_ok / elapsed if elapsed else 0.0,
+        "latency_s": {
+            "p50": _percentile(latencies, 50),
+            "p95": _percentile(latencies, 95),
+            "p99": _percentile(latencies, 99),
+            "max": latencies[-1] if latencies else 0.0,
+            "mean": sum(latencies) / len(latencies) if latencies else 0.0,
+        },
+        "succeeded": len(ok),
+        "error_rate": 1 - len(ok) / total if total else 0.0,
+        "errors": dict(Counter(str(o["status"]) for o in outcomes if o["status"] != 200)),
+        # The API degrades instead of failing: files whose AI review failed carry SYS-LLM-FAIL
+        "llm_failure_rate": llm_failures / files_ok if files_ok else 0.0,
+    }
+
+
+async def _in_process(args) -> Dict[str, Any]:
+    os.environ.setdefault("LLM_PROVIDER", "stub")
+    import httpx
+    from app.main import app
+    from app.services.llm_service import llm_service
+    from app.core.rate_limiter import get_rate_limiter
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+            report = await run_load(client, args.requests, args.concurrency, args.corpus, args.timeout)
+    finally:
+        await app.router.shutdown()
+
+    report["mode"] = "in-process"
+    report["provider"] = llm_service.fingerprint
+    behavior = getattr(llm_service.client, "behavior", None)
+    if behavior is not None:
+        report["stub"] = behavior.stats()
+    report["rate_limiter"] = {"rate_factor": get_rate_limiter(llm_service.client.provider).rate_factor}
+    return report
+
+
+async def _remote(args) -> Dict[str, Any]:
+    import httpx
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.url.rstrip("/"), limits=limits) as client:
+        report = await run_load(client, args.requests, args.concurrency, args.corpus, args.timeout)
+    report["mode"] = args.url
+    return report
+
+
+def _print_report(report: Dict[str, Any]):
+    lat = report["latency_s"]
+    print(f"\nLoad test: {report['requests']} x {report['corpus']} @ concurrency {report['concurrency']} ({report['mode']})")
+    if "provider" in report:
+        print(f"  Provider:    {report['provider']}")
+    print(f"  Elapsed:     {report['elapsed_s']:.2f}s")
+    print(f"  Throughput:  {report['throughput_rps']:.2f} scans/s, {report['throughput_files_per_s']:.1f} files/s")
+    print(f"  Latency:     p50 {lat['p50'] * 1000:.0f}ms  p95 {lat['p95'] * 1000:.0f}ms  "
+          f"p99 {lat['p99'] * 1000:.0f}ms  max {lat['max'] * 1000:.0f}ms")
+    print(f"  Errors:      {report['error_rate']:.1%} {report['errors'] or ''}")
+    print(f"  LLM failed:  {report['llm_failure_rate']:.1%} of files")
+    if "stub" in report:
+        print(f"  Stub:        {report['stub']['calls']} calls, {report['stub']['rate_limited']} injected 429s, "
+              f"limiter at {report['rate_limiter']['rate_factor']:.0%}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Concurrent load test for /api/v1/scan")
+    parser.add_argument("--url", help="Base URL of a running backend (default: run the app in-process)")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--corpus", default="pr-small", choices=corpus.PULL_REQUESTS)
+    parser.add_argument("--timeout", type=float, default=300.0, help="Per-request timeout (s)")
+    parser.add_argument("--out", help="Also write the report as JSON")
+    args = parser.parse_args()
+
+    report = asyncio.run(_remote(args) if args.url else _in_process(args))
+    _print_report(report)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+    return 0 if report["succeeded"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
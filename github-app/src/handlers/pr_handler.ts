@@ -12,7 +12,7 @@ interface Violation {
     category: string;
 }
 
-interface ScanResponse {
+export interface ScanResponse {
     status: string;
     violations: Violation[];
     succeeded: boolean;
@@ -20,6 +20,16 @@ interface ScanResponse {
     enforcement_mode: string;
 }
 
+export interface ScanJobStatus {
+    job_id: string;
+    status: "queued" | "running" | "completed" | "failed" | "superseded";
+    repo_full_name?: string;
+    commit_sha?: string;
+    pr_number?: number;
+    error?: string;
+    result?: ScanResponse;
+}
+
 export const handlePullRequest = async (context: Context<"pull_request">) => {
     const pr = context.payload.pull_request;
     const repo = context.repo();
@@ -131,7 +141,11 @@ export const handlePullRequest = async (context: Context<"pull_request">) => {
         description: isCopilotGenerated ? "Scanning Copilot-generated code..." : "Scanning for violations..."
     });
 
-    // 2. Call Backend API
+    // 2. Submit a Scan Job to the Backend
+    // The backend answers immediately with a job id, so large PRs no longer hit HTTP
+    // timeouts. With CALLBACK_SECRET set it calls us back on /api/scan-callback
+    // (see index.ts); without one (callbacks need a signature) we poll the job instead.
+    // Either way the result is published by publishJobResult.
     try {
         let backendUrl = process.env.BACKEND_URL || "http://127.0.0.1:8000/api/v1";
 
@@ -141,86 +155,31 @@ export const handlePullRequest = async (context: Context<"pull_request">) => {
             backendUrl = backendUrl.replace(/\/+$/, "") + "/api/v1";
         }
 
+        // The localhost default fits the single-container deployment (supervisord); with
+        // separate containers set SCAN_CALLBACK_URL (docker-compose.yml does). Either way
+        // it must be listed in the backend's SCAN_JOB_CALLBACK_URLS.
+        const callbackUrl = process.env.CALLBACK_SECRET
+            ? process.env.SCAN_CALLBACK_URL || `http://127.0.0.1:${process.env.PORT || 3000}/api/scan-callback`
+            : undefined;
 
-        const response = await axios.post<ScanResponse>(`${backendUrl}/scan`, {
+        const response = await axios.post<ScanJobStatus>(`${backendUrl}/scan/jobs`, {
             repo_full_name: `${repo.owner}/${repo.repo}`,
             pr_number: pr.number,
             commit_sha: pr.head.sha,
             files: filesToScan,
             config_override: configOverride,
-            is_copilot_generated: isCopilotGenerated
+            is_copilot_generated: isCopilotGenerated,
+            callback_url: callbackUrl
         });
 
-        const scanResult = response.data;
+        context.log.info(`Queued scan job ${response.data.job_id} for ${pr.head.sha}`);
 
-        // 3. Post Feedback & Status
-        context.log.info(`Updating commit status to: ${scanResult.succeeded ? "success" : "failure"}`);
-        try {
-            await context.octokit.repos.createCommitStatus({
-                owner: repo.owner,
-                repo: repo.repo,
-                sha: pr.head.sha,
-                state: scanResult.succeeded ? "success" : "failure",
-                context: "AI Guardrails",
-                description: scanResult.summary.substring(0, 140) // GitHub limit
-            });
-            context.log.info("Successfully updated commit status.");
-        } catch (e: any) {
-            context.log.error(`Failed to update commit status: ${e.message}`);
+        if (!callbackUrl) {
+            // Not awaited: the webhook delivery must be answered within GitHub's timeout
+            pollScanJob(backendUrl, response.data.job_id, context.log)
+                .then(job => publishJobResult(context.octokit, job, context.log))
+                .catch(error => context.log.error(error, `Failed to publish scan job ${response.data.job_id}`));
         }
-
-        if (scanResult.violations.length > 0) {
-
-            // Post review comments
-            const comments = scanResult.violations.map(v => ({
-                path: v.file_path,
-                line: v.line_number,
-                body: `**[${v.severity}] ${v.rule_id}**: ${v.message}\n\n${v.suggestion ? `Suggestion: \`${v.suggestion}\`` : ""}`
-            }));
-
-            // Group into a review
-            // Note: GitHub limit is approx 80 comments per review.
-            // For prototype we'll take top 10 to avoid limits.
-            const reviewComments = comments.slice(0, 10);
-
-            try {
-                // Attempt 1: Review with Inline Comments
-                await context.octokit.pulls.createReview({
-                    owner: repo.owner,
-                    repo: repo.repo,
-                    pull_number: pr.number,
-                    event: scanResult.succeeded ? "COMMENT" : "REQUEST_CHANGES",
-                    body: `## Guardrails Scan Results\n\n**Mode**: ${scanResult.enforcement_mode}\n\n${scanResult.summary}\n\n${scanResult.succeeded ? "✅ Checks Passed" : "❌ Blocking Issues Found"}`,
-                    comments: reviewComments
-                });
-            } catch (reviewError: any) {
-                context.log.info(`Inline review failed (likely line mismatch), falling back to summary review: ${reviewError.message}`);
-
-                // Detailed Body for the fallback review
-                const violationDetails = scanResult.violations.map(v =>
-                    `- **[${v.severity}] ${v.rule_id}** (${v.file_path}:${v.line_number}): ${v.message}`
-                ).join("\n");
-
-                // Attempt 2: Review WITHOUT Inline Comments (Body only)
-                // This ensures we still BLOCK the PR (Request Changes) if needed
-                await context.octokit.pulls.createReview({
-                    owner: repo.owner,
-                    repo: repo.repo,
-                    pull_number: pr.number,
-                    event: scanResult.succeeded ? "COMMENT" : "REQUEST_CHANGES",
-                    body: `## Guardrails Scan Results (Summary)\n(Inline comments failed due to line mismatch - violations listed below)\n\n**Mode**: ${scanResult.enforcement_mode}\n\n${scanResult.summary}\n\n### 🔍 Violation Details\n${violationDetails}\n\n${scanResult.succeeded ? "✅ Checks Passed" : "❌ Blocking Issues Found"}`
-                });
-            }
-        } else {
-            // Post success comment
-            await context.octokit.issues.createComment({
-                owner: repo.owner,
-                repo: repo.repo,
-                issue_number: pr.number,
-                body: "## Guardrails Scan passed! ✅\nNo issues found.",
-            });
-        }
-
     } catch (error) {
         context.log.error(error, "Failed to scan code");
 
@@ -242,3 +201,144 @@ export const handlePullRequest = async (context: Context<"pull_request">) => {
         });
     }
 };
+
+const POLL_INTERVAL_MS = Number(process.env.SCAN_POLL_INTERVAL_MS || 5000);
+const POLL_TIMEOUT_MS = Number(process.env.SCAN_POLL_TIMEOUT_MS || 60 * 60 * 1000);
+
+/**
+ * Polls GET /scan/jobs/{id} until the job reaches a final state. A job that is
+ * still not done after SCAN_POLL_TIMEOUT_MS is reported as failed.
+ */
+export const pollScanJob = async (backendUrl: string, jobId: string, log: any): Promise<ScanJobStatus> => {
+    const deadline = Date.now() + POLL_TIMEOUT_MS;
+    while (Date.now() < deadline) {
+        await new Promise(resolve => setTimeout(resolve, POLL_INTERVAL_MS));
+        try {
+            const { data } = await axios.get<ScanJobStatus>(`${backendUrl}/scan/jobs/${jobId}`);
+            if (data.status !== "queued" && data.status !== "running") {
+                return data;
+            }
+        } catch (error: any) {
+            // Backend restarting: the job is persisted, keep polling
+            log.warn(`Polling scan job ${jobId} failed: ${error.message}`);
+        }
+    }
+    return { job_id: jobId, status: "failed", error: "Timed out waiting for the scan job" };
+};
+
+/**
+ * Publishes a finished scan job: status + review when it completed, an error status
+ * and comment when it failed, nothing when a newer push superseded it.
+ */
+export const publishJobResult = async (octokit: any, job: ScanJobStatus, log: any) => {
+    log.info(`Scan job ${job.job_id} finished (${job.status}) for ${job.repo_full_name} @ ${job.commit_sha}`);
+
+    // A newer push to the PR cancelled this scan; its own job reports the result
+    if (job.status === "superseded") {
+        return;
+    }
+
+    const [owner, repo] = (job.repo_full_name || "").split("/");
+    if (job.status === "completed" && job.result) {
+        await publishScanResult(octokit, { owner, repo }, job.pr_number as number, job.commit_sha as string, job.result, log);
+        return;
+    }
+
+    await octokit.repos.createCommitStatus({
+        owner,
+        repo,
+        sha: job.commit_sha as string,
+        state: "error",
+        context: "AI Guardrails",
+        description: "Scan failed due to internal error."
+    });
+    if (job.pr_number) {
+        await octokit.issues.createComment({
+            owner,
+            repo,
+            issue_number: job.pr_number,
+            body: "⚠️ Guardrails Scan failed due to an internal error.",
+        });
+    }
+};
+
+/**
+ * Posts the commit status and review for a finished scan.
+ * Called through publishJobResult once the backend completes the job.
+ */
+export const publishScanResult = async (
+    octokit: any,
+    repo: { owner: string; repo: string },
+    prNumber: number,
+    sha: string,
+    scanResult: ScanResponse,
+    log: any
+) => {
+    // 3. Post Feedback & Status
+    log.info(`Updating commit status to: ${scanResult.succeeded ? "success" : "failure"}`);
+    try {
+        await octokit.repos.createCommitStatus({
+            owner: repo.owner,
+            repo: repo.repo,
+            sha,
+            state: scanResult.succeeded ? "success" : "failure",
+            context: "AI Guardrails",
+            description: scanResult.summary.substring(0, 140) // GitHub limit
+        });
+        log.info("Successfully updated commit status.");
+    } catch (e: any) {
+        log.error(`Failed to update commit status: ${e.message}`);
+    }
+
+    if (scanResult.violations.length > 0) {
+
+        // Post review comments
+        const comments = scanResult.violations.map(v => ({
+            path: v.file_path,
+            line: v.line_number,
+            body: `**[${v.severity}] ${v.rule_id}**: ${v.message}\n\n${v.suggestion ? `Suggestion: \`${v.suggestion}\`` : ""}`
+        }));
+
+        // Group into a review
+        // Note: GitHub limit is approx 80 comments per review.
+        // For prototype we'll take top 10 to avoid limits.
+        const reviewComments = comments.slice(0, 10);
+
+        try {
+            // Attempt 1: Review with Inline Comments
+            await octokit.pulls.createReview({
+                owner: repo.owner,
+                repo: repo.repo,
+                pull_number: prNumber,
+                event: scanResult.succeeded ? "COMMENT" : "REQUEST_CHANGES",
+                body: `## Guardrails Scan Results\n\n**Mode**: ${scanResult.enforcement_mode}\n\n${scanResult.summary}\n\n${scanResult.succeeded ? "✅ Checks Passed" : "❌ Blocking Issues Found"}`,
+                comments: reviewComments
+            });
+        } catch (reviewError: any) {
+            log.info(`Inline review failed (likely line mismatch), falling back to summary review: ${reviewError.message}`);
+
+            // Detailed Body for the fallback review
+            const violationDetails = scanResult.violations.map(v =>
+                `- **[${v.severity}] ${v.rule_id}** (${v.file_path}:${v.line_number}): ${v.message}`
+            ).join("\n");
+
+            // Attempt 2: Review WITHOUT Inline Comments (Body only)
+            // This ensures we still BLOCK the PR (Request Changes) if needed
+            await octokit.pulls.createReview({
+                owner: repo.owner,
+                repo: repo.repo,
+                pull_number: prNumber,
+                event: scanResult.succeeded ? "COMMENT" : "REQUEST_CHANGES",
+                body: `## Guardrails Scan Results (Summary)\n(Inline comments failed due to line mismatch - violations listed below)\n\n**Mode**: ${scanResult.enforcement_mode}\n\n${scanResult.summary}\n\n### 🔍 Violation Details\n${violationDetails}\n\n${scanResult.succeeded ? "✅ Checks Passed" : "❌ Blocking Issues Found"}`
+            });
+        }
+    } else {
+        // Post success comment
+        await octokit.issues.createComment({
+            owner: repo.owner,
+            repo: repo.repo,
+            issue_number: prNumber,
+            body: "## Guardrails Scan passed! ✅\nNo issues found.",
+        });
+    }
+};
@@ -1,8 +1,14 @@
 import { Probot } from "probot";
-import { handlePullRequest } from "./handlers/pr_handler";
+import { createHmac, timingSafeEqual } from "crypto";
+import { handlePullRequest, publishJobResult, ScanJobStatus } from "./handlers/pr_handler";
 
 export = (app: Probot, { getRouter }: any) => {
     app.log.info("App loaded! Waiting for webhooks...");
+    if (!process.env.CALLBACK_SECRET) {
+        // Backend -> app requests are signed with it: without one, scan results are
+        // polled and admin overrides cannot reach GitHub
+        app.log.error("CALLBACK_SECRET is not set: scan jobs are polled and admin overrides are NOT delivered. Set the same CALLBACK_SECRET for the backend and this app.");
+    }
 
     app.on("pull_request.opened", async (context) => {
         await handlePullRequest(context);
@@ -16,36 +22,142 @@ export = (app: Probot, { getRouter }: any) => {
         await handlePullRequest(context);
     });
 
+    const dashboardUrl = () =>
+        `${process.env.PUBLIC_URL || (process.env.RAILWAY_PUBLIC_DOMAIN ? `https://${process.env.RAILWAY_PUBLIC_DOMAIN}` : "http://localhost:8000")}/dashboard`;
+
+    // Posts a commit status as the installation that owns the repo
+    const setCommitStatus = async (repo_full_name: string, commit_sha: string, state: "success" | "failure" | "error" | "pending", description: string, target_url?: string) => {
+        const [owner, repo] = repo_full_name.split("/");
+
+        // 1. Get Installation ID for this repo
+        // Authenticate as App (JWT) to find installation
+        const jwtOctokit = await app.auth();
+        const installation = await jwtOctokit.apps.getRepoInstallation({ owner, repo });
+
+        // 2. Authenticate as Installation
+        const octokit = await app.auth(installation.data.id);
+
+        // 3. Post the Status
+        await octokit.repos.createCommitStatus({
+            owner,
+            repo,
+            sha: commit_sha,
+            state,
+            description: description.substring(0, 140), // GitHub limit
+            context: "AI Guardrails", // Must match the context used by the bot (Case Sensitive!)
+            target_url: target_url || dashboardUrl()
+        });
+    };
+
+    const applyOverride = async (repo_full_name: string, commit_sha: string, reason?: string) => {
+        app.log.info(`Received Admin Override for ${repo_full_name} @ ${commit_sha}`);
+        await setCommitStatus(repo_full_name, commit_sha, "success", `Admin Override: ${reason || "Manual Approval"}`);
+    };
+
     // Endpoint for Python Backend to trigger Admin Override (Internal Localhost Only)
     const router = getRouter("/");
-    router.use(require("express").json());
+    // Keep the raw body: backend payloads are signed over the exact bytes sent
+    router.use(require("express").json({ verify: (req: any, _res: any, buf: Buffer) => { req.rawBody = buf; } }));
+
+    // HMAC-SHA256 of the body under CALLBACK_SECRET (shared with the backend)
+    const hasValidSignature = (req: any): boolean => {
+        const secret = process.env.CALLBACK_SECRET;
+        const signature = req.get("X-Guardrails-Signature") || "";
+        if (!secret || !req.rawBody) {
+            return false;
+        }
+        const expected = "sha256=" + createHmac("sha256", secret).update(req.rawBody).digest("hex");
+        return signature.length === expected.length && timingSafeEqual(Buffer.from(signature), Buffer.from(expected));
+    };
     router.post("/api/override", async (req: any, res: any) => {
         try {
             const { repo_full_name, commit_sha, reason } = req.body;
-            app.log.info(`Received Admin Override for ${repo_full_name} @ ${commit_sha}`);
+            await applyOverride(repo_full_name, commit_sha, reason);
+            res.json({ status: "ok", message: "Override applied" });
+        } catch (error: any) {
+            app.log.error(error);
+            res.status(500).json({ error: error.message });
+        }
+    });
 
-            const [owner, repo] = repo_full_name.split("/");
+    // Outbox deliveries from the Python backend are retried, so each event id
+    // (idempotency key) is applied once.
+    const appliedEvents = new Map<string, number>();
+    const APPLIED_EVENTS_LIMIT = 10000;
 
-            // 1. Get Installation ID for this repo
-            // Authenticate as App (JWT) to find installation
-            const jwtOctokit = await app.auth();
-            const installation = await jwtOctokit.apps.getRepoInstallation({ owner, repo });
+    const markApplied = (eventId: string) => {
+        appliedEvents.set(eventId, Date.now());
+        if (appliedEvents.size > APPLIED_EVENTS_LIMIT) {
+            // Maps iterate in insertion order: drop the oldest key
+            appliedEvents.delete(appliedEvents.keys().next().value as string);
+        }
+    };
 
-            // 2. Authenticate as Installation
-            const octokit = await app.auth(installation.data.id);
+    // Batched events from the Python backend's outbox (signed by the backend)
+    router.post("/api/events", async (req: any, res: any) => {
+        if (!hasValidSignature(req)) {
+            app.log.warn("Rejected outbox events with a missing or invalid signature");
+            res.status(401).json({ error: "Invalid signature" });
+            return;
+        }
+        const events: { id: string; type: string; payload: any }[] = req.body?.events || [];
+        const results: Record<string, { ok: boolean; retry?: boolean; error?: string; duplicate?: boolean }> = {};
 
-            // 3. Post "Success" Status
-            await octokit.repos.createCommitStatus({
-                owner,
-                repo,
-                sha: commit_sha,
-                state: "success",
-                description: `Admin Override: ${reason || "Manual Approval"}`,
-                context: "AI Guardrails", // Must match the context used by the bot (Case Sensitive!)
-                target_url: `${process.env.PUBLIC_URL || (process.env.RAILWAY_PUBLIC_DOMAIN ? `https://${process.env.RAILWAY_PUBLIC_DOMAIN}` : "http://localhost:8000")}/dashboard`
-            });
+        for (const event of events) {
+            if (appliedEvents.has(event.id)) {
+                results[event.id] = { ok: true, duplicate: true };
+                continue;
+            }
+            const p = event.payload || {};
+            try {
+                if (event.type === "override") {
+                    await applyOverride(p.repo_full_name, p.commit_sha, p.reason);
+                } else if (event.type === "commit_status") {
+                    await setCommitStatus(p.repo_full_name, p.commit_sha, p.state, p.description || "", p.target_url);
+                } else {
+                    results[event.id] = { ok: false, retry: false, error: `Unknown event type: ${event.type}` };
+                    continue;
+                }
+                markApplied(event.id);
+                results[event.id] = { ok: true };
+            } catch (error: any) {
+                app.log.error(error);
+                // 4xx from GitHub (bad repo/sha, app not installed) will not fix itself
+                const status = error.status || error.response?.status;
+                const permanent = typeof status === "number" && status >= 400 && status < 500 && status !== 429;
+                results[event.id] = { ok: false, retry: !permanent, error: error.message };
+            }
+        }
+        res.json({ results });
+    });
 
-            res.json({ status: "ok", message: "Override applied" });
+    // Completion callback for scan jobs queued by handlePullRequest (signed by the backend,
+    // delivered through its outbox and so retried until we answer 2xx)
+    router.post("/api/scan-callback", async (req: any, res: any) => {
+        if (!hasValidSignature(req)) {
+            app.log.warn("Rejected scan callback with a missing or invalid signature");
+            res.status(401).json({ error: "Invalid signature" });
+            return;
+        }
+        const eventId: string | undefined = req.get("X-Guardrails-Event-Id");
+        if (eventId && appliedEvents.has(eventId)) {
+            res.json({ status: "ok", duplicate: true });
+            return;
+        }
+        try {
+            const job: ScanJobStatus = req.body;
+            const [owner, repo] = (job.repo_full_name || "").split("/");
+            // Superseded jobs publish nothing; skip the installation lookup for them
+            if (job.status !== "superseded") {
+                const jwtOctokit = await app.auth();
+                const installation = await jwtOctokit.apps.getRepoInstallation({ owner, repo });
+                await publishJobResult(await app.auth(installation.data.id), job, app.log);
+            }
+
+            if (eventId) {
+                markApplied(eventId);
+            }
+            res.json({ status: "ok" });
         } catch (error: any) {
             app.log.error(error);
             res.status(500).json({ error: error.message });
@@ -3,5 +3,12 @@ set -e
 
 echo "🚀 Starting App (Public: 8000, Internal: 8081)"
 
+# Backend and GitHub App run side by side here: if no CALLBACK_SECRET was provided,
+# generate one for this container so scan callbacks and outbox events are signed
+if [ -z "$CALLBACK_SECRET" ]; then
+    export CALLBACK_SECRET="$(head -c 32 /dev/urandom | od -An -tx1 | tr -d ' \n')"
+    echo "🔑 CALLBACK_SECRET not set; generated one for this container"
+fi
+
 # Start Supervisor
 exec /usr/bin/supervisord -c /etc/supervisor/conf.d/supervisord.conf
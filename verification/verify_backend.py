@@ -1,4 +1,5 @@
 import asyncio
+import contextlib
 import sys
 import os
 
@@ -149,7 +150,1190 @@ rules:
     assert response_advisory.succeeded == True, "Advisory mode failed to suppress blocking violation"
     assert response_advisory.enforcement_mode == "advisory", "Enforcement mode not set correctly"
     
+    verify_matcher_parity()
+    verify_patch_parsing()
+    verify_chunk_boundaries()
+    await verify_chunked_line_mapping()
+    verify_excerpt_remapping()
+    verify_override_index_concurrency()
+    await verify_scan_coalescing()
+    await verify_outbox_concurrency()
+    verify_backtracking_detection()
+    await verify_rollup_window_totals()
+    await verify_legacy_migration()
+    await verify_partition_pagination()
+    verify_manifest_parsers()
+    verify_scan_job_leases()
+    await verify_supersede_ordering()
+
     print("\n✅ Verification Passed!")
 
+def verify_patch_parsing():
+    """
+    parse_patch on hand-written add / delete / no-newline hunks, then against
+    difflib on seeded random edits: the ranges must be exactly the new-file lines
+    that were inserted or replaced, plus the landing line of each pure deletion.
+    """
+    import difflib
+    import random
+    from app.services.diff_parser import parse_patch
+
+    print("\nChecking unified diff parsing...")
+    cases = [
+        ("", None),
+        ("Binary files a/logo.png and b/logo.png differ", None),
+        ("@@ -1,2 +1,4 @@\n a\n+b\n+c\n d", [(2, 3)]),                                  # add
+        ("@@ -0,0 +1,3 @@\n+a\n+b\n+c", [(1, 3)]),                                       # new file
+        ("@@ -1,3 +1,2 @@\n a\n-b\n c", [(2, 2)]),                                        # delete
+        ("@@ -1,2 +0,0 @@\n-a\n-b", [(1, 1)]),                                             # file emptied
+        ("@@ -1,2 +1,1 @@\n--- sql comment\n x", [(1, 1)]),                                # removed "-- " line
+        ("@@ -3 +3 @@\n-a\n+b", [(3, 3)]),                                                 # counts omitted
+        ("@@ -1,2 +1,2 @@\n a\n-b\n\\ No newline at end of file\n+b\n\\ No newline at end of file", [(2, 2)]),
+        ("@@ -1,1 +1,2 @@\n-a\n\\ No newline at end of file\n+a\n+b\n\\ No newline at end of file", [(1, 2)]),
+        ("diff --git a/x b/x\nindex 1..2 100644\n--- a/x\n+++ b/x\n"
+         "@@ -1,3 +1,3 @@\n a\n-b\n+B\n c\n@@ -10,2 +10,3 @@ def f():\n j\n+k\n l", [(2, 2), (11, 11)]),
+    ]
+    for patch, expected in cases:
+        assert parse_patch(patch) == expected, f"parse_patch({patch!r}) = {parse_patch(patch)}, expected {expected}"
+
+    rng = random.Random(5678)
+    for _ in range(300):
+        old = [f"line {rng.randint(0, 20)}\n" for _ in range(rng.randint(0, 30))]
+        new = list(old)
+        for _ in range(rng.randint(1, 5)):
+            pos = rng.randint(0, len(new))
+            edit = rng.choice(["add", "delete", "replace"])
+            if edit == "add" or not new:
+                new[pos:pos] = [f"added {rng.randint(0, 99)}\n" for _ in range(rng.randint(1, 3))]
+            elif edit == "delete":
+                del new[min(pos, len(new) - 1):pos + rng.randint(1, 3)]
+            else:
+                new[min(pos, len(new) - 1)] = f"changed {rng.randint(0, 99)}\n"
+        patch = "".join(difflib.unified_diff(old, new, "a/f", "b/f", n=rng.randint(0, 3)))
+
+        expected = []
+        for tag, _, _, j1, j2 in difflib.SequenceMatcher(None, old, new, autojunk=False).get_opcodes():
+            if tag == "equal":
+                continue
+            start, end = (max(1, j1 + 1), max(1, j1 + 1)) if tag == "delete" else (j1 + 1, j2)
+            if expected and expected[-1][1] >= start - 1:
+                expected[-1] = (expected[-1][0], max(expected[-1][1], end))
+            else:
+                expected.append((start, end))
+        assert parse_patch(patch) == (expected or None), f"parse_patch differs from difflib on:\n{patch}"
+
+def verify_chunk_boundaries():
+    """
+    chunk_file windows on seeded Python and JS files: they cover every line in
+    order, hold the exact original text, stay within the budget, overlap by at most
+    the configured lines, and cut only at top-level boundaries when one is in reach.
+    """
+    import random
+    from app.services.chunker import chunk_file
+
+    print("\nChecking LLM chunk boundaries...")
+    rng = random.Random(91011)
+
+    def python_file():
+        parts = []
+        for i in range(rng.randint(5, 80)):
+            body = [f"    x{j} = compute({j}, 'value')" for j in range(rng.randint(1, 12))]
+            decorator = ["@cached"] if rng.random() < 0.3 else []
+            parts.append("\n".join(decorator + [f"def func_{i}(a, b):"] + body + ["    return (a +", "            b)"]))
+        return "import os\n\n" + "\n\n".join(parts) + "\n"
+
+    def js_file():
+        parts = []
+        for i in range(rng.randint(5, 80)):
+            body = [f"  const v{j} = call({j}, '{{not a brace}}'); // }}" for j in range(rng.randint(1, 12))]
+            parts.append("\n".join([f"function f{i}(a) {{"] + body + ["  return a;", "}"]))
+        return "\n\n".join(parts) + "\n"
+
+    for _ in range(200):
+        filename, content = rng.choice([("mod.py", python_file), ("mod.js", js_file)])
+        content = content()
+        lines = content.split("\n")
+        budget, overlap = rng.randint(400, 1200), rng.randint(0, 6)
+        chunks = chunk_file(filename, content, budget, overlap)
+
+        assert chunks[0][0] == 1 and chunks[-1][1] == len(lines), "Chunks must span the whole file"
+        if len(chunks) == 1:
+            assert chunks[0][2] == content, "A single chunk must be the file verbatim"
+            continue
+        for first, last, text in chunks:
+            assert text == "\n".join(lines[first - 1:last]), "Chunk text differs from its line span"
+            assert first == last or len(text) <= budget * 4, "Chunk exceeds the token budget"
+        for (first, last, _), (next_first, next_last, _) in zip(chunks, chunks[1:]):
+            assert first < next_first <= last + 1, "Chunks must advance without gaps"
+            assert last + 1 - next_first <= overlap, "Overlap exceeds LLM_CHUNK_OVERLAP_LINES"
+            cut = lines[last]  # first line after this chunk
+            # Every function here is well under half a window, so a top-level cut is always in reach
+            assert not cut.startswith((" ", "\t", "}")), f"{filename} cut inside a definition at line {last + 1}: {cut!r}"
+
+    small = "def f():\n    return 1"
+    assert chunk_file("small.py", small, 1000, 5) == [(1, 2, small)], "A file within budget must stay one chunk"
+
+    # Only \n ends a line: \r, \f and \u2028 inside a line must not shift later line numbers
+    odd = "".join(f"const s{i} = 'a\r\f\u2028b';\n" for i in range(300))
+    chunks = chunk_file("odd.js", odd, 200)
+    lines = odd.split("\n")
+    assert chunks[-1][1] == len(lines), "Separator characters were counted as line breaks"
+    for first, last, text in chunks:
+        assert text == "\n".join(lines[first - 1:last]), "Chunk text differs from its line span"
+
+async def verify_chunked_line_mapping():
+    """
+    Findings from chunked reviews come back at absolute line numbers, each reported
+    once even when two overlapping windows both flag it.
+    """
+    from app.core.config import settings
+    from app.models.scan import Violation
+    from app.services.llm_service import llm_service
+
+    class MarkerClient:
+        # Flags every "MARK" line, numbered within the window it was sent
+        async def analyze_diff(self, filename, content, static_violations):
+            return [Violation(rule_id="AI-MARK", category="SECURITY", severity="HIGH", message="marker",
+                              file_path=filename, line_number=number)
+                    for number, line in enumerate(content.splitlines(), 1) if "MARK" in line]
+
+    print("\nChecking chunked LLM line mapping...")
+    lines = [f"def f{i}():\n    return {i}" + ("  # MARK" if i % 7 == 0 else "") for i in range(200)]
+    content = "\n\n".join(lines) + "\n"
+    expected = sorted(n for n, line in enumerate(content.splitlines(), 1) if "MARK" in line)
+
+    saved = (llm_service.client, settings.LLM_CHUNK_TOKEN_LIMIT, settings.LLM_CHUNK_OVERLAP_LINES)
+    llm_service.client, settings.LLM_CHUNK_TOKEN_LIMIT, settings.LLM_CHUNK_OVERLAP_LINES = MarkerClient(), 200, 4
+    try:
+        found = await llm_service._analyze_chunked("big.py", content, [])
+    finally:
+        llm_service.client, settings.LLM_CHUNK_TOKEN_LIMIT, settings.LLM_CHUNK_OVERLAP_LINES = saved
+    assert sorted(v.line_number for v in found) == expected, "Chunked findings map to the wrong lines or repeat"
+    assert all(v.file_path == "big.py" for v in found)
+
+def verify_excerpt_remapping():
+    """
+    build_excerpt / remap_findings round trip on seeded files: every changed line is
+    in the excerpt, a finding on any shown line maps back to the file line with the
+    same text, and static findings renumbered into the excerpt map back unchanged.
+    """
+    import random
+    from app.models.scan import Violation
+    from app.services.prompt_builder import build_excerpt, remap_findings
+
+    print("\nChecking diff excerpt line remapping...")
+    rng = random.Random(121314)
+
+    def finding(line_number):
+        return Violation(rule_id="AI-X", category="SECURITY", severity="HIGH", message="x",
+                         file_path="f", line_number=line_number)
+
+    checked = 0
+    for _ in range(200):
+        if rng.random() < 0.5:
+            filename = "mod.py"
+            blocks = ["import os", "from typing import List"] + [
+                "\n".join([f"def f{i}(a):", "    s = '\f\u2028'"] + [f"    v{j} = a + {j}" for j in range(rng.randint(1, 15))] + ["    return a"])
+                for i in range(rng.randint(10, 40))
+            ]
+        else:
+            filename = "mod.js"
+            blocks = ["const fs = require('fs');"] + [
+                "\n".join([f"function f{i}(a) {{", "  const s = '\r\f\u2028';"] + [f"  const v{j} = a + {j};" for j in range(rng.randint(1, 15))] + ["  return a;", "}"])
+                for i in range(rng.randint(10, 40))
+            ]
+        content = "\n\n".join(blocks) + "\n"
+        lines = content.split("\n")  # separator characters above must not count as line breaks
+        starts = sorted(rng.sample(range(1, len(lines) + 1), rng.randint(1, 3)))
+        changed = [(start, min(len(lines), start + rng.randint(0, 3))) for start in starts]
+        static = [finding(n) for n in sorted(rng.sample(range(1, len(lines) + 1), 10))]
+
+        excerpt = build_excerpt(filename, content, changed, static)
+        if excerpt is None:
+            continue
+        checked += 1
+        text, line_map, excerpt_static = excerpt
+        shown = text.split("\n")
+        assert len(shown) == len(line_map), "line_map must have one entry per excerpt line"
+
+        kept = set()
+        for index, (line, number) in enumerate(zip(shown, line_map), 1):
+            if " omitted ..." in line:
+                continue
+            assert line == lines[number - 1], f"Excerpt line {index} is not file line {number}"
+            assert remap_findings([finding(index)], line_map)[0].line_number == number
+            kept.add(number)
+        for first, last in changed:
+            assert set(range(first, last + 1)) <= kept, f"Changed lines {first}-{last} missing from the excerpt"
+
+        # Static findings inside the excerpt round-trip to their original lines
+        assert [v.line_number for v in remap_findings(excerpt_static, line_map)] == \
+            [v.line_number for v in static if v.line_number in kept]
+        # Out-of-range model answers are clamped into the file
+        for bogus in (0, -3, len(line_map) + 10):
+            assert 1 <= remap_findings([finding(bogus)], line_map)[0].line_number <= len(lines)
+    assert checked > 100, "Too few excerpts were built to exercise remapping"
+
+def verify_override_index_concurrency():
+    """
+    Two OverrideIndex instances stand in for the two backend processes. Threads
+    commit overrides through either one while others keep looking them up. Writers
+    must see their own override at once, an override once seen must never disappear,
+    nothing unwritten may show up, and at the end both indexes know every override.
+    """
+    import uuid
+    import random
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from app.core.database import get_db, record_override
+    from app.core.override_index import OverrideIndex
+
+    print("\nChecking override index under concurrent writers...")
+    repo = f"test/overrides-{uuid.uuid4().hex[:8]}"
+    indexes = [OverrideIndex(), OverrideIndex()]
+    for index in indexes:
+        index.load()
+    written = [f"sha{i}" for i in range(60)]
+    never = [f"unwritten{i}" for i in range(20)]
+    done = threading.Event()
+    errors = []
+
+    def write(i):
+        sha, index = written[i], indexes[i % 2]
+        conn = get_db()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            _, version = record_override(conn, repo, sha, "verify", "concurrency check")
+            conn.commit()
+        finally:
+            conn.close()
+        index.add(repo, sha, version)
+        if not index.is_overridden(repo, sha):
+            errors.append(f"{sha} not visible to its own writer")
+
+    def read(seed):
+        rng = random.Random(seed)
+        seen = [set(), set()]
+        while not done.is_set():
+            which = rng.randrange(2)
+            sha = rng.choice(written + never)
+            if indexes[which].is_overridden(repo, sha):
+                if sha in never:
+                    errors.append(f"{sha} reported overridden")
+                seen[which].add(sha)
+            elif sha in seen[which]:
+                errors.append(f"{sha} disappeared from index {which}")
+
+    with ThreadPoolExecutor(max_workers=12) as pool:
+        readers = [pool.submit(read, seed) for seed in range(4)]
+        for future in [pool.submit(write, i) for i in range(len(written))]:
+            future.result()
+        done.set()
+        for future in readers:
+            future.result()
+
+    assert not errors, errors[:5]
+    for index in indexes:
+        assert all(index.is_overridden(repo, sha) for sha in written), "An index missed another process's override"
+        index.close()
+
+async def verify_scan_coalescing():
+    """
+    ScanCoalescer with a controllable fake analysis: concurrent duplicates share one
+    run and each get their own copy and every file's progress exactly once; one
+    caller leaving does not cancel the others' scan, all leaving does; failures are
+    shared but never memoized; completed results serve late duplicates.
+    """
+    from app.engine.single_flight import ScanCoalescer
+    from app.models.scan import ScanResponse, Violation
+
+    print("\nChecking concurrent scan coalescing...")
+    files = [{"filename": f"f{i}.py", "content": f"x = {i}"} for i in range(4)]
+    runs = []
+
+    def make_request(sha="c0a1e5ce", content_suffix=""):
+        return ScanRequest(repo_full_name="test/coalesce", commit_sha=sha, pr_number=1,
+                           files=[{**f, "content": f["content"] + content_suffix} for f in files])
+
+    def make_analyze(gates, fail=False):
+        async def analyze(request, on_file_done):
+            runs.append(request.commit_sha)
+            violations = []
+            for file, gate in zip(request.files, gates):
+                await gate.wait()
+                found = [Violation(rule_id="X-1", category="STYLE", severity="LOW", message="m",
+                                   file_path=file["filename"], line_number=1)]
+                violations.extend(found)
+                on_file_done(file["filename"], found)
+            if fail:
+                raise RuntimeError("analysis failed")
+            return ScanResponse(status="success", violations=violations, succeeded=True, summary="ok")
+        return analyze
+
+    def progress():
+        seen = []
+        return seen, lambda filename, violations: seen.append(filename)
+
+    # Concurrent duplicates, one of them joining after two files are done
+    coalescer = ScanCoalescer(ttl_seconds=60, max_entries=8)
+    gates = [asyncio.Event() for _ in files]
+    analyze = make_analyze(gates)
+    trackers = [progress() for _ in range(6)]
+    tasks = [asyncio.create_task(coalescer.run(make_request(), analyze, t[1])) for t in trackers[:5]]
+    await asyncio.sleep(0)
+    gates[0].set(); gates[1].set()
+    await asyncio.sleep(0.01)
+    tasks.append(asyncio.create_task(coalescer.run(make_request(), analyze, trackers[5][1])))
+    await asyncio.sleep(0.01)
+    gates[2].set(); gates[3].set()
+    results = await asyncio.gather(*tasks)
+    assert len(runs) == 1, f"Duplicates ran {len(runs)} analyses instead of one"
+    assert sorted(str(how) for _, how in results) == ["None"] + ["in_flight"] * 5
+    for seen, _ in trackers:
+        assert seen == [f["filename"] for f in files], f"Progress not delivered exactly once per file: {seen}"
+    results[0][0].violations.clear()
+    assert all(len(response.violations) == len(files) for response, _ in results[1:]), "Callers share one response object"
+
+    # Late duplicate: memoized, nothing re-runs, progress replayed
+    seen, listener = progress()
+    response, how = await coalescer.run(make_request(), analyze, listener)
+    assert how == "recent" and len(runs) == 1 and len(response.violations) == len(files)
+    assert seen == [f["filename"] for f in files]
+
+    # One caller leaving keeps the shared scan alive; the last one leaving cancels it
+    gates = [asyncio.Event() for _ in files]
+    analyze = make_analyze(gates)
+    first = asyncio.create_task(coalescer.run(make_request("cancel"), analyze))
+    second = asyncio.create_task(coalescer.run(make_request("cancel"), analyze))
+    await asyncio.sleep(0.01)
+    first.cancel()
+    await asyncio.gather(first, return_exceptions=True)
+    for gate in gates:
+        gate.set()
+    response, _ = await second
+    assert len(response.violations) == len(files), "Cancelling one caller broke the shared scan"
+
+    gates = [asyncio.Event() for _ in files]
+    analyze = make_analyze(gates)
+    lonely = asyncio.create_task(coalescer.run(make_request("abandoned"), analyze))
+    await asyncio.sleep(0.01)
+    flight = coalescer._flights[coalescer.make_key(make_request("abandoned"))]
+    lonely.cancel()
+    await asyncio.gather(lonely, flight.task, return_exceptions=True)
+    assert flight.task.cancelled(), "A scan nobody waits for kept running"
+    assert coalescer.make_key(make_request("abandoned")) not in coalescer._recent
+
+    # Failures reach every waiter and are not memoized
+    gates = [asyncio.Event() for _ in files]
+    analyze = make_analyze(gates, fail=True)
+    failing = [asyncio.create_task(coalescer.run(make_request("fails"), analyze)) for _ in range(3)]
+    await asyncio.sleep(0.01)
+    for gate in gates:
+        gate.set()
+    outcomes = await asyncio.gather(*failing, return_exceptions=True)
+    assert all(isinstance(o, RuntimeError) for o in outcomes), "A failed scan did not reach every waiter"
+    runs.clear()
+    for gate in gates:
+        gate.set()
+    await asyncio.gather(coalescer.run(make_request("fails"), make_analyze(gates)))
+    assert runs == ["fails"], "A failed scan was memoized"
+
+    # Different content never coalesces
+    runs.clear()
+    await coalescer.run(make_request(content_suffix=" # edited"), make_analyze(gates))
+    assert runs == ["c0a1e5ce"], "A request with different content was served another scan's result"
+
+async def verify_outbox_concurrency():
+    """
+    Two OutboxDispatchers (one per backend process) drain events enqueued from
+    several threads against a flaky receiver. Every committed event must end up
+    delivered, rolled-back events never sent, and no event may be in flight on
+    both dispatchers at once.
+    """
+    import uuid
+    import json
+    import random
+    import logging
+    import httpx
+    from app.core.database import get_db
+    from app.core.outbox import OutboxStore, OutboxDispatcher, EVENT_ID_HEADER
+
+    print("\nChecking outbox delivery with two dispatchers...")
+    prefix = f"verify-{uuid.uuid4().hex[:8]}"
+    store = OutboxStore(batch_size=7, lease_seconds=30, max_attempts=50,
+                        backoff_base=0.01, backoff_max=0.05, retention_hours=24)
+    rng = random.Random(151617)
+    received, in_flight, errors = {}, set(), []
+
+    async def receive(keys):
+        for key in keys:
+            if key in in_flight:
+                errors.append(f"{key} sent by both dispatchers at once")
+            in_flight.add(key)
+            received[key] = received.get(key, 0) + 1
+        await asyncio.sleep(0.005)
+        in_flight.difference_update(keys)
+
+    async def handler(request):
+        if request.url.path == "/api/scan-callback":
+            key = request.headers[EVENT_ID_HEADER]
+            await receive([key])
+            return httpx.Response(503 if rng.random() < 0.3 else 200)
+        keys = [event["id"] for event in json.loads(request.content)["events"]]
+        await receive(keys)
+        if rng.random() < 0.2:
+            return httpx.Response(503, text="restarting")
+        return httpx.Response(200, json={"results": {
+            key: {"ok": False, "retry": True, "error": "busy"} if rng.random() < 0.15 else {"ok": True}
+            for key in keys
+        }})
+
+    def enqueue(worker):
+        committed = []
+        for i in range(25):
+            key = f"{prefix}-{worker}-{i}"
+            endpoint = "http://github-app:3000/api/scan-callback" if i % 3 == 0 else None
+            conn = get_db()
+            try:
+                conn.execute("BEGIN IMMEDIATE")
+                store.enqueue(conn, "commit_status", {"n": i}, idempotency_key=key, endpoint=endpoint)
+                if i % 5 == 4:
+                    conn.rollback()   # the change being announced failed: so must the event
+                else:
+                    conn.commit()
+                    committed.append(key)
+            finally:
+                conn.close()
+        return committed
+
+    # The receiver fails on purpose; its retry warnings are expected noise here
+    outbox_logger = logging.getLogger("app.core.outbox")
+    saved_level = outbox_logger.level
+    outbox_logger.setLevel(logging.ERROR)
+    dispatchers = []
+    for _ in range(2):
+        dispatcher = OutboxDispatcher(store, "http://github-app:3000/api/events", poll_interval=0.02, timeout=5)
+        dispatcher._client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        dispatcher._wakeup = asyncio.Event()
+        dispatcher._task = asyncio.create_task(dispatcher._run())
+        dispatchers.append(dispatcher)
+
+    committed = set().union(*await asyncio.gather(*[asyncio.to_thread(enqueue, w) for w in range(4)]))
+
+    def statuses():
+        conn = get_db()
+        rows = conn.execute("SELECT idempotency_key, status FROM outbox_events WHERE idempotency_key LIKE ?",
+                            (f"{prefix}-%",)).fetchall()
+        conn.close()
+        return dict((row[0], row[1]) for row in rows)
+
+    deadline = asyncio.get_running_loop().time() + 60
+    while any(status != "delivered" for status in (await asyncio.to_thread(statuses)).values()):
+        assert asyncio.get_running_loop().time() < deadline, "Outbox events were not delivered in time"
+        await asyncio.sleep(0.05)
+    for dispatcher in dispatchers:
+        await dispatcher.stop()
+    outbox_logger.setLevel(saved_level)
+
+    assert not errors, errors[:5]
+    final = await asyncio.to_thread(statuses)
+    assert set(final) == committed, "Rolled-back events were stored or committed ones lost"
+    assert set(k for k in received if k.startswith(prefix)) == committed, "Delivered set differs from committed events"
+
+    conn = get_db()
+    conn.execute("DELETE FROM outbox_events WHERE idempotency_key LIKE ?", (f"{prefix}-%",))
+    conn.commit()
+    conn.close()
+
+def verify_backtracking_detection():
+    """
+    has_catastrophic_backtracking on patterns it must flag, patterns it must let
+    through (linear despite looking similar) and the documented misses, which are
+    pinned here so a change in coverage is noticed. Shipped packs must all load.
+    """
+    import glob
+    import yaml
+    from app.core.rule_engine import rule_engine
+    from app.core.rule_matcher import has_catastrophic_backtracking
+
+    print("\nChecking catastrophic backtracking detection...")
+    flagged = [
+        r"(a+)+$", r"(\w+\s?)*$", r"(x*y?)+z",              # nested quantifiers
+        r"(a|a)*b", r"(a|aa)+$", r"(ab|a|ba)*$",             # overlapping alternation
+        r"(?:\d|[0-5]\d)+!", r"(?:[a-z]|ab)+$", r"x(?:(b|bb))*y",
+        r".*a.*b.*c",                                        # cubic wildcards
+    ]
+    linear = [
+        r"(?:ab|abc)+$", r"(ab|a)*c", r"(?:foo|for)+x", r"(\w|\d)+$", r"(?:[a-z]|\.)+@",
+        r"(x|\s|y)+z", r"SELECT.*\+.*", r"(?:\d{3}-)+\d{4}", r"(?i)eval\s*\(",
+    ]
+    missed = [r"(a|a?b)*c", r"(a|aa){1,30}$", r"\d+\d+\d+x"]
+    for pattern in flagged:
+        assert has_catastrophic_backtracking(pattern), f"{pattern} should be flagged"
+    for pattern in linear + missed:
+        assert not has_catastrophic_backtracking(pattern), f"{pattern} should not be flagged"
+
+    for path in glob.glob(os.path.join(rule_engine.rules_dir, "*_rules.yaml")):
+        with open(path) as f:
+            for rule in (yaml.safe_load(f) or {}).get("rules", []):
+                assert not has_catastrophic_backtracking(rule["pattern"]), f"{rule['id']} in {path} is flagged"
+
+@contextlib.contextmanager
+def _scratch_audit_db():
+    """
+    Points app.core.database at an empty audit.db in a temporary directory (yielded)
+    for checks that need exact control over the audit rows. The caller runs init_db.
+    """
+    import shutil
+    import tempfile
+    from app.core import database
+
+    original = database.DB_FILE
+    directory = tempfile.mkdtemp(prefix="verify-audit-")
+    database.DB_FILE = os.path.join(directory, "audit.db")
+    # Partition / dimension memos and the migration flag describe the real audit.db
+    database._clear_dim_cache()
+    database._violations_migrated = False
+    try:
+        yield directory
+    finally:
+        database.DB_FILE = original
+        database._clear_dim_cache()
+        database._violations_migrated = False
+        shutil.rmtree(directory, ignore_errors=True)
+
+@contextlib.contextmanager
+def _frozen_utcnow(module, now):
+    """
+    Makes `module.datetime.utcnow()` return `now`, so day windows land exactly.
+    """
+    from datetime import datetime
+
+    class FrozenDatetime(datetime):
+        @classmethod
+        def utcnow(cls):
+            return now
+
+    original = module.datetime
+    module.datetime = FrozenDatetime
+    try:
+        yield
+    finally:
+        module.datetime = original
+
+def _raw_audit_totals(conn, since):
+    """
+    Scans, violations by category / severity / file, counted straight off every
+    live partition's raw rows (violations_json) from `since` on.
+    """
+    import json
+    from collections import Counter
+    from app.core.database import audit_partitions
+
+    scans, categories, severities, files = 0, Counter(), Counter(), Counter()
+    for partition in audit_partitions(conn):
+        for timestamp, violations_json in conn.execute(f"SELECT timestamp, violations_json FROM {partition['logs_table']}"):
+            if since and timestamp < since:
+                continue
+            scans += 1
+            for v in json.loads(violations_json):
+                categories[v["category"]] += 1
+                severities[v["severity"]] += 1
+                files[v["file_path"]] += 1
+    return scans, categories, severities, files
+
+def _audit_events(rng, now, count, span_days):
+    """
+    `count` seeded scan events at random times in the `span_days` before `now`,
+    as insert_audit_events tuples.
+    """
+    from datetime import timedelta
+
+    events = []
+    for i in range(count):
+        timestamp = now - timedelta(seconds=rng.randint(0, span_days * 86400), microseconds=rng.choice([0, rng.randint(1, 999999)]))
+        violations = [
+            {
+                "rule_id": f"R-{rng.randint(1, 6)}",
+                "category": rng.choice(["SECURITY", "STYLE", "COMPLIANCE"]),
+                "severity": rng.choice(["BLOCKING", "WARNING", "INFO"]),
+                "file_path": f"src/file_{rng.randint(1, 12)}.py",
+                "line_number": rng.randint(1, 200),
+                "message": "m",
+            }
+            for _ in range(rng.choice([0, 0, 1, 2, 5]))
+        ]
+        events.append(("SCAN", f"org/repo-{i % 3}", f"sha{i}", i % 7, "FAILURE" if violations else "SUCCESS",
+                       {"violations": violations}, timestamp.isoformat()))
+    return events
+
+async def verify_rollup_window_totals():
+    """
+    /audit/stats for windows that start mid-day, across month partitions: the whole
+    days summed from rollups plus the partial first day read from raw rows must equal
+    a plain count over the raw rows, including events right at the cutoff.
+    """
+    import random
+    from datetime import datetime, timedelta
+    from app.api import audit as audit_api
+    from app.core import database
+
+    print("\nChecking audit rollup window totals...")
+    now = datetime(2026, 3, 3, 14, 37, 12)
+    rng = random.Random(181920)
+    windows = (1, 2, 3, 7, 30, 45, -1)
+    with _scratch_audit_db():
+        database.init_db()
+        events = _audit_events(rng, now, 600, 70)
+        # On and just before each cutoff, where an off-by-one between the two halves would show
+        for days in windows[:-1]:
+            cutoff = now - timedelta(days=days)
+            for timestamp in (cutoff, cutoff - timedelta(microseconds=1), cutoff + timedelta(hours=23, minutes=59)):
+                event = _audit_events(rng, timestamp, 1, 0)[0]
+                events.append(event[:6] + (timestamp.isoformat(),))
+        conn = database.get_db()
+        for start in range(0, len(events), 50):
+            database.insert_audit_events(conn, events[start:start + 50])
+            conn.commit()
+
+        with _frozen_utcnow(audit_api, now):
+            for days in windows:
+                since = (now - timedelta(days=days)).isoformat() if days > 0 else None
+                scans, categories, severities, files = _raw_audit_totals(conn, since)
+                stats = await audit_api.get_audit_stats(days)
+                assert stats["scans"] == scans, f"{days}d: {stats['scans']} scans, raw rows say {scans}"
+                assert stats["violations"] == sum(categories.values()), f"{days}d: violation total differs"
+                assert {k: v for k, v in stats["categories"].items() if v} == dict(categories), f"{days}d: categories differ"
+                assert {k: v for k, v in stats["severities"].items() if v} == dict(severities), f"{days}d: severities differ"
+                for fpath, count in stats["riskyFiles"].items():
+                    assert files[fpath] == count, f"{days}d: {fpath} has {count} in riskyFiles, {files[fpath]} in raw rows"
+                top = sorted(files.values(), reverse=True)[:audit_api.RISKY_FILES_LIMIT]
+                assert sorted(stats["riskyFiles"].values(), reverse=True) == top, f"{days}d: riskyFiles is not the top files"
+        conn.close()
+
+async def verify_legacy_migration():
+    """
+    An audit.db in the original single-table schema (audit_logs + audit_overrides,
+    violations only as JSON) is opened by init_db and migrated online in small
+    chunks. Row counts, /audit/stats and /audit/violations must agree with the raw
+    legacy rows before (JSON fallback), after (normalized tables) and once new
+    events land in monthly partitions on top.
+    """
+    import json
+    import random
+    import sqlite3
+    from collections import Counter
+    from datetime import datetime, timedelta
+    from app.api import audit as audit_api
+    from app.core import database
+
+    print("\nChecking legacy audit.db migration...")
+    now = datetime(2026, 5, 20, 9, 15, 0)
+    rng = random.Random(212223)
+    with _scratch_audit_db():
+        # Baseline schema, written the way the original log_audit_event did
+        legacy = sqlite3.connect(database.DB_FILE)
+        legacy.execute("PRAGMA journal_mode=WAL;")
+        legacy.execute('''
+            CREATE TABLE IF NOT EXISTS audit_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, event_type TEXT, repo TEXT,
+                pr_number INTEGER, commit_sha TEXT, status TEXT, violations_count INTEGER,
+                violations_json TEXT, metadata_json TEXT
+            )
+        ''')
+        legacy.execute('''
+            CREATE TABLE IF NOT EXISTS audit_overrides (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, timestamp TEXT, repo TEXT, commit_sha TEXT,
+                admin_user TEXT, reason TEXT
+            )
+        ''')
+        events = sorted(_audit_events(rng, now, 400, 120), key=lambda e: e[6])
+        legacy.executemany('''
+            INSERT INTO audit_logs (timestamp, event_type, repo, pr_number, commit_sha, status, violations_count, violations_json, metadata_json)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [
+            (ts, kind, repo, pr, sha, status, len(details["violations"]), json.dumps(details["violations"]), "{}")
+            for kind, repo, sha, pr, status, details, ts in events
+        ])
+        legacy.execute("INSERT INTO audit_overrides (timestamp, repo, commit_sha, admin_user, reason) VALUES (?, ?, ?, ?, ?)",
+                       (now.isoformat(), "org/repo-1", "sha1", "admin", "legacy override"))
+        legacy.commit()
+        legacy.close()
+        raw_violations = Counter(
+            (ts, v["rule_id"], v["file_path"], v["line_number"])
+            for _, _, _, _, _, details, ts in events for v in details["violations"]
+        )
+
+        async def check(stage, expected_recent=None):
+            conn = database.get_db()
+            try:
+                for days in (30, -1):
+                    since = (now - timedelta(days=days)).isoformat() if days > 0 else None
+                    scans, categories, severities, files = _raw_audit_totals(conn, since)
+                    stats = await audit_api.get_audit_stats(days)
+                    assert stats["scans"] == scans, f"{stage}, {days}d: {stats['scans']} scans, raw rows say {scans}"
+                    assert {k: v for k, v in stats["categories"].items() if v} == dict(categories), f"{stage}, {days}d: categories differ"
+                    assert {k: v for k, v in stats["severities"].items() if v} == dict(severities), f"{stage}, {days}d: severities differ"
+                    top = sorted(files.values(), reverse=True)[:audit_api.RISKY_FILES_LIMIT]
+                    assert sorted(stats["riskyFiles"].values(), reverse=True) == top, f"{stage}, {days}d: riskyFiles differ"
+                    assert stats["overridden_shas"] == ["sha1"], f"{stage}: legacy override lost"
+                    if expected_recent is not None and days == -1:
+                        assert stats["recent"] == expected_recent, f"{stage}: recent table differs"
+                return stats["recent"]
+            finally:
+                conn.close()
+
+        with _frozen_utcnow(audit_api, now):
+            database.init_db()
+            conn = database.get_db()
+            assert not database.violations_migrated(conn), "Legacy rows must start unmigrated"
+            assert conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == 0
+            conn.close()
+            # Before the migration: stats come from rollups + JSON, /violations reports itself incomplete
+            recent = await check("before migration")
+            assert (await audit_api.get_violations(days=-1))["complete"] is False
+
+            database.migrate_violations(chunk_size=37, pause=0)
+            conn = database.get_db()
+            assert database.violations_migrated(conn), "Migration did not finish"
+            assert conn.execute("SELECT COUNT(*) FROM audit_logs").fetchone()[0] == len(events)
+            assert conn.execute("SELECT COUNT(*) FROM violations").fetchone()[0] == sum(raw_violations.values())
+            conn.close()
+            await check("after migration", recent)
+
+            result = await audit_api.get_violations(days=-1, limit=1000)
+            assert result["complete"] is True
+            migrated = Counter((v["timestamp"], v["rule_id"], v["file_path"], v["line_number"]) for v in result["violations"])
+            assert migrated == raw_violations, "/violations differs from the legacy violations_json"
+            for rule_id in ("R-1", "R-4"):
+                rows = (await audit_api.get_violations(rule_id=rule_id, days=-1, limit=1000))["violations"]
+                assert Counter((v["timestamp"], v["file_path"], v["line_number"]) for v in rows) == Counter(
+                    (ts, path, line) for (ts, rule, path, line), n in raw_violations.items() if rule == rule_id for _ in range(n)
+                ), f"/violations?rule_id={rule_id} differs from the legacy rows"
+                assert [v["timestamp"] for v in rows] == sorted((v["timestamp"] for v in rows), reverse=True)
+
+            # New writes go to monthly partitions; both layouts are read together
+            conn = database.get_db()
+            database.insert_audit_events(conn, _audit_events(rng, now, 60, 10))
+            conn.commit()
+            conn.close()
+            await check("with new partitions")
+
+async def verify_partition_pagination():
+    """
+    Newest-first reads across monthly partitions: /audit/violations (any limit, with
+    and without filters) and the dashboard's recent table must equal the newest rows
+    of a plain sort over every live partition, with empty months in between and at
+    the head, after old months are archived by retention (totals still counting them
+    through rollups) and after a late write revives an archived month.
+    """
+    import json
+    import random
+    from datetime import datetime, timedelta
+    from app.api import audit as audit_api
+    from app.core import audit_maintenance, database
+
+    print("\nChecking cross-month audit pagination...")
+    now = datetime(2026, 4, 10, 12, 0, 0)
+    rng = random.Random(242526)
+    with _scratch_audit_db() as directory:
+        database.init_db()
+        # February and the current month exist but stay empty
+        events = [e for e in _audit_events(rng, now, 500, 160) if not e[6].startswith(("2026-02", "2026-04"))]
+        conn = database.get_db()
+        database.insert_audit_events(conn, events)
+        database._ensure_partition(conn, "202602")
+        database._ensure_partition(conn, "202604")
+        conn.commit()
+        conn.close()
+
+        def newest(since=None, rule_id=None, file_path=None):
+            """
+            Every live violation, newest first (in-scan order kept), off the raw rows.
+            """
+            conn = database.get_db()
+            rows = []
+            for partition in database.audit_partitions(conn):
+                rows.extend(conn.execute(
+                    f"SELECT timestamp, commit_sha, violations_json FROM {partition['logs_table']} ORDER BY id"
+                ).fetchall())
+            conn.close()
+            rows.sort(key=lambda row: row[0], reverse=True)
+            return [
+                (ts, v["rule_id"], v["file_path"], v["line_number"], sha)
+                for ts, sha, violations_json in rows if not since or ts >= since
+                for v in json.loads(violations_json)
+                if (rule_id is None or v["rule_id"] == rule_id) and (file_path is None or v["file_path"] == file_path)
+            ]
+
+        async def check(stage):
+            for days in (5, 20, 45, 100, -1):
+                since = (now - timedelta(days=days)).isoformat() if days > 0 else None
+                for rule_id, file_path in ((None, None), ("R-2", None), (None, "src/file_3.py"), ("R-5", "src/file_7.py")):
+                    expected = newest(since, rule_id, file_path)
+                    for limit in (1, 7, 100, 1000):
+                        result = await audit_api.get_violations(rule_id=rule_id, file_path=file_path, days=days, limit=limit)
+                        got = [(v["timestamp"], v["rule_id"], v["file_path"], v["line_number"], v["commit_sha"])
+                               for v in result["violations"]]
+                        assert [g[0] for g in got] == [e[0] for e in expected[:limit]], \
+                            f"{stage}: /violations days={days} rule={rule_id} file={file_path} limit={limit} is not the newest rows"
+                        # Rows of one scan share a timestamp; only compare them as a whole group
+                        if limit >= len(expected) or expected[limit - 1][0] != expected[limit][0]:
+                            assert sorted(got) == sorted(expected[:limit]), f"{stage}: /violations rows differ (days={days}, limit={limit})"
+                stats = await audit_api.get_audit_stats(days)
+                recent = [(r["commit_sha"], r["id"], r["file"]) for r in stats["recent"]]
+                assert recent == [(e[4], e[1], e[2]) for e in newest(since)[:audit_api.RECENT_LIMIT]], \
+                    f"{stage}: recent table (days={days}) is not the newest violations"
+
+        with _frozen_utcnow(audit_api, now):
+            await check("live partitions")
+
+            # Retention: everything that ended before February goes to archives
+            maintenance = audit_maintenance.AuditMaintenance(
+                retention_months=2, archive_dir=os.path.join(directory, "archive"),
+                archive_retention_months=0, interval_hours=1, checkpoint_interval=60
+            )
+            with _frozen_utcnow(audit_maintenance, now):
+                maintenance.run_pass()
+            conn = database.get_db()
+            archived = [row[0] for row in conn.execute("SELECT name FROM audit_partitions WHERE status = 'archived' ORDER BY name")]
+            conn.close()
+            assert archived == ["202511", "202512", "202601"], f"Unexpected archived partitions: {archived}"
+            assert len(os.listdir(os.path.join(directory, "archive"))) == 3
+            await check("after archival")
+            assert (await audit_api.get_audit_stats(-1))["scans"] == len(events), "Archived scans dropped out of the totals"
+
+            # A late write into an archived month starts a fresh live partition
+            late = _audit_events(rng, datetime(2026, 1, 20, 8, 0, 0), 3, 0)
+            conn = database.get_db()
+            database.insert_audit_events(conn, late)
+            conn.commit()
+            conn.close()
+            await check("after a late write")
+            assert (await audit_api.get_audit_stats(-1))["scans"] == len(events) + len(late)
+
+def verify_manifest_parsers():
+    """
+    One small fixture per manifest format: the parsed dependencies (name, line,
+    declared license) and the LIC-003 findings with their line numbers, including
+    the traps each parser must step around (options and URLs in requirements,
+    values that look like keys, npm links and aliases, exclusions and plugins in
+    pom.xml). Then a SQLite license database with its own restricted terms.
+    """
+    import sqlite3
+    import tempfile
+    import textwrap
+    from app.services.license_db import LicenseDatabase
+    from app.services.license_scanner import LicenseScanner
+
+    print("\nChecking dependency manifest parsers...")
+    fixtures = {
+        "svc/requirements.txt": ('''\
+            # app deps
+            requests==2.31.0
+            PyQt5>=5.15 ; python_version >= "3.8"
+            -r other.txt
+            --hash=sha256:abc
+            mysqlclient[extra] @ https://example.com/x.whl
+            flask \\
+                --hash=sha256:def
+            git+https://github.com/x/y.git
+            ''', [("pypi", "requests", 2, None), ("pypi", "PyQt5", 3, None),
+                  ("pypi", "mysqlclient", 6, None), ("pypi", "flask", 7, None)],
+            [("PyQt5", 3), ("mysqlclient", 6)]),
+        "pyproject.toml": ('''\
+            [project]
+            name = "demo"
+            dependencies = [
+                "requests>=2",
+                "pyqt5 ; sys_platform == 'linux'",  # gui
+            ]
+            [project.optional-dependencies]
+            db = ["mysqlclient>=2", 'django']
+            [tool.poetry.dependencies]
+            python = "^3.11"
+            gnureadline = "^8"
+            [tool.poetry.group.dev.dependencies]
+            pytest = "*"
+            [tool.black]
+            line-length = 100
+            ''', [("pypi", "requests", 4, None), ("pypi", "pyqt5", 5, None), ("pypi", "mysqlclient", 8, None),
+                  ("pypi", "django", 8, None), ("pypi", "gnureadline", 11, None), ("pypi", "pytest", 13, None)],
+            [("pyqt5", 5), ("mysqlclient", 8), ("gnureadline", 11)]),
+        "Pipfile.lock": ('''\
+            {
+                "_meta": {"hash": {"sha256": "x"}},
+                "default": {
+                    "requests": {"version": "==2.31.0"},
+                    "pyqt5": {
+                        "version": "==5.15.9"
+                    }
+                },
+                "develop": {
+                    "mysqlclient": {"version": "==2.2.0"}
+                }
+            }
+            ''', [("pypi", "requests", 4, None), ("pypi", "pyqt5", 5, None), ("pypi", "mysqlclient", 10, None)],
+            [("pyqt5", 5), ("mysqlclient", 10)]),
+        "web/package.json": ('''\
+            {
+              "name": "demo",
+              "keywords": ["mariadb"],
+              "dependencies": {
+                "react": "^18.0.0",
+                "ffmpeg-static": "^5.0.0"
+              },
+              "devDependencies": {
+                "mariadb": "^3.0.0"
+              },
+              "scripts": {"ghostscript4js": "node x.js"}
+            }
+            ''', [("npm", "react", 5, None), ("npm", "ffmpeg-static", 6, None), ("npm", "mariadb", 9, None)],
+            [("ffmpeg-static", 6), ("mariadb", 9)]),
+        "package-lock.json": ('''\
+            {
+              "name": "demo",
+              "lockfileVersion": 3,
+              "packages": {
+                "": {"name": "demo", "dependencies": {"react": "^18"}},
+                "node_modules/react": {"version": "18.2.0", "license": "MIT"},
+                "node_modules/left-pad": {
+                  "version": "1.3.0",
+                  "license": "WTFPL"
+                },
+                "node_modules/react/node_modules/copyleft": {"version": "1.0.0", "license": "GPL-3.0"},
+                "packages/app": {"link": true},
+                "node_modules/aliased": {"name": "@scope/real", "license": {"type": "AGPL-3.0"}}
+              }
+            }
+            ''', [("npm", "react", 6, "MIT"), ("npm", "left-pad", 7, "WTFPL"),
+                  ("npm", "copyleft", 11, "GPL-3.0"), ("npm", "@scope/real", 13, "AGPL-3.0")],
+            [("copyleft", 11), ("@scope/real", 13)]),
+        "npm-shrinkwrap.json": ('''\
+            {
+              "lockfileVersion": 1,
+              "dependencies": {
+                "express": {
+                  "version": "4.18.2",
+                  "dependencies": {
+                    "mariadb": {"version": "3.0.0"}
+                  }
+                },
+                "mariadb": {"version": "2.5.0"},
+                "ghostscript4js": {"version": "3.2.0"}
+              }
+            }
+            ''', [("npm", "express", 4, None), ("npm", "mariadb", 7, None), ("npm", "ghostscript4js", 11, None)],
+            [("mariadb", 7), ("ghostscript4js", 11)]),
+        "yarn.lock": ('''\
+            # yarn lockfile v1
+
+
+            "@scope/pkg@^1.0.0", "@scope/pkg@^1.2.0":
+              version "1.2.0"
+
+            mariadb@^3.0.0:
+              version "3.0.1"
+              dependencies:
+                denque "^2.1.0"
+
+            mariadb@^2.0.0:
+              version "2.5.0"
+            ''', [("npm", "@scope/pkg", 4, None), ("npm", "mariadb", 7, None)],
+            [("mariadb", 7)]),
+        "berry/yarn.lock": ('''\
+            __metadata:
+              version: 6
+
+            "ffmpeg-static@npm:^5.0.0":
+              version: 5.1.0
+            ''', [("npm", "ffmpeg-static", 4, None)],
+            [("ffmpeg-static", 4)]),
+        "pom.xml": ('''\
+            <project>
+              <dependencies>
+                <dependency>
+                  <groupId>com.itextpdf</groupId>
+                  <artifactId>itextpdf</artifactId>
+                  <version>5.5.13</version>
+                  <exclusions>
+                    <exclusion>
+                      <groupId>mysql</groupId>
+                      <artifactId>mysql-connector-java</artifactId>
+                    </exclusion>
+                  </exclusions>
+                </dependency>
+                <dependency><groupId>org.springframework</groupId><artifactId>spring-core</artifactId></dependency>
+              </dependencies>
+              <build><plugins><plugin><groupId>org.mariadb.jdbc</groupId><artifactId>mariadb-java-client</artifactId></plugin></plugins></build>
+            </project>
+            ''', [("maven", "com.itextpdf:itextpdf", 5, None), ("maven", "org.springframework:spring-core", 14, None)],
+            [("com.itextpdf:itextpdf", 5)]),
+    }
+    for filename, (content, dependencies, findings) in fixtures.items():
+        content = textwrap.dedent(content)
+        parser = LicenseScanner._parser_for(filename)
+        assert parser is not None, f"No parser for {filename}"
+        assert list(parser(content)) == dependencies, f"{filename} parsed as {list(parser(content))}"
+        reported = [
+            (v["message"].split("'")[1], v["line_number"])
+            for v in LicenseScanner.scan_content(filename, content) if v["rule_id"] == "LIC-003"
+        ]
+        assert reported == findings, f"{filename}: LIC-003 findings {reported}, expected {findings}"
+    assert LicenseScanner.scan_content("package.json", "{not json") == [], "Malformed manifests must be ignored"
+
+    # SQLite license database: its own restricted terms, names matched case/separator-insensitively
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "licenses.db")
+        conn = sqlite3.connect(path)
+        conn.execute("CREATE TABLE packages (ecosystem TEXT, name TEXT, license TEXT)")
+        conn.execute("CREATE TABLE restricted_licenses (term TEXT)")
+        conn.executemany("INSERT INTO packages VALUES (?, ?, ?)", [
+            ("pypi", "Internal_Tool", "Proprietary-EULA"), ("*", "shared.lib", "BUSL-1.1"), ("npm", "react", "MIT"),
+        ])
+        conn.executemany("INSERT INTO restricted_licenses VALUES (?)", [("Proprietary",), ("BUSL",)])
+        conn.commit()
+        conn.close()
+        db = LicenseDatabase(path)
+        db.refresh()
+        assert db.lookup("pypi", "internal-tool") == "Proprietary-EULA"
+        assert db.lookup("maven", "Shared_Lib") == "BUSL-1.1", "'*' entries must match any ecosystem"
+        assert db.lookup("pypi", "react") is None
+        assert db.is_restricted("Proprietary-EULA") and db.is_restricted("BUSL-1.1")
+        assert not db.is_restricted("GPL-3.0"), "The database's own terms replace the defaults"
+
+def verify_scan_job_leases():
+    """
+    A worker whose lease expired while it was stalled must not touch the job once
+    another worker reclaimed it: its heartbeat, finish and release are no-ops, and
+    only the current lease holder's result is stored.
+    """
+    import time
+    from app.core import database
+    from app.engine.scan_jobs import ScanJobStore
+    from app.models.scan import ScanJobRequest, ScanResponse
+
+    print("\nChecking scan job lease ownership...")
+    with _scratch_audit_db():
+        database.init_db()
+        store = ScanJobStore(lease_seconds=0.2, max_attempts=5, retention_hours=1)
+        job_id = store.enqueue(ScanJobRequest(repo_full_name="org/repo", commit_sha="abc", files=[]))
+
+        stale = store.claim()
+        assert store.heartbeat(job_id, stale["lease_token"], 0), "The holder's heartbeat must renew the lease"
+        time.sleep(0.3)
+        current = store.claim()
+        assert current is not None and current["id"] == job_id, "An expired lease must make the job claimable"
+        assert current["lease_token"] != stale["lease_token"]
+
+        assert not store.heartbeat(job_id, stale["lease_token"], 1), "A stale worker renewed a reclaimed job"
+        assert not store.finish(job_id, stale["lease_token"], error="stale worker"), "A stale worker finished a reclaimed job"
+        store.release(job_id, stale["lease_token"])
+        status = store.get(job_id)
+        assert status.status == "running" and status.attempts == 2 and status.error is None, f"Stale worker changed the job: {status}"
+
+        response = ScanResponse(status="success", violations=[], succeeded=True, summary="ok")
+        assert store.heartbeat(job_id, current["lease_token"], 0)
+        assert store.finish(job_id, current["lease_token"], response)
+        assert not store.finish(job_id, current["lease_token"], error="twice"), "A finished job was finished again"
+        status = store.get(job_id)
+        assert status.status == "completed" and status.result.summary == "ok", f"Holder's result not stored: {status}"
+
+async def verify_supersede_ordering():
+    """
+    A newer push cancels the scan of the previous PR head; a redelivered older sha
+    (here or in the other process) must not.
+    """
+    import uuid
+    from app.engine.scan_registry import ScanRegistry
+
+    print("\nChecking PR supersede ordering...")
+    registry = ScanRegistry(enabled=True, poll_interval=0.05)
+    repo = f"test/supersede-{uuid.uuid4().hex[:8]}"
+    key = (repo, 9)
+
+    def request(sha):
+        return ScanRequest(repo_full_name=repo, pr_number=9, commit_sha=sha, files=[])
+
+    async def scan(sha, seconds=10.0):
+        async with registry.track(request(sha)):
+            await asyncio.sleep(seconds)
+
+    await scan("sha1", 0)                               # sha1 scanned and finished
+    head = asyncio.create_task(scan("sha2"))            # push: sha2 is the head
+    await asyncio.sleep(0.05)
+    await scan("sha1", 0)                               # GitHub redelivers the old sha1 webhook
+    assert not head.done(), "Redelivered older sha cancelled the scan of the PR head"
+
+    await asyncio.create_task(scan("sha3", 0))          # push: sha3
+    await asyncio.gather(head, return_exceptions=True)
+    assert head.cancelled(), "Newer sha did not supersede the previous head"
+    assert registry.superseded_by(request("sha2")) == "sha3"
+
+    # Other process: heads arrive through scan_heads and the watcher
+    await registry.start()
+    head = asyncio.create_task(scan("sha4"))
+    await asyncio.sleep(0.05)
+    await asyncio.to_thread(registry._observe, key, "sha2")   # stale redelivery elsewhere
+    await asyncio.sleep(0.2)
+    assert not head.done(), "Stale sha seen by another process cancelled the PR head"
+    await asyncio.to_thread(registry._observe, key, "sha5")   # newer push elsewhere
+    await asyncio.sleep(0.2)
+    assert head.cancelled(), "Newer sha seen by another process did not supersede the head"
+    await registry.stop()
+
+def verify_matcher_parity():
+    """
+    The single-pass RuleMatcher must report exactly what `re.search` of every rule
+    on every line reports, in the same (line, rule) order, for whole files and for
+    line ranges.
+    """
+    import re
+    import random
+    from app.core.rule_engine import rule_engine
+    from app.core.rule_matcher import RuleMatcher
+
+    print("\nChecking rule matcher parity with per-line re.search...")
+    extra = [
+        ("X-ANCHOR", r"^\s*import\s+\w+$"),      # anchors
+        ("X-WORD", r"\bTODO\b"),                  # word boundaries
+        ("X-NOLIT", r"[A-Z]{5,}"),                # no literal to prefilter on
+        ("X-BACKREF", r"(\w)\1{3}"),              # backreference
+        ("X-UNICODE", r"straße|Ünïcode"),         # non-ASCII literals
+        ("X-EOL", r"foo$"),
+    ]
+    rules = rule_engine.resolve(None).rules + [
+        {"id": rule_id, "pattern": pattern, "message": rule_id, "severity": "LOW", "category": "STYLE"}
+        for rule_id, pattern in extra
+    ]
+    matcher = RuleMatcher(rules, max_line_length=0, time_budget=0)
+    patterns = [re.compile(rule["pattern"]) for rule in rules]
+
+    fragments = [
+        "password = 'hunter22'", "EVAL(x)", "exec (cmd)", "print(", "logging.getLogger(__name__)",
+        "select * from t where a = ' + b", "os.system(cmd)", "class foo:", "class Foo:", "except:",
+        "Affero", "import os", "  import sys", "# TODO later", "TODOS", "ABCDEF", "aaaa", "straße",
+        "STRASSE", "Ünïcode", "foo", "food", "x = 1", "\t", "   ", "", "é", "+", "'",
+    ]
+    rng = random.Random(1234)
+    for _ in range(300):
+        lines = [" ".join(rng.choice(fragments) for _ in range(rng.randint(0, 4))) for _ in range(rng.randint(1, 40))]
+        content = "\n".join(lines) + rng.choice(["", "\n"])
+        split = content.split("\n")
+        expected = [
+            (rule_idx, number)
+            for number, line in enumerate(split, 1)
+            for rule_idx, pattern in enumerate(patterns)
+            if pattern.search(line)
+        ]
+        assert matcher.scan_hits(content)[0] == expected, f"Matcher differs from re.search on:\n{content!r}"
+
+        # Sorted, non-overlapping 1-based ranges, possibly past the end
+        bounds = sorted(rng.sample(range(1, len(split) + 3), min(4, len(split) + 2)))
+        ranges = [(bounds[i], bounds[i + 1] - 1 if i + 1 < len(bounds) else bounds[i]) for i in range(0, len(bounds), 2)]
+        ranges = [(a, max(a, b)) for a, b in ranges]
+        wanted = [hit for hit in expected if any(a <= hit[1] <= b for a, b in ranges)]
+        assert matcher.scan_hits(content, ranges)[0] == wanted, f"Line-range scan differs on {ranges}:\n{content!r}"
+
 if __name__ == "__main__":
     asyncio.run(verify())